@@ -0,0 +1,125 @@
+"""Micro-benchmark: single-pass metadata scan vs. the separate per-field rescans.
+
+Pages are rebuilt from the NSDD 75 example (one page per <pb/>), so no PDF is
+needed. Usage: python benchmarks/bench_metadata.py [--repeat N] [--scale K]
+"""
+import argparse, os, re, sys, timeit
+from datetime import datetime
+from lxml import etree
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from seward.parser import scan_metadata, DATE_RE, UPPER_HEAD_RE  # noqa: E402
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), "..", "examples", "nsdd75_tei_example.xml")
+NS = {"tei": "http://www.tei-c.org/ns/1.0"}
+
+def pages_from_tei(path):
+    doc = etree.parse(path)
+    div = doc.xpath("//tei:div[@type='document']", namespaces=NS)[0]
+    t = lambda xp: " ".join(div.xpath(f"string({xp})", namespaces=NS).split())
+    header = ["SECRET", "THE WHITE HOUSE", "WASHINGTON", t("tei:docDate").replace("Washington, ", ""),
+              "MEMORANDUM FOR: " + "; ".join(i.text for i in div.xpath("tei:list/tei:item", namespaces=NS)), ""]
+    pages = []
+    for el in div.iter():
+        if el.tag == "{%s}pb" % NS["tei"]:
+            pages.append({"n": len(pages) + 1, "lines": header if not pages else []})
+        elif pages and el.tag in ("{%s}p" % NS["tei"], "{%s}head" % NS["tei"]) and el.text:
+            pages[-1]["lines"] = pages[-1]["lines"] + el.text.splitlines() + [""]
+    pages[-1]["lines"] = pages[-1]["lines"] + ["FOR THE PRESIDENT:", "William P. Clark"]
+    for p in pages:
+        p["text"] = "\n".join(p["lines"])
+    return pages
+
+# The pre-scanner chain, kept verbatim as the baseline.
+CLASS_RE = re.compile(r"\b(SENSITIVE|SECRET|TOP SECRET|CONFIDENTIAL|UNCLASSIFIED|NOFORN|OADR|E\.O\.\s*12[0-9]{{3}}|EO\s*12[0-9]{{3}})\b", re.IGNORECASE)
+
+def legacy_find_date(pages):
+    for idx in [0,1,-1]:
+        if abs(idx) <= len(pages):
+            m = DATE_RE.search(pages[idx]["text"])
+            if m:
+                try:
+                    return m.group(0), datetime.strptime(m.group(0), "%B %d, %Y").date().isoformat()
+                except Exception:
+                    return m.group(0), None
+    return None, None
+
+def legacy_find_doc_title(pages):
+    for ln in pages[0]["lines"][:100]:
+        if re.search(r"U\.?S\.?\s+RELATIONS\s+WITH\s+THE\s+U\.?S\.?S\.?R\.?", ln, re.IGNORECASE):
+            return "U.S. Relations with the USSR"
+        if re.search(r"NATIONAL SECURITY DECISION DIRECTIVE\s+75", ln, re.IGNORECASE):
+            return "National Security Decision Directive 75: U.S. Relations with the USSR"
+    for ln in pages[0]["lines"][:40]:
+        s=ln.strip()
+        if len(s)>10 and UPPER_HEAD_RE.match(s) and not s.startswith("THE WHITE HOUSE"):
+            return s.title()
+    return "NSDD (auto-extracted)"
+
+def legacy_collect_doc_classes(pages):
+    seen=set()
+    for p in pages:
+        cand=(p["lines"][:8]+p["lines"][-8:]) if p["lines"] else []
+        for ln in cand:
+            for m in CLASS_RE.findall(ln or ""):
+                seen.add(re.sub(r"\s+"," ", m.upper().strip()))
+    return sorted(seen)
+
+def legacy_extract_addressees(pages):
+    addrs=[]
+    for p in pages[:2]:
+        lines=p["lines"]
+        for i, ln in enumerate(lines):
+            if re.search(r"^\s*MEMORANDUM\s+FOR", ln, re.IGNORECASE):
+                j=i; buf=[]
+                after=re.split(r":", ln, maxsplit=1)
+                if len(after)==2 and after[1].strip(): buf.append(after[1].strip())
+                j+=1
+                while j<len(lines) and lines[j].strip():
+                    buf.append(lines[j].strip()); j+=1
+                text_block=" ".join(buf)
+                items=re.split(r";|\s{2,}|,\s(?=[A-Z])", text_block)
+                for it in items:
+                    s=it.strip(" ;,")
+                    if s and len(s)>2: addrs.append(s)
+                return addrs
+    return addrs
+
+def legacy_extract_signer(pages):
+    for p in pages:
+        for i, ln in enumerate(p["lines"]):
+            if re.search(r"FOR\s+THE\s+PRESIDENT", ln, re.IGNORECASE):
+                nearby=" ".join(p["lines"][i:i+3])
+                m=re.search(r"FOR\s+THE\s+PRESIDENT[:\s\-]*([A-Z][A-Za-z\.\s\-']{2,})", nearby, re.IGNORECASE)
+                if m:
+                    return re.sub(r"\s{2,}"," ", m.group(1)).strip()
+    return None
+
+def legacy_scan(pages):
+    date_human, date_iso = legacy_find_date(pages)
+    return {
+        "date_human": date_human, "date_iso": date_iso, "place": "Washington",
+        "title": legacy_find_doc_title(pages), "classes": legacy_collect_doc_classes(pages),
+        "addressees": legacy_extract_addressees(pages), "signer": legacy_extract_signer(pages),
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=200)
+    ap.add_argument("--scale", type=int, default=1, help="Repeat the example's body pages K times")
+    args = ap.parse_args()
+
+    pages = pages_from_tei(EXAMPLE)
+    body = pages[1:-1] * args.scale
+    pages = pages[:1] + [dict(p, n=i + 2) for i, p in enumerate(body)] + pages[-1:]
+    assert legacy_scan(pages) == scan_metadata(pages), "scanner disagrees with the legacy chain"
+
+    t_old = min(timeit.repeat(lambda: legacy_scan(pages), number=args.repeat, repeat=5)) / args.repeat
+    t_new = min(timeit.repeat(lambda: scan_metadata(pages), number=args.repeat, repeat=5)) / args.repeat
+    print(f"pages: {len(pages)}")
+    print(f"separate rescans: {t_old*1e6:9.1f} us/doc")
+    print(f"single-pass scan: {t_new*1e6:9.1f} us/doc")
+    print(f"speedup:          {t_old/t_new:9.2f}x")
+
+if __name__ == "__main__":
+    main()
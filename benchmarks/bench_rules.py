@@ -0,0 +1,59 @@
+"""Micro-benchmark: compiled block-rule dispatcher vs. the hand-written classification chain.
+
+Blocks come from synthetic memo pages (see synth.py), so no PDF is needed.
+Usage: python benchmarks/bench_rules.py [--pages N] [--repeat N] [--rules NAME|FILE]
+"""
+import argparse, os, re, sys, timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, HERE)
+from synth import memo_lines  # noqa: E402
+from seward.parser import (coalesce_blocks, looks_like_head, annotate_para_classification,  # noqa: E402
+                           LETTER_HEAD_RE, NUMBER_POINT_RE)
+from seward.rules import get_ruleset  # noqa: E402
+
+# The chain build_doc_body used before rule packs, kept as the baseline.
+def legacy_classify(block, in_section):
+    mL = LETTER_HEAD_RE.match(block)
+    if mL and 0 < len(mL.group(2)) < 140:
+        return "section", mL.group(1), mL.group(2).strip(), None
+    mN = NUMBER_POINT_RE.match(block)
+    if mN and in_section:
+        txt, pcl = annotate_para_classification(mN.group(2).strip())
+        return "item", mN.group(1), txt, pcl
+    if looks_like_head(block):
+        return "head", None, re.sub(r"\s+", " ", block).strip().rstrip(":"), None
+    txt, pcl = annotate_para_classification(block)
+    return "para", None, txt, pcl
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--pages", type=int, default=500)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--rules", default=None, help="Rule pack to time (default: memo, which is also checked against the chain)")
+    args = ap.parse_args()
+
+    blocks = [b for page in memo_lines(args.pages) for b in coalesce_blocks(page)]
+    cases = [(b, s) for b in blocks for s in (False, True)]
+    classify = get_ruleset(args.rules).classify
+    if not args.rules:
+        for b, s in cases:
+            rule, n, txt, pcl = classify(b, s)
+            assert (rule.action, n, txt, pcl) == legacy_classify(b, s), f"rule pack disagrees on {b!r}"
+
+    def run(fn):
+        for b, s in cases:
+            fn(b, s)
+    # Alternate the two so a change in machine load affects both alike; keep each one's best run.
+    t_old = t_new = float("inf")
+    for _ in range(args.repeat):
+        t_old = min(t_old, timeit.timeit(lambda: run(legacy_classify), number=1))
+        t_new = min(t_new, timeit.timeit(lambda: run(classify), number=1))
+    print(f"blocks: {len(cases)} ({args.pages} pages, in and out of a section)")
+    print(f"hand-written chain: {t_old / len(cases) * 1e9:7.0f} ns/block")
+    print(f"compiled rules:     {t_new / len(cases) * 1e9:7.0f} ns/block")
+    print(f"speedup:            {t_old / t_new:7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Load test for `seward serve`: requests/sec and latency under concurrent clients.
+
+Starts a local server (unless --url is given), then sends --requests POSTs from
+--concurrency keep-alive clients:
+
+  python benchmarks/loadtest.py --requests 200 --concurrency 8
+  python benchmarks/loadtest.py --endpoint validate --url http://127.0.0.1:8750
+  python benchmarks/loadtest.py --cli 5     # also time 5 one-shot `seward.cli convert` runs for comparison
+"""
+import argparse, http.client, json, os, subprocess, sys, tempfile, threading, time
+from urllib.parse import urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+from synth import make_memo_pdf  # noqa: E402
+
+def start_server(workers):
+    proc = subprocess.Popen([sys.executable, "-m", "seward.cli", "serve", "--port", "0"] +
+                            (["--workers", str(workers)] if workers else []),
+                            cwd=os.path.join(HERE, ".."), stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()  # "Serving on http://HOST:PORT (...)"
+    if not line.startswith("Serving on "):
+        proc.kill()
+        sys.exit(f"server did not start: {line!r}")
+    return proc, line.split()[2]
+
+def percentile(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))] if xs else None
+
+def load(url, path, body, headers, n, concurrency):
+    u = urlsplit(url)
+    latencies = []; statuses = {}; lock = threading.Lock()
+    todo = iter(range(n))
+
+    def client():
+        conn = http.client.HTTPConnection(u.hostname, u.port, timeout=300)
+        while True:
+            with lock:
+                if next(todo, None) is None:
+                    break
+            t0 = time.perf_counter()
+            try:
+                conn.request("POST", path, body=body, headers=headers)
+                resp = conn.getresponse(); resp.read()
+                status = resp.status
+            except (OSError, http.client.HTTPException) as e:
+                status = type(e).__name__
+                conn.close(); conn = http.client.HTTPConnection(u.hostname, u.port, timeout=300)
+            dt = time.perf_counter() - t0
+            with lock:
+                latencies.append(dt); statuses[status] = statuses.get(status, 0) + 1
+        conn.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    wall = time.perf_counter() - t0
+    ok = statuses.get(200, 0)
+    return {"requests": n, "concurrency": concurrency, "seconds": wall, "requests_per_sec": ok / wall,
+            "statuses": {str(k): v for k, v in statuses.items()},
+            "latency_ms": {f"p{p}": percentile(latencies, p) * 1000 for p in (50, 95, 99)}}
+
+def time_cli(pdf, backend, n):
+    # The per-request cost a caller pays when spawning the CLI instead.
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(n):
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable, "-m", "seward.cli", "convert", "--pdf", pdf, "--out", os.path.join(tmp, "o.xml"),
+                            "--backend", backend], cwd=os.path.join(HERE, ".."), check=True, capture_output=True)
+            runs.append(time.perf_counter() - t0)
+    return {"runs": n, "seconds_per_request": sum(runs) / n, "requests_per_sec": n / sum(runs)}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--url", help="Existing server (default: start one locally)")
+    ap.add_argument("--endpoint", choices=["convert", "validate"], default="convert")
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--pages", type=int, default=5, help="Size of the synthetic PDF (default: %(default)s)")
+    ap.add_argument("--pdf", help="Use this PDF instead of a synthetic one")
+    ap.add_argument("--backend", default="pdfium")
+    ap.add_argument("--workers", type=int, default=None, help="Workers for the local server")
+    ap.add_argument("--cli", type=int, default=0, help="Also time N one-shot CLI conversions for comparison")
+    ap.add_argument("--out", help="Write the results as JSON")
+    args = ap.parse_args()
+
+    proc = None
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = args.pdf or make_memo_pdf(os.path.join(tmp, "memo.pdf"), args.pages)
+        url = args.url
+        if not url:
+            proc, url = start_server(args.workers)
+        try:
+            u = urlsplit(url)
+            conn = http.client.HTTPConnection(u.hostname, u.port)
+            with open(pdf, "rb") as fh:
+                body = fh.read()
+            if args.endpoint == "validate":
+                conn.request("POST", f"/convert?backend={args.backend}", body=body)
+                body = conn.getresponse().read()
+            conn.request("GET", "/health")
+            health = json.loads(conn.getresponse().read())
+            conn.close()
+            path = f"/convert?backend={args.backend}" if args.endpoint == "convert" else "/validate"
+            result = load(url, path, body, {"Content-Type": "application/octet-stream"}, args.requests, args.concurrency)
+        finally:
+            if proc:
+                proc.terminate(); proc.wait()
+        result.update(endpoint=args.endpoint, server_workers=health["workers"], body_bytes=len(body))
+        print(f"{args.endpoint}: {result['requests_per_sec']:.1f} req/s over {result['seconds']:.2f}s "
+              f"({args.concurrency} clients, {health['workers']} workers); latency p50 {result['latency_ms']['p50']:.1f} ms, "
+              f"p95 {result['latency_ms']['p95']:.1f} ms; statuses {result['statuses']}")
+        if args.cli:
+            result["cli"] = time_cli(pdf, args.backend, args.cli)
+            print(f"one-shot CLI: {result['cli']['seconds_per_request'] * 1000:.0f} ms per conversion "
+                  f"({result['cli']['requests_per_sec']:.1f} req/s, sequential)")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Pipeline benchmarks on a synthetic corpus; results are written as JSON.
+
+Times extract_pages (per PDF size and backend), build_doc_div,
+append_to_volume and the byte-splice append against volumes of growing size,
+and validate_with_schemas on its own. Compare two runs to catch regressions between releases:
+
+  python benchmarks/run.py --out bench.json
+  python benchmarks/run.py --out new.json --compare bench.json [--tolerance 0.25]
+"""
+import argparse, copy, json, os, platform, sys, tempfile, time
+from datetime import datetime, timezone
+from lxml import etree
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from seward import __version__  # noqa: E402
+from seward.parser import extract_pages  # noqa: E402
+from seward.tei import build_doc_div, wrap_as_tei, append_to_volume, append_many_to_volume, splice_into_volume  # noqa: E402
+from seward.validate import validate_with_schemas, clear_compiled  # noqa: E402
+from synth import make_corpus  # noqa: E402
+
+SCHEMA_DIR = os.path.join(os.path.dirname(__file__), "..", "schema")
+# Stand-ins when schema/frus.rng or schema/frus.sch are not present.
+RNG = b"""<grammar xmlns="http://relaxng.org/ns/structure/1.0" ns="http://www.tei-c.org/ns/1.0"
+  datatypeLibrary="http://www.w3.org/2001/XMLSchema-datatypes">
+  <start><ref name="any"/></start>
+  <define name="any"><element><anyName/><zeroOrMore><choice>
+    <attribute><anyName/></attribute><text/><ref name="any"/></choice></zeroOrMore></element></define>
+</grammar>"""
+SCH = b"""<schema xmlns="http://purl.oclc.org/dsdl/schematron">
+  <ns prefix="tei" uri="http://www.tei-c.org/ns/1.0"/>
+  <pattern><rule context="tei:div[@type='document']">
+    <assert test="tei:docNumber">A document needs a docNumber.</assert>
+    <assert test="count(//tei:div[@xml:id = current()/@xml:id]) = 1">Duplicate xml:id.</assert>
+  </rule></pattern>
+</schema>"""
+
+def schema(name, default):
+    path = os.path.join(SCHEMA_DIR, name)
+    if os.path.exists(path):
+        with open(path, "rb") as fh:
+            return fh.read(), path
+    return default, "builtin"
+
+def timed(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter(); fn(); runs.append(time.perf_counter() - t0)
+    return runs
+
+def record(results, name, size, unit, runs, **extra):
+    r = {"name": name, "size": size, "unit": unit, "seconds": min(runs), "runs": runs}
+    r.update(extra)
+    results.append(r)
+    print(f"{name:<22} {size:>6} {unit:<6} {min(runs)*1000:10.1f} ms", flush=True)
+
+def make_volume(div, n_docs):
+    # n_docs copies of one document, renumbered, in a minimal volume.
+    vol = wrap_as_tei(div, "bench")
+    body = vol.find(".//{http://www.tei-c.org/ns/1.0}div[@type='document']").getparent()
+    for i in range(2, n_docs + 1):
+        d = etree.fromstring(etree.tostring(div))
+        d.set("{http://www.w3.org/XML/1998/namespace}id", f"d{i}")
+        body.append(d)
+    return etree.tostring(vol, pretty_print=True, xml_declaration=True, encoding="utf-8")
+
+def run(args):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = make_corpus(args.corpus or tmp, args.pages, args.seed)
+        pages_by_size = {}
+        for n, path in sorted(corpus.items()):
+            runs = timed(lambda: pages_by_size.__setitem__(n, extract_pages(path)), args.repeat)
+            record(results, "extract_pages", n, "pages", runs, pages_per_sec=n / min(runs))
+            for backend in args.backends:
+                runs = timed(lambda: extract_pages(path, backend=backend), args.repeat)
+                record(results, f"extract_pages_{backend}", n, "pages", runs, pages_per_sec=n / min(runs))
+            if args.workers > 1 and n >= 16:
+                runs = timed(lambda: extract_pages(path, workers=args.workers), args.repeat)
+                record(results, "extract_pages_sharded", n, "pages", runs, workers=args.workers, pages_per_sec=n / min(runs))
+        for n, pages in sorted(pages_by_size.items()):
+            record(results, "build_doc_div", n, "pages", timed(lambda: build_doc_div(pages, "bench", "d1", "1"), args.repeat))
+
+        small = build_doc_div(pages_by_size[min(pages_by_size)], "bench", "d1", "1")
+        new_div = build_doc_div(pages_by_size[max(pages_by_size)], "bench", "dX", "X")
+        rng, rng_src = schema("frus.rng", RNG)
+        sch, sch_src = schema("frus.sch", SCH)
+        for n_docs in args.volume_docs:
+            vol = make_volume(small, n_docs)
+            record(results, "append_to_volume", n_docs, "docs", timed(lambda: append_to_volume(vol, copy.deepcopy(new_div)), args.repeat), volume_bytes=len(vol))
+            record(results, "append_many_10", n_docs, "docs", timed(lambda: append_many_to_volume(vol, [copy.deepcopy(new_div) for _ in range(10)]), args.repeat))
+            record(results, "splice_append", n_docs, "docs", timed(lambda: splice_into_volume(vol, copy.deepcopy(new_div)), args.repeat))
+            clear_compiled()
+            t0 = time.perf_counter(); validate_with_schemas(vol, rng, sch); cold = time.perf_counter() - t0
+            record(results, "validate_with_schemas", n_docs, "docs", timed(lambda: validate_with_schemas(vol, rng, sch), args.repeat),
+                   cold_seconds=cold, rng=rng_src, sch=sch_src)
+    return results
+
+def compare(results, baseline, tolerance):
+    old = {(r["name"], r["size"]): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        prev = old.get((r["name"], r["size"]))
+        if prev and r["seconds"] > prev * (1 + tolerance):
+            regressions.append(f"{r['name']} [{r['size']} {r['unit']}]: {prev*1000:.1f} ms -> {r['seconds']*1000:.1f} ms "
+                               f"(+{(r['seconds'] / prev - 1) * 100:.0f}%)")
+    return regressions
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--out", default="bench.json")
+    ap.add_argument("--pages", type=int, nargs="+", default=[1, 50, 500], help="Synthetic PDF sizes")
+    ap.add_argument("--volume-docs", type=int, nargs="+", default=[10, 100, 1000], help="Volume sizes for append/validate")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--workers", type=int, default=0, help="Also time page-sharded extraction with N workers")
+    ap.add_argument("--backends", nargs="+", default=["pdfium"], help="Also time extraction with these non-default backends")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--corpus", help="Keep the generated PDFs in this directory")
+    ap.add_argument("--compare", help="Baseline JSON from an earlier run")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs. the baseline (0.25 = 25%%)")
+    args = ap.parse_args()
+
+    results = run(args)
+    report = {
+        "seward": __version__, "python": platform.python_version(), "platform": platform.platform(),
+        "cpus": os.cpu_count(), "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "corpus")},
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Wrote {args.out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            regressions = compare(results, json.load(fh), args.tolerance)
+        for line in regressions:
+            print("REGRESSION " + line)
+        if regressions:
+            sys.exit(1)
+        print("No regressions beyond tolerance.")
+
+if __name__ == "__main__":
+    main()
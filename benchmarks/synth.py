@@ -0,0 +1,101 @@
+"""Synthetic declassified-memo PDFs for benchmarks (no PDF library needed).
+
+Writes plain PDF 1.4 files with Helvetica text: a White House memo header,
+classification banners on every page, lettered sections, numbered points
+with (S)/(C)/(U) paragraph markers, and a FOR THE PRESIDENT signature.
+
+Usage: python benchmarks/synth.py OUT_DIR [--pages 1 50 500] [--seed N]
+"""
+import argparse, os, random
+
+WORDS = ("Soviet policy allies arms control negotiations economic pressure Moscow Warsaw "
+         "deterrence modernization strategic forces regional security assistance trade "
+         "credits technology transfer human rights dialogue restraint reciprocity").split()
+CLASSES = ["SECRET", "CONFIDENTIAL", "SECRET SENSITIVE"]
+MARKS = ["(S)", "(C)", "(U)", ""]
+LINES_PER_PAGE = 54
+
+def _esc(s):
+    return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_pdf(path, pages):
+    """Write pages (lists of text lines) as a minimal single-font PDF."""
+    objs = []
+    def add(b):
+        objs.append(b); return len(objs)
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    pages_id = add(b"")
+    kids = []
+    for lines in pages:
+        ops = ["BT", "/F1 10 Tf", "13 TL", "60 750 Td"]
+        ops += ["(%s) Tj T*" % _esc(ln) for ln in lines]
+        ops.append("ET")
+        data = "\n".join(ops).encode("latin-1", "replace")
+        content = add(b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+        kids.append(add(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+                        b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font, content)))
+    objs[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, catalog, xref)
+    with open(path, "wb") as fh:
+        fh.write(bytes(out))
+
+def _sentence(rng, n=14):
+    words = [rng.choice(WORDS) for _ in range(n)]
+    return " ".join(words).capitalize() + "."
+
+def memo_lines(n_pages, seed=0):
+    """Text lines for an n-page memo, one list per page."""
+    rng = random.Random(seed)
+    banner = rng.choice(CLASSES)
+    body = ["THE WHITE HOUSE", "WASHINGTON", "January 17, 1983", "",
+            "NATIONAL SECURITY DECISION DIRECTIVE 75", "",
+            "MEMORANDUM FOR: THE SECRETARY OF STATE; THE SECRETARY OF DEFENSE;",
+            "THE DIRECTOR OF CENTRAL INTELLIGENCE", "",
+            "SUBJECT: U.S. Relations with the USSR", ""]
+    room = (LINES_PER_PAGE - 4) * n_pages - len(body) - 4
+    section = 0; point = 0
+    while room > 0:
+        if point == 0 or rng.random() < 0.08:
+            body += ["%s. %s" % ("ABCDEFGHIJKLMNOPQRSTUVWXYZ"[section % 26], _sentence(rng, 5)[:-1]), ""]
+            section += 1; point = 0; room -= 2
+        point += 1
+        para = [" ".join(filter(None, ["%d." % point, rng.choice(MARKS), _sentence(rng)]))]
+        para += [_sentence(rng) for _ in range(rng.randint(1, 4))]
+        body += para + [""]
+        room -= len(para) + 1
+    body += ["", "FOR THE PRESIDENT:", "William P. Clark"]
+    per = LINES_PER_PAGE - 4
+    pages = []
+    for i in range(n_pages):
+        chunk = body[i * per:(i + 1) * per] if i < n_pages - 1 else body[i * per:]
+        pages.append([banner, ""] + chunk + ["", banner])
+    return pages
+
+def make_memo_pdf(path, n_pages, seed=0):
+    write_pdf(path, memo_lines(n_pages, seed))
+    return path
+
+def make_corpus(out_dir, sizes=(1, 50, 500), seed=0):
+    os.makedirs(out_dir, exist_ok=True)
+    return {n: make_memo_pdf(os.path.join(out_dir, f"memo_{n:04d}p.pdf"), n, seed + n) for n in sizes}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("out_dir")
+    ap.add_argument("--pages", type=int, nargs="+", default=[1, 50, 500])
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    for n, path in make_corpus(args.out_dir, args.pages, args.seed).items():
+        print(f"{n:5d} pages  {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Text-extraction backends behind extract_pages.
+
+A backend opens a PDF (path or binary file object) as a document with
+len(doc), doc.page_text(i) (0-based, "\\n" line ends) and close(); it also
+names itself, its library version and settings for the extraction cache key.
+
+- pdfplumber: the reference; builds full character/layout objects per page.
+- pdfium: pypdfium2's native text layer only (already installed with
+  pdfplumber), typically one to two orders of magnitude faster.
+"""
+import time, difflib
+
+DEFAULT_BACKEND = "pdfplumber"
+
+# Keyword arguments for pdfplumber's extract_text; part of the extraction cache key.
+TEXT_SETTINGS = {}
+
+class _PlumberDoc:
+    def __init__(self, pdf_path):
+        import pdfplumber
+        self.pdf = pdfplumber.open(pdf_path)
+
+    def __len__(self):
+        return len(self.pdf.pages)
+
+    def page_text(self, i):
+        page = self.pdf.pages[i]
+        try:
+            return page.extract_text(**TEXT_SETTINGS) or ""
+        finally:
+            page.close()  # drop the per-page object caches
+
+    def close(self):
+        self.pdf.close()
+
+class _PdfiumDoc:
+    def __init__(self, pdf_path):
+        import pypdfium2
+        self.pdf = pypdfium2.PdfDocument(pdf_path)
+
+    def __len__(self):
+        return len(self.pdf)
+
+    def page_text(self, i):
+        page = self.pdf[i]
+        textpage = page.get_textpage()
+        try:
+            return textpage.get_text_range().replace("\r\n", "\n").replace("\r", "\n")
+        finally:
+            textpage.close(); page.close()
+
+    def close(self):
+        self.pdf.close()
+
+class Backend:
+    def __init__(self, name, opener, version, settings):
+        self.name = name
+        self._opener = opener; self._version = version; self._settings = settings
+
+    def open(self, pdf_path):
+        return self._opener(pdf_path)
+
+    def version(self):
+        return self._version()
+
+    def cache_settings(self):
+        return self._settings()
+
+    def __repr__(self):
+        return f"Backend({self.name!r})"
+
+def _plumber_version():
+    import pdfplumber
+    return pdfplumber.__version__
+
+def _pdfium_version():
+    import pypdfium2
+    return f"{pypdfium2.version.PYPDFIUM_INFO}/{pypdfium2.version.PDFIUM_INFO}"
+
+BACKENDS = {
+    # The pdfplumber settings keep the cache keys written before backends existed.
+    "pdfplumber": Backend("pdfplumber", _PlumberDoc, _plumber_version, lambda: {"extract_text": TEXT_SETTINGS}),
+    "pdfium": Backend("pdfium", _PdfiumDoc, _pdfium_version, lambda: {"backend": "pdfium"}),
+}
+
+def get_backend(name=None):
+    try:
+        return BACKENDS[name or DEFAULT_BACKEND]
+    except KeyError:
+        raise ValueError(f"unknown extraction backend {name!r} (choose from {', '.join(BACKENDS)})") from None
+
+def page_lines(text):
+    return [ln.rstrip() for ln in text.splitlines()]
+
+def compare_backends(pdf_path, names=None):
+    """Extract pdf_path with each backend; report time and a line diff of each against the first."""
+    names = names or list(BACKENDS)
+    runs = []
+    for name in names:
+        backend = get_backend(name)
+        t0 = time.perf_counter()
+        doc = backend.open(pdf_path)
+        try:
+            texts = [doc.page_text(i) for i in range(len(doc))]
+        finally:
+            doc.close()
+        secs = time.perf_counter() - t0
+        runs.append({"backend": name, "version": backend.version(), "seconds": secs,
+                     "pages": len(texts), "pages_per_sec": len(texts) / secs if secs else None,
+                     "lines": [ln for t in texts for ln in page_lines(t)],
+                     "page_lines": [len(page_lines(t)) for t in texts]})
+    ref = runs[0]
+    for r in runs[1:]:
+        sm = difflib.SequenceMatcher(None, ref["lines"], r["lines"], autojunk=False)
+        r["vs"] = ref["backend"]
+        r["similarity"] = sm.ratio()
+        r["changed_lines"] = sum(max(i2 - i1, j2 - j1) for op, i1, i2, j1, j2 in sm.get_opcodes() if op != "equal")
+        r["diff"] = list(difflib.unified_diff(ref["lines"], r["lines"], ref["backend"], r["backend"], lineterm="", n=1))
+    return runs
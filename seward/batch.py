@@ -0,0 +1,156 @@
+import os, re, glob, json, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from lxml import etree
+from .parser import extract_pages, build_document_div
+from .tei import wrap_as_tei
+from .validate import validate_file
+from . import instrument, xmlio
+from .backends import get_backend
+
+COMMENT_RE = re.compile(r"(?:^|\s)#")
+
+def find_pdfs(src, recursive=False):
+    if os.path.isdir(src):
+        # Glob everything and filter: a *.pdf pattern is case-sensitive and would miss scans named MEMO.PDF.
+        pattern = os.path.join(src, "**", "*") if recursive else os.path.join(src, "*")
+    else:
+        pattern = src
+    return sorted(p for p in glob.glob(pattern, recursive=recursive) if p.lower().endswith(".pdf") and os.path.isfile(p))
+
+def output_path_for(pdf_path, out_dir, src=None):
+    # With src a directory, the PDF's subdirectory under it is mirrored under out_dir
+    # (so a/memo.pdf and b/memo.pdf don't both become out_dir/memo.xml).
+    if src is not None and os.path.isdir(src):
+        rel = os.path.relpath(pdf_path, src)
+    else:
+        rel = os.path.basename(pdf_path)
+    return os.path.join(out_dir, os.path.splitext(rel)[0] + ".xml")
+
+def _check_collisions(pairs):
+    seen = {}
+    for pdf, out in pairs:
+        key = os.path.normcase(os.path.abspath(out))
+        if key in seen:
+            raise ValueError(f"{seen[key]} and {pdf} would both be written to {out}")
+        seen[key] = pdf
+
+def is_up_to_date(pdf_path, out_path):
+    return os.path.exists(out_path) and os.path.getmtime(out_path) >= os.path.getmtime(pdf_path)
+
+def convert_one(pdf_path, out_path, volume_id, rng_bytes=None, sch_bytes=None, use_cache=False, backend=None, ocr=False, ocr_lang=None,
+                rules=None):
+    rec = {"pdf": pdf_path, "out": out_path, "status": "ok", "pages": 0, "seconds": 0.0}
+    t0 = time.perf_counter()
+    try:
+        # One process per PDF already; OCR runs in-process (workers=1).
+        with extract_pages(pdf_path, workers=1, use_cache=use_cache, backend=backend, ocr=ocr, ocr_lang=ocr_lang) as pages:
+            rec["pages"] = len(pages)
+            div = build_document_div(pages, volume_id, "dAUTO", "AUTO", rules)
+        tei = wrap_as_tei(div, volume_id)
+        os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+        with instrument.stage("serialize"):
+            xmlio.write_tree(tei, out_path)  # renamed into place when complete: --skip-existing never sees a partial file
+        if rng_bytes or sch_bytes:
+            rec["validation"] = validate_file(out_path, rng_bytes, sch_bytes, persist=use_cache)
+    except Exception as e:
+        rec["status"] = "error"
+        rec["error"] = f"{type(e).__name__}: {e}"
+    rec["seconds"] = round(time.perf_counter() - t0, 4)
+    return rec
+
+def convert_dir(src, out_dir, volume_id="frus1981-88v03", workers=None, skip_existing=False,
+                recursive=False, rng_bytes=None, sch_bytes=None, manifest_path=None, use_cache=False, backend=None,
+                ocr=False, ocr_lang=None, rules=None):
+    os.makedirs(out_dir, exist_ok=True)
+    t0 = time.perf_counter()
+    records = []
+    jobs = []
+    pairs = [(pdf, output_path_for(pdf, out_dir, src)) for pdf in find_pdfs(src, recursive)]
+    _check_collisions(pairs)
+    for pdf, out in pairs:
+        if skip_existing and is_up_to_date(pdf, out):
+            records.append({"pdf": pdf, "out": out, "status": "skipped", "pages": 0, "seconds": 0.0})
+        else:
+            jobs.append((pdf, out))
+
+    workers = workers or os.cpu_count() or 1
+    with instrument.stage("convert", pdfs=len(jobs), workers=workers):
+        if workers == 1 or len(jobs) <= 1:
+            for pdf, out in jobs:
+                records.append(convert_one(pdf, out, volume_id, rng_bytes, sch_bytes, use_cache, backend, ocr, ocr_lang, rules))
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+                futures = {pool.submit(convert_one, pdf, out, volume_id, rng_bytes, sch_bytes, use_cache, backend, ocr, ocr_lang, rules): (pdf, out) for pdf, out in jobs}
+                for fut in as_completed(futures):
+                    pdf, out = futures[fut]
+                    try:
+                        records.append(fut.result())
+                    except Exception as e:  # worker died (e.g. BrokenProcessPool)
+                        records.append({"pdf": pdf, "out": out, "status": "error", "pages": 0,
+                                        "seconds": 0.0, "error": f"{type(e).__name__}: {e}"})
+
+    records.sort(key=lambda r: r["pdf"])
+    manifest = {
+        "source": src,
+        "out_dir": out_dir,
+        "workers": workers,
+        "backend": get_backend(backend).name,
+        "ocr": ocr,
+        "total": len(records),
+        "converted": sum(r["status"] == "ok" for r in records),
+        "skipped": sum(r["status"] == "skipped" for r in records),
+        "failed": sum(r["status"] == "error" for r in records),
+        "pages": sum(r["pages"] for r in records),
+        "seconds": round(time.perf_counter() - t0, 4),
+        "files": records,
+    }
+    manifest_path = manifest_path or os.path.join(out_dir, "manifest.json")
+    with open(manifest_path, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2)
+    return manifest
+
+def read_pdf_list(manifest_path):
+    # One PDF path per line, in the desired append order; relative paths are
+    # taken from the manifest's directory, blank lines and # comments skipped.
+    # A comment starts the line or follows whitespace, so box#12/memo.pdf is a path.
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    out = []
+    with open(manifest_path, encoding="utf-8") as fh:
+        for ln in fh:
+            ln = COMMENT_RE.split(ln, 1)[0].strip()
+            if ln:
+                out.append(ln if os.path.isabs(ln) else os.path.join(base, ln))
+    return out
+
+def pdf_to_div_bytes(pdf_path, use_cache=False, backend=None, ocr=False, ocr_lang=None, rules=None):
+    with extract_pages(pdf_path, workers=1, use_cache=use_cache, backend=backend, ocr=ocr, ocr_lang=ocr_lang) as pages:
+        div = build_document_div(pages, "frus-volume", "dAUTO", "AUTO", rules)  # ids assigned at append time
+    return etree.tostring(div)
+
+def convert_to_divs(pdf_paths, workers=None, use_cache=False, backend=None, ocr=False, ocr_lang=None, rules=None):
+    """Convert PDFs to document divs in parallel, returned in input order.
+
+    Raises RuntimeError naming every PDF that failed, so nothing is appended
+    from a partially converted batch.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(pdf_paths)) or 1
+    results = []
+    with instrument.stage("convert", pdfs=len(pdf_paths), workers=workers):
+        if workers == 1:
+            for p in pdf_paths:
+                try:
+                    results.append(pdf_to_div_bytes(p, use_cache, backend, ocr, ocr_lang, rules))
+                except Exception as e:
+                    results.append(e)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(pdf_to_div_bytes, p, use_cache, backend, ocr, ocr_lang, rules) for p in pdf_paths]
+                for fut in futures:
+                    try:
+                        results.append(fut.result())
+                    except Exception as e:
+                        results.append(e)
+    failed = [f"{p}: {type(r).__name__}: {r}" for p, r in zip(pdf_paths, results) if isinstance(r, Exception)]
+    if failed:
+        raise RuntimeError(f"{len(failed)} PDF(s) failed to convert:\n  " + "\n  ".join(failed))
+    return [etree.fromstring(r) for r in results]
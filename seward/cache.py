@@ -0,0 +1,129 @@
+import os, json, gzip, hashlib, tempfile, warnings
+from . import ir
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Entry kinds, one subdirectory each: extracted pages per PDF (ir page files,
+# read through a memory mapping), OCR text per page image (gzipped JSON).
+KINDS = ("pages", "ocr")
+SUFFIXES = {"pages": ".ir", "ocr": ".json.gz"}
+RESCAN_PUTS = 100
+# This process's running estimate of the cache size, so put() walks the tree only when it
+# crosses the limit, or every RESCAN_PUTS puts to count entries other processes wrote.
+_usage = {"root": None, "bytes": 0, "puts": 0}
+
+def cache_root():
+    return os.environ.get("SEWARD_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "seward")
+
+def cache_dir(kind="pages"):
+    return os.path.join(cache_root(), kind)
+
+def max_bytes():
+    mb = os.environ.get("SEWARD_CACHE_MAX_MB")
+    return int(float(mb) * 1024 * 1024) if mb else DEFAULT_MAX_BYTES
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def cache_key(pdf_path, settings, version):
+    # Content hash + extractor version + settings: any of them changing is a miss.
+    h = hashlib.sha256()
+    h.update(file_sha256(pdf_path).encode())
+    h.update(version.encode())
+    h.update(json.dumps(settings, sort_keys=True).encode())
+    return h.hexdigest()
+
+def _entry_path(key, kind):
+    return os.path.join(cache_dir(kind), key[:2], key + SUFFIXES[kind])
+
+def get(key, kind="pages"):
+    # A "pages" hit is an ir.load()ed DocText: the caller closes it.
+    path = _entry_path(key, kind)
+    try:
+        if kind == "pages":
+            pages = ir.load(path)
+        else:
+            with gzip.open(path, "rt", encoding="utf-8") as fh:
+                pages = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    try:
+        os.utime(path)  # bump recency for LRU eviction
+    except OSError:
+        pass
+    return pages
+
+def put(key, pages, kind="pages"):
+    # Best effort: a cache that can't be written (read-only, full, bad SEWARD_CACHE_DIR) only costs speed.
+    try:
+        _put(key, pages, kind)
+    except OSError as e:
+        warnings.warn(f"seward cache not written, continuing without it: {e}", RuntimeWarning, stacklevel=2)
+
+def _put(key, pages, kind):
+    path = _entry_path(key, kind)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if kind == "pages":
+        (pages if isinstance(pages, ir.DocText) else ir.DocText.from_records(pages)).write(path)
+    else:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=3) as fh:
+                fh.write(json.dumps(pages, ensure_ascii=False).encode("utf-8"))
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+    _account(path)
+
+def _account(path):
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        size = 0
+    if (_usage["root"] != cache_root() or _usage["puts"] >= RESCAN_PUTS
+            or _usage["bytes"] + size > max_bytes()):
+        evict()
+    else:
+        _usage["bytes"] += size; _usage["puts"] += 1
+
+def _entries():
+    out = []
+    for kind in KINDS:
+        for dirpath, _, files in os.walk(cache_dir(kind)):
+            for f in files:
+                if f.endswith((".ir", ".json.gz")):  # .json.gz page entries from before ir files are evicted too
+                    p = os.path.join(dirpath, f)
+                    try:
+                        st = os.stat(p)
+                    except OSError:
+                        continue
+                    out.append((st.st_mtime, st.st_size, p))
+    return out
+
+def evict(limit=None):
+    limit = max_bytes() if limit is None else limit
+    entries = sorted(_entries())
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, p in entries:
+        if total <= limit:
+            break
+        try:
+            os.remove(p)
+        except OSError:
+            continue
+        total -= size; removed += 1
+    _usage.update(root=cache_root(), bytes=total, puts=0)
+    return removed
+
+def clear():
+    return evict(limit=0)
+
+def info():
+    entries = _entries()
+    return {"dir": cache_root(), "entries": len(entries), "bytes": sum(e[1] for e in entries), "max_bytes": max_bytes()}
@@ -1,8 +1,34 @@
-import argparse, sys, io, re
-from lxml import etree
-from .parser import extract_pages, build_document_div
-from .tei import wrap_as_tei, append_to_volume
-from .validate import validate_with_schemas
+import argparse, sys, os, io, re, json, time, signal, sqlite3
+from .parser import extract_pages, iter_pages, build_document_div
+from .tei import wrap_as_tei, append_many_to_file, write_doc_stream, splice_append_file
+from .validate import validate_with_schemas, validate_file, validate_volume_incremental, validate_file_incremental, status_path_for
+from .batch import convert_dir, convert_to_divs, read_pdf_list
+from . import cache, instrument, ocr, index, shards, dedupe, watch, volume, xmlio
+from .backends import BACKENDS, DEFAULT_BACKEND, compare_backends
+from .rules import get_ruleset, available as available_rules
+
+def _validate_file(src, args):
+    # Read the output back only when there is something to validate it against. src is the output's path,
+    # or the XML bytes of a shard directory assembled in memory.
+    if not (args.rng or args.sch):
+        return "Relax NG: skipped (no schema provided)\nSchematron: skipped (no schema provided)"
+    return (validate_with_schemas if isinstance(src, bytes) else validate_file)(src,
+        open(args.rng, "rb").read() if args.rng else None,
+        open(args.sch, "rb").read() if args.sch else None, persist=not args.no_cache)
+
+def _near_duplicates(args, pdfs, divs):
+    # Reports each new document that looks like one already indexed (or an earlier one in this batch).
+    db = index.connect(args.dedupe_db)
+    with instrument.stage("dedupe", docs=len(divs)):
+        if os.path.isfile(args.volume) or shards.is_sharded(args.volume):
+            index.update_index(db, [args.volume])
+        found = dedupe.check_batch(db, [(pdf, index.doc_record(div)["paras"]) for pdf, div in zip(pdfs, divs)],
+                                   args.dedupe_threshold)
+    for pdf, matches in zip(pdfs, found):
+        for m in matches:
+            where = f"{m['batch']} (same batch)" if m.get("batch") else f"{m['volume_id']}/{m['xml_id']} ({m['title'] or ''})"
+            print(f"Near-duplicate: {pdf} ~ {where}, {m['similarity']:.0%} similar", file=sys.stderr)
+    return any(found)
 
 def main():
     ap = argparse.ArgumentParser(prog="seward", description="Seward — FRUS TEI Converter")
@@ -16,39 +42,436 @@ def main():
     ap_convert.add_argument("--out", required=True, help="Path to output XML")
     ap_convert.add_argument("--rng", help="Optional path to frus.rng")
     ap_convert.add_argument("--sch", help="Optional path to frus.sch")
+    ap_convert.add_argument("--stream", action="store_true", help="Stream pages straight to the output file in bounded memory (for very large PDFs)")
+    ap_convert.add_argument("--no-cache", action="store_true", help="Bypass the on-disk extraction cache")
+    ap_convert.add_argument("--page-workers", type=int, default=None, help="Split page extraction across N processes (for very long PDFs)")
+    ap_convert.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND, help="Text extraction engine (default: %(default)s; pdfium is much faster, text layer only)")
+    ap_convert.add_argument("--ocr", action="store_true", help="OCR pages that have no text layer with tesseract (results cached per page image)")
+    ap_convert.add_argument("--ocr-lang", default="eng", help="Tesseract language(s), e.g. eng or eng+rus (default: eng)")
+    ap_convert.add_argument("--rules", default=None, help="Block rule pack: a built-in name (%s) or a YAML file (default: memo)" % ", ".join(available_rules()))
+    ap_convert.add_argument("--profile", metavar="TRACE.json", help="Write a JSON trace: time per stage, pages/sec, per-page extraction times, peak RSS")
 
-    ap_append = sub.add_parser("append", help="Append a PDF-converted doc to an existing volume (auto-increment ids)")
-    ap_append.add_argument("--pdf", required=True, help="Path to input PDF")
-    ap_append.add_argument("--volume", required=True, help="Path to existing FRUS volume XML to append into")
-    ap_append.add_argument("--out", required=True, help="Path to output (updated) volume XML")
+    ap_append = sub.add_parser("append", help="Append PDF-converted doc(s) to an existing volume (auto-increment ids)")
+    ap_append.add_argument("--pdf", nargs="+", help="Path(s) to input PDF(s); appended in the order given")
+    ap_append.add_argument("--manifest", help="Text file listing PDFs (one per line) in the desired append order; # starts a comment at the start of a line or after whitespace")
+    ap_append.add_argument("--workers", type=int, default=None, help="Processes for converting several PDFs (default: CPU count)")
+    ap_append.add_argument("--volume", required=True, help="Path to existing FRUS volume XML, or a shard directory, to append into")
+    ap_append.add_argument("--out", help="Path to output (updated) volume XML (optional for a shard directory, which is updated in place)")
     ap_append.add_argument("--rng", help="Optional path to frus.rng")
     ap_append.add_argument("--sch", help="Optional path to frus.sch")
+    ap_append.add_argument("--incremental", action="store_true", help="Validate only new/changed documents (status kept in OUT.valstatus.json)")
+    ap_append.add_argument("--fast", action="store_true", help="Splice the new document in without reparsing the volume (keeps all other bytes as-is)")
+    ap_append.add_argument("--journal", action="store_true", help="Append in place through VOLUME.journal: ids reserved under a lock and documents committed in id order, so several appends can run at once")
+    ap_append.add_argument("--no-cache", action="store_true", help="Bypass the on-disk extraction cache")
+    ap_append.add_argument("--page-workers", type=int, default=None, help="Split page extraction across N processes (for very long PDFs)")
+    ap_append.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND, help="Text extraction engine (default: %(default)s; pdfium is much faster, text layer only)")
+    ap_append.add_argument("--ocr", action="store_true", help="OCR pages that have no text layer with tesseract (results cached per page image)")
+    ap_append.add_argument("--ocr-lang", default="eng", help="Tesseract language(s), e.g. eng or eng+rus (default: eng)")
+    ap_append.add_argument("--rules", default=None, help="Block rule pack: a built-in name (%s) or a YAML file (default: memo)" % ", ".join(available_rules()))
+    ap_append.add_argument("--profile", metavar="TRACE.json", help="Write a JSON trace: time per stage, pages/sec, per-page extraction times, peak RSS")
+    ap_append.add_argument("--dedupe", choices=["off", "warn", "refuse"], default="off", help="Check new documents for near-duplicates in the target volume and the search index (default: off)")
+    ap_append.add_argument("--dedupe-db", default=index.DEFAULT_DB, help="Search index holding the fingerprints (default: %(default)s; the target volume is indexed into it)")
+    ap_append.add_argument("--dedupe-threshold", type=float, default=dedupe.DEFAULT_THRESHOLD, help="Estimated text similarity that counts as a duplicate (default: %(default)s)")
+
+    ap_dir = sub.add_parser("convert-dir", help="Convert a directory (or glob) of PDFs into standalone TEI files in parallel")
+    ap_dir.add_argument("src", help="Directory of PDFs or a glob pattern (quote it)")
+    ap_dir.add_argument("--out-dir", required=True, help="Directory for output XML files")
+    ap_dir.add_argument("--volume-id", default="frus1981-88v03", help="Volume xml:id (default: frus1981-88v03)")
+    ap_dir.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    ap_dir.add_argument("--recursive", action="store_true", help="Descend into subdirectories (mirrored under --out-dir)")
+    ap_dir.add_argument("--skip-existing", action="store_true", help="Skip PDFs whose output is newer than the input")
+    ap_dir.add_argument("--no-cache", action="store_true", help="Bypass the on-disk extraction cache")
+    ap_dir.add_argument("--manifest", help="Path to summary manifest JSON (default: OUT_DIR/manifest.json)")
+    ap_dir.add_argument("--rng", help="Optional path to frus.rng")
+    ap_dir.add_argument("--sch", help="Optional path to frus.sch")
+    ap_dir.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND, help="Text extraction engine (default: %(default)s; pdfium is much faster, text layer only)")
+    ap_dir.add_argument("--ocr", action="store_true", help="OCR pages that have no text layer with tesseract (results cached per page image)")
+    ap_dir.add_argument("--ocr-lang", default="eng", help="Tesseract language(s), e.g. eng or eng+rus (default: eng)")
+    ap_dir.add_argument("--rules", default=None, help="Block rule pack: a built-in name (%s) or a YAML file (default: memo)" % ", ".join(available_rules()))
+    ap_dir.add_argument("--profile", metavar="TRACE.json", help="Write a JSON trace: time per stage, pages/sec, per-page extraction times, peak RSS")
+
+    ap_watch = sub.add_parser("watch", help="Watch a folder and convert PDFs as they arrive (persistent, resumable queue)")
+    ap_watch.add_argument("src", help="Directory to watch for PDFs")
+    ap_watch.add_argument("--out-dir", required=True, help="Directory for output XML, validation reports and the job queue")
+    ap_watch.add_argument("--volume-id", default="frus1981-88v03", help="Volume xml:id (default: frus1981-88v03)")
+    ap_watch.add_argument("--workers", type=int, default=None, help="Concurrent conversions (default: CPU count)")
+    ap_watch.add_argument("--interval", type=float, default=2.0, help="Seconds between folder scans (default: %(default)s)")
+    ap_watch.add_argument("--settle", type=float, default=watch.SETTLE_SECONDS, help="Only pick up PDFs unchanged for this many seconds (default: %(default)s)")
+    ap_watch.add_argument("--recursive", action="store_true", help="Descend into subdirectories (mirrored under --out-dir)")
+    ap_watch.add_argument("--once", action="store_true", help="Exit when the queue is drained instead of watching forever")
+    ap_watch.add_argument("--no-cache", action="store_true", help="Bypass the on-disk extraction cache")
+    ap_watch.add_argument("--rng", help="Optional path to frus.rng")
+    ap_watch.add_argument("--sch", help="Optional path to frus.sch")
+    ap_watch.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND, help="Text extraction engine (default: %(default)s; pdfium is much faster, text layer only)")
+    ap_watch.add_argument("--rules", default=None, help="Block rule pack: a built-in name (%s) or a YAML file (default: memo)" % ", ".join(available_rules()))
+    ap_watch.add_argument("--ocr", action="store_true", help="OCR pages that have no text layer with tesseract (results cached per page image)")
+    ap_watch.add_argument("--ocr-lang", default="eng", help="Tesseract language(s), e.g. eng or eng+rus (default: eng)")
+
+    ap_wstat = sub.add_parser("watch-status", help="Show queue depth and throughput of a watch folder")
+    ap_wstat.add_argument("out_dir", help="The watcher's --out-dir")
+    ap_wstat.add_argument("--json", action="store_true", help="Print the status as JSON")
+
+    ap_serve = sub.add_parser("serve", help="Run the HTTP API (convert/append/validate) with a warm worker pool")
+    ap_serve.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: %(default)s)")
+    ap_serve.add_argument("--port", type=int, default=8750, help="Port (default: %(default)s)")
+    ap_serve.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    ap_serve.add_argument("--max-concurrent", type=int, default=None, help="Requests worked on at once (default: 2 x workers)")
+    ap_serve.add_argument("--max-queue", type=int, default=64, help="Requests allowed to wait before answering 503 (default: %(default)s)")
+    ap_serve.add_argument("--max-body-mb", type=int, default=200, help="Largest request body in MiB (default: %(default)s)")
+    ap_serve.add_argument("--rng", help="Optional path to frus.rng (compiled once per worker)")
+    ap_serve.add_argument("--sch", help="Optional path to frus.sch (compiled once per worker)")
+
+    ap_cmp = sub.add_parser("compare-backends", help="Time each extraction backend on a PDF and diff their text line by line")
+    ap_cmp.add_argument("--pdf", required=True, help="Path to input PDF")
+    ap_cmp.add_argument("--backends", nargs="+", choices=sorted(BACKENDS), help="Backends to compare; the first is the reference (default: all)")
+    ap_cmp.add_argument("--diff-lines", type=int, default=40, help="Diff lines to print per backend (0: all)")
+    ap_cmp.add_argument("--json", metavar="OUT.json", help="Also write the full comparison as JSON")
+
+    ap_index = sub.add_parser("index", help="Build or update the SQLite search index over volume XML files")
+    ap_index.add_argument("paths", nargs="+", help="Volume XML files and/or directories of them")
+    ap_index.add_argument("--db", default=index.DEFAULT_DB, help="Index database (default: %(default)s)")
+    ap_index.add_argument("--recursive", action="store_true", help="Descend into subdirectories")
+
+    ap_query = sub.add_parser("query", help="Look up documents in the search index")
+    ap_query.add_argument("--db", default=index.DEFAULT_DB, help="Index database (default: %(default)s)")
+    ap_query.add_argument("--id", dest="xml_id", help="Document xml:id, e.g. d260")
+    ap_query.add_argument("--volume", help="Volume xml:id or file path")
+    ap_query.add_argument("--from", dest="date_from", help="Earliest docDate@when (YYYY-MM-DD)")
+    ap_query.add_argument("--to", dest="date_to", help="Latest docDate@when (YYYY-MM-DD)")
+    ap_query.add_argument("--class", dest="classification", help="Classification marking, e.g. SECRET")
+    ap_query.add_argument("--text", help='Full-text query over paragraphs (FTS5 syntax: \'"arms control"\', \'NEAR(a b)\', \'grain OR wheat\')')
+    ap_query.add_argument("--limit", type=int, default=50, help="Maximum documents (default: %(default)s)")
+    ap_query.add_argument("--json", action="store_true", help="Print results as JSON")
+
+    ap_shards = sub.add_parser("shards", help="Split a volume into per-document shards, or assemble shards into a volume")
+    shards_sub = ap_shards.add_subparsers(dest="shards_cmd", required=True)
+    ap_split = shards_sub.add_parser("split", help="Write VOLUME as a shard directory (one file per document + manifest)")
+    ap_split.add_argument("volume", help="Path to FRUS volume XML")
+    ap_split.add_argument("--out", required=True, help="Shard directory to create")
+    ap_asm = shards_sub.add_parser("assemble", help="Stream a shard directory into a full volume XML")
+    ap_asm.add_argument("shard_dir", help="Shard directory")
+    ap_asm.add_argument("--out", required=True, help="Path to output volume XML")
+
+    ap_jrn = sub.add_parser("journal", help="Inspect or drive the journal behind append --journal")
+    jrn_sub = ap_jrn.add_subparsers(dest="journal_cmd", required=True)
+    ap_jstatus = jrn_sub.add_parser("status", help="Outstanding reservations and staged documents")
+    ap_jcommit = jrn_sub.add_parser("commit", help="Append the staged documents that can go in now")
+    ap_jrelease = jrn_sub.add_parser("release", help="Give back ids reserved by a worker that died; staged documents after them move up to fill the gap, and commit")
+    for p in (ap_jstatus, ap_jcommit, ap_jrelease):
+        p.add_argument("volume", help="Path to FRUS volume XML or shard directory")
+    ap_jrelease.add_argument("xml_ids", nargs="+", help="Reserved ids, e.g. d262")
+    ap_jstatus.add_argument("--json", action="store_true", help="Print the status as JSON")
+
+    ap_vol = sub.add_parser("volume", help="List, extract, count or check documents of a volume in constant memory")
+    vol_sub = ap_vol.add_subparsers(dest="volume_cmd", required=True)
+    ap_vls = vol_sub.add_parser("ls", help="One line per document: xml:id, docNumber, date, pages, paragraphs, title")
+    ap_vget = vol_sub.add_parser("get", help="Print one document div (reading stops after it)")
+    ap_vstats = vol_sub.add_parser("stats", help="Document, page, paragraph and note counts, date range")
+    ap_vcheck = vol_sub.add_parser("check", help="Check that document ids are consecutive (d259, d260, ...) with matching docNumbers (exit status 1 if not)")
+    for p in (ap_vls, ap_vget, ap_vstats, ap_vcheck):
+        p.add_argument("volume", help="Path to FRUS volume XML")
+    ap_vget.add_argument("xml_id", help="Document xml:id, e.g. d260")
+    ap_vget.add_argument("--out", help="Write to this file instead of stdout")
+    for p in (ap_vls, ap_vstats, ap_vcheck):
+        p.add_argument("--json", action="store_true", help="Print results as JSON")
+
+    ap_cache = sub.add_parser("cache", help="Inspect or clear the PDF extraction cache")
+    ap_cache.add_argument("action", choices=["info", "clear"], help="info: show size/location; clear: delete all entries")
 
     args = ap.parse_args()
+    if getattr(args, "ocr", False) and not ocr.available():
+        ap.error("--ocr needs tesseract on PATH (or SEWARD_TESSERACT pointing at it)")
+    if getattr(args, "rules", None):
+        try:
+            get_ruleset(args.rules)  # fail before any PDF is read
+        except (OSError, ValueError) as e:
+            ap.error(f"--rules: {e}")
+    if not getattr(args, "profile", None):
+        return run(args, ap)
+    with instrument.Trace() as trace:
+        rc = run(args, ap)
+    report = trace.write(args.profile, command=args.cmd, argv=sys.argv[1:])
+    pps = report["pages"]["pages_per_sec"]
+    print(f"Profile: {report['wall_seconds']:.2f}s, " + ", ".join(f"{k} {v['seconds']:.2f}s" for k, v in report["stages"].items())
+          + (f", {pps:.1f} pages/s" if pps else "") + f" -> {args.profile}", file=sys.stderr)
+    return rc
+
+def run(args, ap):
+    if args.cmd == "convert" and args.stream:
+        with xmlio.atomic_output(args.out) as fh:
+            write_doc_stream(iter_pages(args.pdf, args.backend, args.ocr, args.ocr_lang, not args.no_cache), fh, args.volume_id, args.doc_id, args.doc_number, args.rules)
+        print(_validate_file(args.out, args))
+        return 0
 
     if args.cmd == "convert":
-        pages = extract_pages(args.pdf)
-        div = build_document_div(pages, args.volume_id, args.doc_id, args.doc_number)
+        pages = extract_pages(args.pdf, workers=args.page_workers, use_cache=not args.no_cache, backend=args.backend,
+                              ocr=args.ocr, ocr_lang=args.ocr_lang)
+        div = build_document_div(pages, args.volume_id, args.doc_id, args.doc_number, args.rules)
         tei = wrap_as_tei(div, args.volume_id)
-        data = etree.tostring(tei, pretty_print=True, xml_declaration=True, encoding="utf-8")
-        open(args.out, "wb").write(data)
-        report = validate_with_schemas(data,
-            open(args.rng, "rb").read() if args.rng else None,
-            open(args.sch, "rb").read() if args.sch else None)
-        print(report)
+        with instrument.stage("serialize"):
+            xmlio.write_tree(tei, args.out)
+        print(_validate_file(args.out, args))
         return 0
 
     if args.cmd == "append":
-        pages = extract_pages(args.pdf)
-        div = build_document_div(pages, "frus-volume", "dAUTO", "AUTO")  # placeholders overridden in append
-        volume_bytes = open(args.volume, "rb").read()
-        updated = append_to_volume(volume_bytes, etree.fromstring(etree.tostring(div)))
-        open(args.out, "wb").write(updated)
-        report = validate_with_schemas(updated,
-            open(args.rng, "rb").read() if args.rng else None,
-            open(args.sch, "rb").read() if args.sch else None)
+        pdfs = (args.pdf or []) + (read_pdf_list(args.manifest) if args.manifest else [])
+        if not pdfs:
+            ap.error("append: give --pdf and/or --manifest")
+        if len(pdfs) == 1:
+            pages = extract_pages(pdfs[0], workers=args.page_workers, use_cache=not args.no_cache, backend=args.backend,
+                                  ocr=args.ocr, ocr_lang=args.ocr_lang)
+            divs = [build_document_div(pages, "frus-volume", "dAUTO", "AUTO", args.rules)]  # placeholders overridden in append
+        else:
+            try:
+                divs = convert_to_divs(pdfs, workers=args.workers, use_cache=not args.no_cache, backend=args.backend,
+                                       ocr=args.ocr, ocr_lang=args.ocr_lang, rules=args.rules)
+            except RuntimeError as e:
+                print(f"Volume not updated. {e}", file=sys.stderr)
+                return 1
+        if args.dedupe != "off" and _near_duplicates(args, pdfs, divs) and args.dedupe == "refuse":
+            print("Volume not updated: near-duplicate document(s) (use --dedupe warn to append anyway).", file=sys.stderr)
+            return 1
+        src = args.out  # what gets validated: the output file, or an assembled shard directory
+        if args.journal:
+            from . import journal  # flock: POSIX only, so not imported unless asked for
+            if args.out and os.path.abspath(args.out) != os.path.abspath(args.volume):
+                ap.error("append --journal: the volume is updated in place (drop --out)")
+            try:
+                ids, committed = journal.append(args.volume, divs)
+            except ValueError as e:  # a reservation released under us: this run's documents were not staged
+                print(f"Volume not updated. {e}", file=sys.stderr)
+                return 1
+            except RuntimeError as e:
+                print(f"Volume not updated. {e} (staged documents stay in {journal.journal_dir(args.volume)})", file=sys.stderr)
+                return 1
+            print(f"Reserved {', '.join(ids)}; committed " + (", ".join(committed) or "none yet (waiting for earlier reservations)"))
+            src = shards.assemble_bytes(args.volume) if shards.is_sharded(args.volume) and (args.rng or args.sch) else args.volume
+        elif shards.is_sharded(args.volume):
+            new_ids = shards.append_docs(args.volume, divs)
+            print("Appended " + ", ".join(new_ids) + f" to {args.volume}")
+            if not args.out:
+                if not (args.rng or args.sch):
+                    print(_validate_file(args.volume, args))  # nothing to validate against: skip assembling
+                    return 0
+                src = shards.assemble_bytes(args.volume)
+            else:
+                with xmlio.atomic_output(args.out) as fh:
+                    shards.assemble(args.volume, fh)
+        elif not args.out:
+            ap.error("append: --out is required unless --volume is a shard directory")
+        elif args.fast:
+            new_ids = splice_append_file(args.volume, divs, args.out)
+            print("Appended " + ", ".join(new_ids))
+        else:
+            append_many_to_file(args.volume, divs, args.out)
+        if args.incremental:
+            incremental = validate_volume_incremental if isinstance(src, bytes) else validate_file_incremental
+            report = incremental(src,
+                status_path_for(args.out or args.volume.rstrip(os.sep)),
+                open(args.rng, "rb").read() if args.rng else None,
+                open(args.sch, "rb").read() if args.sch else None, persist=not args.no_cache)
+        else:
+            report = _validate_file(src, args)
         print(report)
         return 0
 
+    if args.cmd == "convert-dir":
+        try:
+            manifest = convert_dir(args.src, args.out_dir, args.volume_id, workers=args.workers,
+                skip_existing=args.skip_existing, recursive=args.recursive,
+                rng_bytes=open(args.rng, "rb").read() if args.rng else None,
+                sch_bytes=open(args.sch, "rb").read() if args.sch else None,
+                manifest_path=args.manifest, use_cache=not args.no_cache, backend=args.backend,
+                ocr=args.ocr, ocr_lang=args.ocr_lang, rules=args.rules)
+        except ValueError as e:  # two PDFs that map to the same output file
+            ap.error(f"convert-dir: {e}")
+        print(f"{manifest['converted']} converted, {manifest['skipped']} skipped, {manifest['failed']} failed "
+              f"({manifest['pages']} pages in {manifest['seconds']:.2f}s)")
+        for r in manifest["files"]:
+            if r["status"] == "error":
+                print(f"  FAILED {r['pdf']}: {r['error']}")
+        return 1 if manifest["failed"] else 0
+
+    if args.cmd == "watch":
+        print(f"Watching {args.src} -> {args.out_dir} (Ctrl-C to stop; progress is kept in {watch.queue_path(args.out_dir)})")
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))  # stop like Ctrl-C so running jobs are requeued
+        try:
+            counts = watch.watch(args.src, args.out_dir, args.volume_id, workers=args.workers, interval=args.interval,
+                settle=args.settle, recursive=args.recursive,
+                rng_bytes=open(args.rng, "rb").read() if args.rng else None,
+                sch_bytes=open(args.sch, "rb").read() if args.sch else None,
+                use_cache=not args.no_cache, backend=args.backend, ocr=args.ocr, ocr_lang=args.ocr_lang,
+                rules=args.rules, once=args.once, log=lambda msg: print(msg, flush=True))
+        except KeyboardInterrupt:
+            print("Stopped; unfinished jobs stay queued.")
+            return 0
+        print(f"{counts['converted']} converted, {counts['failed']} failed")
+        return 1 if counts["failed"] else 0
+
+    if args.cmd == "watch-status":
+        try:
+            st = watch.status(args.out_dir)
+        except FileNotFoundError as e:
+            print(e, file=sys.stderr)
+            return 2
+        if args.json:
+            print(json.dumps(st, indent=2))
+            return 0
+        jobs = st["jobs"]
+        alive = f"watcher pid {st['pid']}, last scan {st['last_scan_age']:.0f}s ago" if st["pid"] else "watcher not running"
+        print(f"{st['src']} ({alive})")
+        print(f"queue: {jobs['queued']} queued, {jobs['running']} running, {jobs['done']} done, {jobs['failed']} failed"
+              + (f"; oldest queued {st['oldest_queued_age']:.0f}s" if st["oldest_queued_age"] else ""))
+        rate = f"{st['docs_per_min']:.1f} docs/min, {st['pages_per_min']:.1f} pages/min over the last {st['window_seconds'] // 60} min"
+        if st["pages_per_worker_sec"]:
+            rate += f"; {st['pages_per_worker_sec']:.1f} pages/s per worker"
+        print(rate)
+        for f in st["recent_failures"]:
+            print(f"  FAILED {f['path']}: {f['error']}")
+        return 0
+
+    if args.cmd == "serve":
+        import asyncio
+        from . import serve
+        def ready(addr, server):
+            print(f"Serving on http://{addr[0]}:{addr[1]} ({server.workers} workers, {server.max_concurrent} concurrent)", flush=True)
+        try:
+            asyncio.run(serve.serve(args.host, args.port, ready=ready, workers=args.workers,
+                max_concurrent=args.max_concurrent, max_queue=args.max_queue, max_body=args.max_body_mb << 20,
+                rng_bytes=open(args.rng, "rb").read() if args.rng else None,
+                sch_bytes=open(args.sch, "rb").read() if args.sch else None))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if args.cmd == "compare-backends":
+        runs = compare_backends(args.pdf, args.backends)
+        for r in runs:
+            print(f"{r['backend']:<12} {r['seconds']:8.3f}s  {r['pages_per_sec'] or 0:8.1f} pages/s  {len(r['lines'])} lines  ({r['version']})")
+        for r in runs[1:]:
+            print(f"\n{r['backend']} vs {r['vs']}: {r['similarity']:.1%} similar, {r['changed_lines']} line(s) differ")
+            shown = r["diff"] if args.diff_lines <= 0 else r["diff"][:args.diff_lines]
+            for ln in shown:
+                print("  " + ln)
+            if len(shown) < len(r["diff"]):
+                print(f"  ... {len(r['diff']) - len(shown)} more diff line(s)")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as fh:
+                json.dump(runs, fh, indent=2)
+        return 0
+
+    if args.cmd == "index":
+        t0 = time.perf_counter()
+        st = index.update_index(index.connect(args.db), args.paths, args.recursive)
+        print(f"{st['indexed']} volume(s) indexed, {st['unchanged']} unchanged, {st['dropped']} dropped; "
+              f"documents +{st['added']} ~{st['changed']} -{st['removed']} ({time.perf_counter() - t0:.2f}s) -> {args.db}")
+        return 0
+
+    if args.cmd == "query":
+        if not os.path.exists(args.db):
+            ap.error(f"query: no index at {args.db} (run `seward index` first)")
+        try:
+            rows = index.query(index.connect(args.db), args.xml_id, args.volume, args.date_from, args.date_to,
+                               args.classification, args.text, args.limit)
+        except sqlite3.OperationalError as e:
+            print(f"Query error: {e}", file=sys.stderr)
+            return 2
+        if args.json:
+            print(json.dumps(rows, indent=2, ensure_ascii=False))
+        for r in [] if args.json else rows:
+            print("\t".join(str(r[k] or "") for k in ("volume_id", "xml_id", "doc_number", "date", "classification", "title")))
+            if r.get("snippet"):
+                print(f"\t  p{r['para']}: {r['snippet']}")
+        return 0
+
+    if args.cmd == "shards":
+        if args.shards_cmd == "split":
+            try:
+                manifest = shards.split_volume(args.volume, args.out)
+            except ValueError as e:
+                ap.error(f"shards split: {e}")
+            print(f"{len(manifest['docs'])} document(s) -> {args.out}")
+        else:
+            with xmlio.atomic_output(args.out) as fh:
+                shards.assemble(args.shard_dir, fh)
+            print(f"Assembled {args.shard_dir} -> {args.out}")
+        return 0
+
+    if args.cmd == "journal":
+        from . import journal
+        if args.journal_cmd == "status":
+            st = journal.status(args.volume)
+            if args.json:
+                print(json.dumps(st, indent=2))
+            else:
+                print(f"Volume at d{st['volume_max']}; staged: {', '.join(st['staged']) or 'none'}")
+                for xml_id, by in st["reserved"].items():
+                    print(f"  {xml_id} reserved by {by}")
+            return 0
+        if args.journal_cmd == "release":
+            try:
+                behind = journal.release(args.volume, args.xml_ids)
+            except (ValueError, RuntimeError) as e:
+                ap.error(f"journal release: {e}")
+            print(f"Released {', '.join(args.xml_ids)}" + (f"; moving up {', '.join(behind)} to fill the gap" if behind else ""))
+        try:
+            committed = journal.commit(args.volume)
+        except RuntimeError as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(f"Committed {', '.join(committed)}" if committed else "Nothing to commit")
+        return 0
+
+    if args.cmd == "volume":
+        return run_volume(args, ap)
+
+    if args.cmd == "cache":
+        if args.action == "clear":
+            print(f"Removed {cache.clear()} cached extraction(s) from {cache.cache_root()}")
+        else:
+            st = cache.info()
+            print(f"{st['dir']}: {st['entries']} entries, {st['bytes']/1048576:.1f} MiB (limit {st['max_bytes']/1048576:.0f} MiB)")
+        return 0
+
+def run_volume(args, ap):
+    if not os.path.isfile(args.volume):
+        ap.error(f"volume: no such file {args.volume}")
+    if args.volume_cmd == "get":
+        data = volume.get(args.volume, args.xml_id)
+        if data is None:
+            print(f"{args.xml_id}: no such document in {args.volume}", file=sys.stderr)
+            return 1
+        if args.out:
+            with xmlio.atomic_output(args.out) as fh:
+                fh.write(data + b"\n")
+        else:
+            sys.stdout.buffer.write(data + b"\n")
+        return 0
+    if args.volume_cmd == "ls":
+        rows = volume.ls(args.volume)
+        if args.json:
+            print(json.dumps(list(rows), indent=2, ensure_ascii=False))
+            return 0
+        for r in rows:
+            print("\t".join(str(r[k] if r[k] is not None else "") for k in ("xml_id", "doc_number", "date", "pages", "paras", "title")))
+        return 0
+    if args.volume_cmd == "stats":
+        st = volume.stats(args.volume)
+        if args.json:
+            print(json.dumps(st, indent=2))
+        else:
+            print(f"{st['docs']} documents, {st['pages']} pages, {st['paras']} paragraphs, {st['notes']} notes"
+                  + (f"; dated {st['first_date']} to {st['last_date']} ({st['dated']} documents)" if st["dated"] else "")
+                  + f"; {st['bytes'] / 1048576:.1f} MiB")
+        return 0
+    problems = volume.check(args.volume)
+    if args.json:
+        print(json.dumps(problems, indent=2))
+    else:
+        for p in problems:
+            print(f"#{p['seq']} {p['xml_id'] or '(no id)'}: {p['problem']}")
+        print(f"{len(problems)} problem(s)" if problems else "OK: ids and docNumbers are consecutive")
+    return 1 if problems else 0
+
 if __name__ == "__main__":
     sys.exit(main())
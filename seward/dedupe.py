@@ -0,0 +1,112 @@
+"""Near-duplicate detection with MinHash signatures and LSH banding.
+
+Each document's paragraph text becomes a set of word 5-gram shingles,
+summarised by a 128-value MinHash signature (the share of equal values
+estimates the Jaccard similarity of two shingle sets). Signatures are cut into
+32 bands of 4 values; documents sharing any band bucket are candidates, and
+only candidates are compared. A lookup therefore costs a few indexed bucket
+probes however many documents the index holds. Signatures and buckets live
+in the search index database (see index.py), filled in as volumes are indexed.
+"""
+import re, zlib, random, hashlib
+from array import array
+
+SHINGLE = 5
+NUM_PERM = 128
+BANDS, ROWS = 32, 4  # candidate pairs from roughly 40% similarity up
+DEFAULT_THRESHOLD = 0.8
+
+_P = (1 << 61) - 1
+_rng = random.Random(0x5e3a2d)  # fixed: signatures must be comparable across runs
+PERMS = [(_rng.randrange(1, _P), _rng.randrange(0, _P)) for _ in range(NUM_PERM)]
+WORD_RE = re.compile(r"\w+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS minhash (doc INTEGER PRIMARY KEY, sig BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS lsh (band INTEGER NOT NULL, bucket INTEGER NOT NULL, doc INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS lsh_bucket ON lsh(band, bucket);
+CREATE INDEX IF NOT EXISTS lsh_doc ON lsh(doc);
+"""
+
+def shingles(paras):
+    """Hashed word k-grams over all paragraphs (joined, so differently broken copies still match)."""
+    words = [w for p in paras for w in WORD_RE.findall(p.lower())]
+    if not words:
+        return set()
+    k = min(SHINGLE, len(words))
+    return {zlib.crc32(" ".join(words[i:i + k]).encode("utf-8")) for i in range(len(words) - k + 1)}
+
+def signature(paras):
+    """MinHash signature (tuple of NUM_PERM ints) of the paragraphs, or None when there is no text."""
+    hs = shingles(paras)
+    if not hs:
+        return None
+    return tuple(min((a * h + b) % _P for h in hs) for a, b in PERMS)
+
+def similarity(sig_a, sig_b):
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERM
+
+def buckets(sig):
+    # (band, bucket) pairs; buckets are 63-bit so they fit an SQLite INTEGER.
+    out = []
+    for band in range(BANDS):
+        chunk = array("Q", sig[band * ROWS:(band + 1) * ROWS]).tobytes()
+        out.append((band, int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "big") >> 1))
+    return out
+
+def store(db, doc, paras):
+    sig = signature(paras)
+    db.execute("INSERT OR REPLACE INTO minhash (doc, sig) VALUES (?, ?)",
+               (doc, array("Q", sig).tobytes() if sig else b""))
+    if sig:
+        db.executemany("INSERT INTO lsh (band, bucket, doc) VALUES (?, ?, ?)", [(b, k, doc) for b, k in buckets(sig)])
+
+def forget(db, doc_ids):
+    for doc in doc_ids:
+        db.execute("DELETE FROM lsh WHERE doc = ?", (doc,))
+        db.execute("DELETE FROM minhash WHERE doc = ?", (doc,))
+
+def _load(blob):
+    return tuple(array("Q", blob)) if blob else None
+
+def lookup(db, sig, threshold=DEFAULT_THRESHOLD):
+    """Indexed documents whose estimated similarity to sig is at least threshold, most similar first."""
+    if sig is None:
+        return []
+    probe = buckets(sig)
+    rows = db.execute("SELECT DISTINCT l.doc, m.sig FROM lsh l JOIN minhash m ON m.doc = l.doc WHERE " +
+                      " OR ".join(["(l.band = ? AND l.bucket = ?)"] * len(probe)),
+                      [v for pair in probe for v in pair]).fetchall()
+    scored = [(similarity(sig, _load(blob)), doc) for doc, blob in rows]
+    out = []
+    for score, doc in sorted((s, d) for s, d in scored if s >= threshold)[::-1]:
+        r = db.execute("SELECT v.volume_id, v.path, d.xml_id, d.title FROM docs d JOIN volumes v ON v.id = d.volume "
+                       "WHERE d.id = ?", (doc,)).fetchone()
+        out.append({"volume_id": r[0], "path": r[1], "xml_id": r[2], "title": r[3], "similarity": score})
+    return out
+
+def check_batch(db, docs, threshold=DEFAULT_THRESHOLD):
+    """Near-duplicates for new documents given as (label, paras) pairs, as one match list per document.
+
+    Each is checked against the index and against the batch entries before it
+    (two copies of one cable in the same append); a batch match carries the
+    earlier entry's label under "batch".
+    """
+    found = []
+    seen = {}  # (band, bucket) -> [(position, sig)] for this batch
+    for pos, (label, paras) in enumerate(docs):
+        sig = signature(paras)
+        matches = lookup(db, sig, threshold)
+        if sig is not None:
+            earlier = {}
+            for key in buckets(sig):
+                for other, other_sig in seen.get(key, []):
+                    earlier[other] = other_sig
+                seen.setdefault(key, []).append((pos, sig))
+            for other in sorted(earlier):
+                score = similarity(sig, earlier[other])
+                if score >= threshold:
+                    matches.append({"volume_id": None, "path": None, "xml_id": None, "title": None,
+                                    "similarity": score, "batch": docs[other][0]})
+        found.append(matches)
+    return found
@@ -0,0 +1,192 @@
+"""SQLite index of documents across volumes, with FTS5 over paragraph text.
+
+`update_index` stream-parses only volume files whose size/mtime changed since
+the last run, and rewrites rows only for documents whose content changed.
+`query` then answers id / date / classification / phrase lookups from the
+database without touching the XML. Each document also gets a MinHash
+signature for near-duplicate checks (dedupe.py). A shard directory (shards.py)
+is indexed as one volume, read shard by shard; its size/mtime are those of the
+manifest and shard files together.
+"""
+import os, glob, time, sqlite3, hashlib
+from lxml import etree
+from .parser import XMLNS, TEINS, WS_RE
+from . import dedupe, shards, xmlio
+from .volume import iter_docs
+
+DEFAULT_DB = "seward-index.db"
+XML_ID = "{%s}id" % XMLNS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS volumes (
+    id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, volume_id TEXT,
+    size INTEGER, mtime_ns INTEGER, indexed_at REAL);
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY, volume INTEGER NOT NULL REFERENCES volumes(id),
+    seq INTEGER, xml_id TEXT, doc_number TEXT, date TEXT, classification TEXT,
+    title TEXT, hash TEXT, para_lo INTEGER, para_hi INTEGER);
+CREATE INDEX IF NOT EXISTS docs_volume ON docs(volume, xml_id);
+CREATE INDEX IF NOT EXISTS docs_xml_id ON docs(xml_id);
+CREATE INDEX IF NOT EXISTS docs_date ON docs(date);
+-- A document's paragraphs occupy the rowid range docs.para_lo..para_hi.
+CREATE VIRTUAL TABLE IF NOT EXISTS paras USING fts5(text, doc UNINDEXED, n UNINDEXED);
+"""
+
+def connect(db_path=DEFAULT_DB):
+    db = sqlite3.connect(db_path)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode=WAL")
+    db.executescript(SCHEMA + dedupe.SCHEMA)
+    return db
+
+def _text(el):
+    return WS_RE.sub(" ", "".join(el.itertext())).strip() if el is not None else None
+
+def doc_record(div):
+    """Index fields for one document div, plus its paragraph texts."""
+    date = div.find(TEINS + "docDate")
+    cls = div.find(TEINS + "classification")
+    title = div.find(TEINS + "docTitle")
+    if title is None:
+        title = div.find(TEINS + "head")
+    paras = [t for t in (_text(p) for p in div.iter(TEINS + "p")) if t]
+    return {
+        "xml_id": div.get(XML_ID),
+        "doc_number": _text(div.find(TEINS + "docNumber")),
+        "date": date.get("when") if date is not None else None,
+        "classification": "; ".join(c.strip().upper() for c in _text(cls).split(";") if c.strip()) if cls is not None else None,
+        "title": _text(title),
+        "hash": hashlib.sha1(etree.tostring(div, method="c14n")).hexdigest(),
+        "paras": paras,
+    }
+
+def iter_volume_docs(path):
+    """(volume xml:id, doc record) for each document div, parsed incrementally with memory released as it goes."""
+    if shards.is_sharded(path):
+        manifest = shards.load_manifest(path)
+        for d in manifest["docs"]:
+            yield manifest["volume_id"], doc_record(etree.parse(os.path.join(path, d["file"])).getroot())
+        return
+    for el in iter_docs(path):
+        yield el.getroottree().getroot().get(XML_ID), doc_record(el)
+
+def _volume_stat(path):
+    # (size, mtime_ns) that changes whenever the volume does; for a shard directory, over all its files.
+    if not shards.is_sharded(path):
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+    files = [shards.MANIFEST] + [d["file"] for d in shards.load_manifest(path)["docs"]]
+    sts = [os.stat(os.path.join(path, f)) for f in files]
+    return sum(st.st_size for st in sts), max(st.st_mtime_ns for st in sts)
+
+def find_volumes(paths, recursive=False):
+    out = []
+    for p in paths:
+        if os.path.isdir(p) and not shards.is_sharded(p):
+            found = []
+            for suffix in xmlio.SUFFIXES:  # plain and compressed volumes
+                pattern = os.path.join(p, "**", "*" + suffix) if recursive else os.path.join(p, "*" + suffix)
+                found.extend(glob.glob(pattern, recursive=recursive))
+            pattern = os.path.join(p, "**", shards.MANIFEST) if recursive else os.path.join(p, "*", shards.MANIFEST)
+            sharded = [os.path.dirname(m) for m in glob.glob(pattern, recursive=recursive) if shards.is_sharded(os.path.dirname(m))]
+            # A shard directory is one volume: its skeleton and document files are not volumes of their own.
+            found = [f for f in found if not any(f.startswith(d + os.sep) for d in sharded)]
+            out.extend(sorted(found + sharded))
+        else:
+            out.append(p)
+    return [os.path.abspath(p) for p in out]
+
+def _index_volume(db, path, size, mtime_ns, stats):
+    row = db.execute("SELECT id FROM volumes WHERE path = ?", (path,)).fetchone()
+    if row is None:
+        vol = db.execute("INSERT INTO volumes (path) VALUES (?)", (path,)).lastrowid
+    else:
+        vol = row["id"]
+    known = {r["xml_id"]: (r["id"], r["hash"]) for r in db.execute("SELECT id, xml_id, hash FROM docs WHERE volume = ?", (vol,))}
+    seen = set(); volume_id = None
+    for seq, (volume_id, rec) in enumerate(iter_volume_docs(path)):
+        seen.add(rec["xml_id"])
+        prev = known.get(rec["xml_id"])
+        if prev and prev[1] == rec["hash"]:
+            db.execute("UPDATE docs SET seq = ? WHERE id = ?", (seq, prev[0]))
+            continue
+        if prev:
+            _delete_docs(db, [prev[0]]); stats["changed"] += 1
+        else:
+            stats["added"] += 1
+        lo = db.execute("SELECT coalesce(max(rowid), 0) + 1 FROM paras").fetchone()[0]
+        doc = db.execute("INSERT INTO docs (volume, seq, xml_id, doc_number, date, classification, title, hash, para_lo, para_hi) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         (vol, seq, rec["xml_id"], rec["doc_number"], rec["date"], rec["classification"], rec["title"],
+                          rec["hash"], lo, lo + len(rec["paras"]) - 1)).lastrowid
+        db.executemany("INSERT INTO paras (rowid, text, doc, n) VALUES (?, ?, ?, ?)",
+                       [(lo + n - 1, t, doc, n) for n, t in enumerate(rec["paras"], 1)])
+        dedupe.store(db, doc, rec["paras"])
+    gone = [doc for xml_id, (doc, _) in known.items() if xml_id not in seen]
+    _delete_docs(db, gone); stats["removed"] += len(gone)
+    db.execute("UPDATE volumes SET volume_id = ?, size = ?, mtime_ns = ?, indexed_at = ? WHERE id = ?",
+               (volume_id, size, mtime_ns, time.time(), vol))
+
+def _delete_docs(db, doc_ids):
+    dedupe.forget(db, doc_ids)
+    for doc in doc_ids:
+        db.execute("DELETE FROM paras WHERE rowid BETWEEN (SELECT para_lo FROM docs WHERE id = ?) "
+                   "AND (SELECT para_hi FROM docs WHERE id = ?)", (doc, doc))
+        db.execute("DELETE FROM docs WHERE id = ?", (doc,))
+
+def update_index(db, paths, recursive=False):
+    """Bring the index up to date for the given volume files/directories.
+
+    Volumes indexed earlier whose files no longer exist are dropped.
+    Returns counts: volumes indexed/unchanged/dropped, documents added/changed/removed.
+    """
+    stats = {"indexed": 0, "unchanged": 0, "dropped": 0, "added": 0, "changed": 0, "removed": 0}
+    with db:
+        for path in find_volumes(paths, recursive):
+            size, mtime_ns = _volume_stat(path)
+            row = db.execute("SELECT size, mtime_ns FROM volumes WHERE path = ?", (path,)).fetchone()
+            if row and row["size"] == size and row["mtime_ns"] == mtime_ns:
+                stats["unchanged"] += 1; continue
+            _index_volume(db, path, size, mtime_ns, stats)
+            stats["indexed"] += 1
+        for row in db.execute("SELECT id, path FROM volumes").fetchall():
+            if not os.path.exists(row["path"]):
+                docs = [r["id"] for r in db.execute("SELECT id FROM docs WHERE volume = ?", (row["id"],))]
+                _delete_docs(db, docs); stats["removed"] += len(docs)
+                db.execute("DELETE FROM volumes WHERE id = ?", (row["id"],)); stats["dropped"] += 1
+        # Documents indexed before signatures existed: fingerprint them from the stored paragraphs.
+        for row in db.execute("SELECT d.id, d.para_lo, d.para_hi FROM docs d LEFT JOIN minhash m ON m.doc = d.id "
+                              "WHERE m.doc IS NULL").fetchall():
+            paras = [r[0] for r in db.execute("SELECT text FROM paras WHERE rowid BETWEEN ? AND ? ORDER BY rowid",
+                                              (row["para_lo"], row["para_hi"]))]
+            dedupe.store(db, row["id"], paras)
+    return stats
+
+def query(db, xml_id=None, volume=None, date_from=None, date_to=None, classification=None, text=None, limit=50):
+    """Documents matching all given filters, in volume/document order.
+
+    `text` is an FTS5 query over paragraph text ("arms control" for a phrase,
+    NEAR(...), OR, prefix*); matching rows carry a snippet.
+    """
+    where = []; args = []
+    if xml_id: where.append("d.xml_id = ?"); args.append(xml_id)
+    if volume: where.append("(v.volume_id = ? OR v.path = ?)"); args += [volume, os.path.abspath(volume)]
+    if date_from: where.append("d.date >= ?"); args.append(date_from)
+    if date_to: where.append("d.date <= ?"); args.append(date_to)
+    if classification:
+        where.append("('; ' || d.classification || ';') LIKE ?"); args.append(f"%; {classification.strip().upper()};%")
+    cols = "v.volume_id, v.path, d.xml_id, d.doc_number, d.date, d.classification, d.title"
+    if text:
+        # snippet() can't be grouped, so keep each document's first matching paragraph here.
+        sql = (f"SELECT {cols}, d.id AS doc, p.n AS para, snippet(paras, 0, '[', ']', '…', 12) AS snippet "
+               "FROM paras p JOIN docs d ON d.id = p.doc JOIN volumes v ON v.id = d.volume "
+               "WHERE paras MATCH ?" + "".join(" AND " + w for w in where) + " ORDER BY v.path, d.seq, p.n")
+        out = {}
+        for r in db.execute(sql, [text] + args):
+            if r["doc"] not in out:
+                if len(out) == limit: break
+                out[r["doc"]] = {k: r[k] for k in r.keys() if k != "doc"}
+        return list(out.values())
+    sql = (f"SELECT {cols} FROM docs d JOIN volumes v ON v.id = d.volume" +
+           (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY v.path, d.seq LIMIT ?")
+    return [dict(r) for r in db.execute(sql, args + [limit])]
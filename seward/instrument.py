@@ -0,0 +1,113 @@
+"""Instrumentation hooks: per-stage wall times and per-page extraction times.
+
+Register a callback with add_listener(); it is called as callback(event, data)
+with event "stage" (data: stage, seconds, plus stage details) or "page" (data:
+n, seconds, pdf). Hooks fire in the process that runs the stage; page times
+from sharded extraction are forwarded to the parent. With no listeners the
+hooks cost one perf_counter() call. Stages can nest (e.g. convert around
+extract and build when a batch runs in-process).
+
+    from seward.instrument import Trace
+    with Trace() as trace:
+        pages = extract_pages("memo.pdf")
+        div = build_doc_div(pages, "v", "d1", "1")
+    trace.report()
+"""
+import sys, json, time, threading
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_listeners = []
+
+def add_listener(fn):
+    _listeners.append(fn)
+    return fn
+
+def remove_listener(fn):
+    try:
+        _listeners.remove(fn)
+    except ValueError:
+        pass
+
+def emit(event, **data):
+    for fn in list(_listeners):
+        fn(event, data)
+
+@contextmanager
+def stage(name, **info):
+    """Time the block as stage `name`; details only known at the end can be added to the yielded dict."""
+    t0 = time.perf_counter()
+    try:
+        yield info
+    finally:
+        if _listeners:
+            emit("stage", stage=name, start=t0, seconds=time.perf_counter() - t0, **info)
+
+def page(n, seconds, **info):
+    if _listeners:
+        emit("page", n=n, seconds=seconds, **info)
+
+def peak_rss_bytes(who="self"):
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN if who == "children" else resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024  # kilobytes everywhere but macOS
+
+class Trace:
+    """Collects hook events while active (as a context manager) and summarizes them."""
+    def __init__(self):
+        self.stages = []; self.pages = []
+        self.t0 = self.t1 = None
+        self._lock = threading.Lock()
+
+    def __call__(self, event, data):
+        with self._lock:
+            (self.stages if event == "stage" else self.pages).append(dict(data))
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        add_listener(self)
+        return self
+
+    def __exit__(self, *exc):
+        remove_listener(self)
+        self.t1 = time.perf_counter()
+
+    def report(self, slowest=10, **extra):
+        end = self.t1 if self.t1 is not None else time.perf_counter()
+        totals = {}
+        for s in self.stages:
+            t = totals.setdefault(s["stage"], {"seconds": 0.0, "calls": 0})
+            t["seconds"] += s["seconds"]; t["calls"] += 1
+        # Throughput over the stages that read PDFs (cache hits excluded).
+        reading = [s for s in self.stages if s["stage"] == "stream" or (s["stage"] == "extract" and s.get("cache") != "hit")]
+        read_s = sum(s["seconds"] for s in reading)
+        n_text = sum(1 for p in self.pages if not p.get("ocr"))
+        events = [dict(s, start=round(s["start"] - self.t0, 6)) for s in self.stages]
+        out = dict(extra)
+        out.update({
+            "wall_seconds": end - self.t0,
+            "stages": totals,
+            "events": events,
+            "pages": {
+                "extracted": n_text,
+                "ocr": len(self.pages) - n_text,
+                "extract_seconds": read_s,
+                "pages_per_sec": n_text / read_s if read_s else None,
+                "slowest": sorted(self.pages, key=lambda p: -p["seconds"])[:slowest],
+                "times": self.pages,
+            },
+            "peak_rss_bytes": peak_rss_bytes(),
+            "peak_rss_children_bytes": peak_rss_bytes("children"),
+        })
+        return out
+
+    def write(self, path, **extra):
+        report = self.report(**extra)
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        return report
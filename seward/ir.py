@@ -0,0 +1,299 @@
+"""Compact page text for a whole document: one UTF-8 buffer plus offset arrays.
+
+extract_pages used to return one dict per page holding the page text and a
+separate list of its lines; DocText keeps the text once and describes pages,
+lines (right-stripped, as backends.page_lines gives them) and coalesced
+blocks as byte offsets into it. Pages are read through small Page views that
+answer p["n"], p["text"] and p["lines"] like the old records, so metadata
+scanning and the TEI builder are unchanged; Page.blocks() serves the blocks
+coalesce_blocks would build, mostly as single slices of the buffer.
+
+to_bytes()/write() produce a flat file (header, arrays, text) that load()
+maps into memory: the arrays are views on the mapping and strings are only
+decoded when a page is read. The page cache stores this format and worker
+processes hand it back as one bytes object, so nothing is unpickled page by
+page. Offsets are 32-bit: a document's text is limited to 4 GiB.
+A loaded DocText (a page-cache hit included) keeps its file mapped until
+close(), which the caller owns; `with` closes it. Other DocTexts need no
+closing.
+"""
+import os, sys, mmap, struct, tempfile
+from array import array
+from .backends import page_lines
+
+MAGIC = b"SEWIR1" + (b"LE" if sys.byteorder == "little" else b"BE")
+_HEADER = struct.Struct("<8sQQQQ")  # magic, pages, lines, blocks, text bytes
+OCR = 1  # page flag: text came from OCR
+_CLEAN = 1  # block flag: its lines are separated by a bare "\n" in the buffer, so it is one slice
+
+# (attribute, typecode, length as a function of the page/line/block counts), in file order.
+_ARRAYS = (
+    ("page_n", "I", lambda p, l, b: p),
+    ("page_off", "I", lambda p, l, b: p + 1),
+    ("page_line0", "I", lambda p, l, b: p + 1),
+    ("page_block0", "I", lambda p, l, b: p + 1),
+    ("line_start", "I", lambda p, l, b: l),
+    ("line_end", "I", lambda p, l, b: l),
+    ("block_a", "I", lambda p, l, b: b),
+    ("block_b", "I", lambda p, l, b: b),
+    ("page_flags", "B", lambda p, l, b: p),
+    ("block_flags", "B", lambda p, l, b: b),
+)
+
+def _pad(n):
+    return -n % 8
+
+class Page:
+    """One page of a DocText; reads like a {"n", "text", "lines"} record."""
+    __slots__ = ("doc", "i")
+
+    def __init__(self, doc, i):
+        self.doc = doc; self.i = i
+
+    @property
+    def n(self):
+        return self.doc.page_n[self.i]
+
+    @property
+    def text(self):
+        d = self.doc
+        return d.decode(d.page_off[self.i], d.page_off[self.i + 1])
+
+    @property
+    def lines(self):
+        return page_lines(self.text)  # one decode and split beats slicing line by line
+
+    def _ascii_text(self):
+        # (page text, its byte offset) when byte offsets are also character
+        # offsets into it: one decode then serves every block. (None, 0) otherwise.
+        d = self.doc
+        a, b = d.page_off[self.i], d.page_off[self.i + 1]
+        text = d.decode(a, b)
+        return (text, a) if len(text) == b - a else (None, 0)
+
+    @property
+    def ocr(self):
+        return bool(self.doc.page_flags[self.i] & OCR)
+
+    def blocks(self):
+        """Same as coalesce_blocks(self["lines"])."""
+        d = self.doc
+        out = []
+        text, base = self._ascii_text()
+        for k in range(d.page_block0[self.i], d.page_block0[self.i + 1]):
+            a, b = d.block_a[k], d.block_b[k]
+            if d.block_flags[k] & _CLEAN:
+                out.append((text[a - base:b - base] if text is not None else d.decode(a, b)).strip())
+            else:  # a and b are line indexes
+                out.append("\n".join(d.decode(d.line_start[j], d.line_end[j]) for j in range(a, b)).strip())
+        return out
+
+    def keys(self):
+        return ("n", "text", "lines", "ocr") if self.ocr else ("n", "text", "lines")
+
+    def __getitem__(self, key):
+        if key in ("n", "text", "lines") or (key == "ocr" and self.ocr):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def to_dict(self):
+        return {k: self[k] for k in self.keys()}
+
+    def __eq__(self, other):
+        if isinstance(other, (Page, dict)):
+            return self.to_dict() == (other.to_dict() if isinstance(other, Page) else other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"<Page n={self.n} {self.doc.page_off[self.i + 1] - self.doc.page_off[self.i]} bytes>"
+
+class DocText:
+    """A document's pages as one text buffer and offset arrays (see the module docstring)."""
+    __slots__ = ("buf", "_mm") + tuple(name for name, _, _ in _ARRAYS)
+
+    def __init__(self, buf, arrays, mm=None):
+        self.buf = buf; self._mm = mm
+        for name, _, _ in _ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def from_records(cls, records):
+        """Build from page records (dicts with "n" and "text", optionally "ocr"; or Page views)."""
+        arrays = {name: array(code) for name, code, _ in _ARRAYS}
+        page_n, page_off, page_line0, page_block0 = (arrays[k] for k in ("page_n", "page_off", "page_line0", "page_block0"))
+        line_start, line_end = arrays["line_start"], arrays["line_end"]
+        block_a, block_b, block_flags = arrays["block_a"], arrays["block_b"], arrays["block_flags"]
+        chunks = []; pos = 0
+        for rec in records:
+            text = rec["text"]
+            data = text.encode("utf-8")
+            page_n.append(rec["n"]); page_off.append(pos)
+            page_line0.append(len(line_start)); page_block0.append(len(block_a))
+            arrays["page_flags"].append(OCR if rec.get("ocr") else 0)
+            one_byte = len(data) == len(text)  # ASCII: character offsets are byte offsets
+            at = pos; first = None; clean = True
+            for piece in text.splitlines(keepends=True):
+                content = piece.rstrip()
+                if one_byte:
+                    width, size = len(content), len(piece)
+                else:
+                    width, size = len(content.encode("utf-8")), len(piece.encode("utf-8"))
+                j = len(line_start)
+                line_start.append(at); line_end.append(at + width)
+                if content:
+                    if first is None:
+                        first = j; clean = True
+                    elif not prev_bare:
+                        clean = False
+                    prev_bare = piece == content + "\n"
+                elif first is not None:
+                    cls._add_block(arrays, first, j, clean); first = None
+                at += size
+            if first is not None:
+                cls._add_block(arrays, first, len(line_start), clean)
+            chunks.append(data); pos += len(data)
+            if pos >= 1 << 32:
+                raise ValueError("document text over 4 GiB")
+        page_off.append(pos); page_line0.append(len(line_start)); page_block0.append(len(block_a))
+        return cls(b"".join(chunks), arrays)
+
+    @staticmethod
+    def _add_block(arrays, first, stop, clean):
+        # Lines first..stop-1 are one block: a single slice when they are "\n"-separated in the buffer.
+        if clean:
+            arrays["block_a"].append(arrays["line_start"][first]); arrays["block_b"].append(arrays["line_end"][stop - 1])
+            arrays["block_flags"].append(_CLEAN)
+        else:
+            arrays["block_a"].append(first); arrays["block_b"].append(stop)
+            arrays["block_flags"].append(0)
+
+    @classmethod
+    def concat(cls, docs):
+        """Pages of several DocTexts (e.g. shards extracted by different workers) as one."""
+        docs = list(docs)
+        arrays = {name: array(code) for name, code, _ in _ARRAYS}
+        pos = lines = blocks = 0
+        for d in docs:
+            shift = {"page_off": pos, "page_line0": lines, "page_block0": blocks, "line_start": pos, "line_end": pos}
+            for name, _, _ in _ARRAYS:
+                if name in ("block_a", "block_b"):
+                    continue
+                src = getattr(d, name)
+                if name in ("page_off", "page_line0", "page_block0"):
+                    src = src[:-1]  # the end marker is the next document's start
+                by = shift.get(name, 0)
+                arrays[name].extend((x + by for x in src) if by else src)
+            for a, b, f in zip(d.block_a, d.block_b, d.block_flags):
+                by = pos if f & _CLEAN else lines  # byte offsets or line indexes
+                arrays["block_a"].append(a + by); arrays["block_b"].append(b + by)
+            pos += len(d.buf); lines += len(d.line_start); blocks += len(d.block_a)
+        for name, end in (("page_off", pos), ("page_line0", lines), ("page_block0", blocks)):
+            arrays[name].append(end)
+        if pos >= 1 << 32:
+            raise ValueError("document text over 4 GiB")
+        return cls(b"".join(d.buf for d in docs), arrays)
+
+    def decode(self, a, b):
+        return str(self.buf[a:b], "utf-8")
+
+    def __len__(self):
+        return len(self.page_n)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [Page(self, j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("page index out of range")
+        return Page(self, i)
+
+    def __iter__(self):
+        return (Page(self, i) for i in range(len(self)))
+
+    def __eq__(self, other):
+        if isinstance(other, (DocText, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # Pickles (e.g. into worker processes) as one flat buffer.
+        return from_bytes, (self.to_bytes(),)
+
+    def _parts(self):
+        yield _HEADER.pack(MAGIC, len(self), len(self.line_start), len(self.block_a), len(self.buf))
+        for name, _, _ in _ARRAYS:
+            data = memoryview(getattr(self, name)).cast("B")
+            yield data
+            yield b"\0" * _pad(len(data))
+        yield self.buf
+
+    def to_bytes(self):
+        return b"".join(self._parts())
+
+    def write(self, path):
+        """Write the file format atomically (temp file + rename)."""
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                for part in self._parts():
+                    fh.write(part)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Unmap a loaded file (no-op otherwise); pages can't be read afterwards."""
+        if self._mm is not None:
+            for name, _, _ in _ARRAYS:
+                getattr(self, name).release()
+            self.buf.release()
+            self._mm.close(); self._mm = None
+
+def from_bytes(data, mm=None):
+    """A DocText over data (bytes or a mapping) without copying it; ValueError if it isn't one."""
+    if len(data) < _HEADER.size:
+        raise ValueError("not a seward page file")
+    magic, pages, lines, blocks, text = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a seward page file (or written on a machine of the other byte order)")
+    sizes = [count(pages, lines, blocks) * struct.calcsize(code) for _, code, count in _ARRAYS]
+    # Checked before any view exists: a mapping can't be closed while views on it are alive.
+    if _HEADER.size + sum(size + _pad(size) for size in sizes) + text != len(data):
+        raise ValueError("truncated seward page file")
+    view = memoryview(data)
+    arrays = {}; pos = _HEADER.size
+    for (name, code, _), size in zip(_ARRAYS, sizes):
+        arrays[name] = view[pos:pos + size].cast(code)
+        pos += size + _pad(size)
+    return DocText(view[pos:], arrays, mm)
+
+def load(path):
+    """Map a file written by DocText.write; pages are read straight from the mapping until close()."""
+    with open(path, "rb") as fh:
+        mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return from_bytes(mm, mm)
+    except ValueError:
+        mm.close()
+        raise
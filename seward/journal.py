@@ -0,0 +1,270 @@
+"""Concurrent appends to one volume: locked id reservation, staged documents, one ordered committer.
+
+A plain append reads the highest d### from the volume and writes d+1, so two
+appends running at once pick the same id. Here every append goes through a
+journal kept next to the volume (VOLUME.journal/):
+
+    lock            flock()ed around every journal read-modify-write
+    journal.jsonl   one JSON record per line, appended and fsynced:
+                    base (highest number in the volume when the journal
+                    started), reserve, stage, release, move (a staged
+                    document renumbered into a released gap), commit
+                    (intent) and done
+    staged/dN.xml   a staged document div, written before its stage record
+
+reserve() hands out numbers no one else holds (released ones first, so
+numbering stays gap-free); workers then convert and stage() in parallel,
+outside the lock. commit() appends the staged documents that continue the
+volume's numbering without a hole (dN+1, dN+2, ... up to the first number
+still reserved but not staged) and stops there; the rest wait for the next
+commit. A number given back with release() (its worker died) is filled at
+commit by the next staged document, and the staged documents after it move up
+one number each (their files, xml:id and docNumber are rewritten), so nothing
+waits behind a number no one will stage. Whoever holds the lock is the single
+committer, so documents land in id order, once each. A commit record is written before the volume is touched
+and a done record after, so a commit interrupted by a crash is finished (or
+found to have completed) by the next one. When nothing is outstanding the
+journal is emptied.
+
+Appends that bypass the journal while it has outstanding entries are caught
+at commit (the volume's highest id no longer matches) and refused.
+
+The lock is flock(), so the journal needs a POSIX system; elsewhere every
+call raises RuntimeError. status() only reads, without the lock.
+"""
+import os, json, time, socket
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+from contextlib import contextmanager
+from lxml import etree
+from .parser import XMLNS, TEINS
+from .tei import load_volume_index, scan_volume_index, splice_append_file
+from . import shards, xmlio
+
+XML_ID = "{%s}id" % XMLNS
+JOURNAL = "journal.jsonl"
+
+def journal_dir(volume):
+    return volume.rstrip(os.sep) + ".journal"
+
+@contextmanager
+def locked(volume):
+    """Hold the volume's journal lock (blocking)."""
+    if fcntl is None:
+        raise RuntimeError("the append journal needs POSIX file locking (fcntl), which this system lacks")
+    jdir = journal_dir(volume)
+    os.makedirs(os.path.join(jdir, "staged"), exist_ok=True)
+    with open(os.path.join(jdir, "lock"), "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield jdir
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+def volume_max(volume):
+    """Highest d### number in the volume (file, .gz/.zst file or shard directory)."""
+    if shards.is_sharded(volume):
+        return shards.load_manifest(volume)["max_num"]
+    index = load_volume_index(volume) if not xmlio.compression(volume) else None
+    return (index or scan_volume_index(xmlio.read_bytes(volume)))["max_num"]
+
+def _records(jdir, repair=True):
+    try:
+        with open(os.path.join(jdir, JOURNAL), "r+b" if repair else "rb") as fh:
+            data = fh.read()
+            if not data.endswith(b"\n"):  # a record torn by a crash never happened: cut it before appending more
+                data = data[:data.rfind(b"\n") + 1]
+                if repair: fh.truncate(len(data))
+    except FileNotFoundError:
+        return []
+    return [json.loads(line) for line in data.decode("utf-8").splitlines()]
+
+def _log(jdir, **rec):
+    with open(os.path.join(jdir, JOURNAL), "a", encoding="utf-8") as fh:
+        fh.write(json.dumps(rec) + "\n")
+        fh.flush()
+        os.fsync(fh.fileno())
+
+def _state(jdir, volume, write=True):
+    # Replay the journal (caller holds the lock when write); starts it with a base record if empty.
+    recs = _records(jdir, repair=write)
+    if not recs:
+        recs = [{"op": "base", "max": volume_max(volume)}]
+        if write: _log(jdir, **recs[0])
+    st = {"base": recs[0]["max"], "top": recs[0]["max"], "reserved": {}, "staged": set(), "free": set(),
+          "done": recs[0]["max"], "committing": None}
+    for r in recs[1:]:
+        op = r["op"]
+        if op == "reserve":
+            for n in r["nums"]:
+                st["reserved"][n] = r.get("by"); st["free"].discard(n)
+            st["top"] = max([st["top"]] + r["nums"])
+        elif op == "stage":
+            st["staged"].add(r["num"])
+        elif op == "release":
+            for n in r["nums"]:
+                st["reserved"].pop(n, None); st["staged"].discard(n); st["free"].add(n)
+        elif op == "move":
+            a, b = r["frm"], r["to"]
+            st["reserved"][b] = st["reserved"].pop(a, None); st["staged"].discard(a); st["staged"].add(b)
+            st["free"].discard(b); st["free"].add(a)
+        elif op == "commit":
+            st["committing"] = r["nums"]
+        elif op == "done":
+            for n in r["nums"]:
+                st["reserved"].pop(n, None); st["staged"].discard(n)
+            st["done"] = max(r["nums"]); st["committing"] = None
+    return st
+
+def _num(xml_id):
+    if not (isinstance(xml_id, str) and xml_id[:1] == "d" and xml_id[1:].isdigit()):
+        raise ValueError(f"not a document id: {xml_id!r}")
+    return int(xml_id[1:])
+
+def reserve(volume, count=1):
+    """Reserve count document ids for this caller; returns them in order (e.g. ["d261", "d262"])."""
+    with locked(volume) as jdir:
+        st = _state(jdir, volume)
+        free = sorted(st["free"])
+        nums = free[:count]
+        nums += range(st["top"] + 1, st["top"] + 1 + count - len(nums))
+        _log(jdir, op="reserve", nums=nums, by=f"{socket.gethostname()}:{os.getpid()}", at=time.time())
+    return [f"d{n}" for n in nums]
+
+def stage(volume, xml_id, div):
+    """Give div the reserved xml_id (and docNumber) and stage it for the next commit."""
+    num = _num(xml_id)
+    jdir = journal_dir(volume)
+    with locked(volume):
+        st = _state(jdir, volume)
+        if num not in st["reserved"] or num in st["staged"]:
+            raise ValueError(f"{xml_id} is not reserved (or is already staged) in {jdir}")
+        _write_staged(jdir, num, div)
+        _log(jdir, op="stage", num=num)
+
+def _write_staged(jdir, num, div):
+    div.set(XML_ID, f"d{num}")
+    dn = div.find(f".//{TEINS}docNumber")
+    if dn is not None: dn.text = str(num)
+    with xmlio.atomic_output(os.path.join(jdir, "staged", f"d{num}.xml")) as fh:
+        fh.write(etree.tostring(div, encoding="utf-8"))
+
+def release(volume, xml_ids, missing_ok=False):
+    """Give reserved (or staged, uncommitted) ids back, e.g. when the worker holding them failed.
+
+    Returns the staged ids after the first released number: the next commit
+    moves them up to close the gap. ValueError for ids that are not
+    outstanding, unless missing_ok.
+    """
+    nums = [_num(i) for i in xml_ids]
+    with locked(volume) as jdir:
+        st = _state(jdir, volume)
+        unknown = [f"d{n}" for n in nums if n not in st["reserved"]]
+        if unknown and not missing_ok:
+            raise ValueError(f"not reserved: {', '.join(unknown)}")
+        nums = [n for n in nums if n in st["reserved"]]
+        if nums:
+            _log(jdir, op="release", nums=nums)
+        for n in nums:
+            _remove_staged(jdir, n)
+        behind = sorted(m for m in _state(jdir, volume)["staged"] if nums and m > min(nums))
+        _compact(jdir, volume)
+    return [f"d{m}" for m in behind]
+
+def _move(jdir, a, b):
+    # Renumber staged document a into the released number b: new file, then the record, then the old file goes.
+    div = etree.parse(os.path.join(jdir, "staged", f"d{a}.xml")).getroot()
+    _write_staged(jdir, b, div)
+    _log(jdir, op="move", frm=a, to=b)
+    _remove_staged(jdir, a)
+
+def _remove_staged(jdir, n):
+    try:
+        os.remove(os.path.join(jdir, "staged", f"d{n}.xml"))
+    except FileNotFoundError:
+        pass
+
+def _compact(jdir, volume):
+    # Nothing reserved or staged: the volume itself now says where numbering continues.
+    if not _state(jdir, volume)["reserved"]:
+        os.remove(os.path.join(jdir, JOURNAL))
+
+def _append(volume, divs):
+    if shards.is_sharded(volume):
+        return shards.append_docs(volume, divs)
+    return splice_append_file(volume, divs)
+
+def commit(volume):
+    """Append every staged document that can go in now, in id order; returns their ids.
+
+    Documents after a number that is reserved but not yet staged stay staged;
+    a released number is filled by moving the staged documents after it up.
+    RuntimeError if the volume was appended to outside the journal.
+    """
+    with locked(volume) as jdir:
+        st = _state(jdir, volume)
+        at = volume_max(volume)
+        if st["committing"]:
+            nums = st["committing"]
+            if at >= nums[-1]:  # the last commit reached the volume but not the journal
+                _log(jdir, op="done", nums=nums)
+                for n in nums:
+                    _remove_staged(jdir, n)
+                st = _state(jdir, volume)
+            elif at != nums[0] - 1:
+                raise RuntimeError(f"{volume}: highest id is d{at}, interrupted commit of d{nums[0]}-d{nums[-1]}")
+        if at != st["done"] and not st["committing"]:
+            raise RuntimeError(f"{volume} was appended to outside the journal (highest id d{at}, journal expects d{st['done']})")
+        nums = []
+        while True:
+            n = st["done"] + len(nums) + 1
+            if n in st["free"]:
+                after = [m for m in st["staged"] if m > n]
+                if not after:
+                    break
+                _move(jdir, min(after), n)
+                st = _state(jdir, volume)
+            if n not in st["staged"]:
+                break
+            nums.append(n)
+        if not nums:
+            _compact(jdir, volume)
+            return []
+        divs = [etree.parse(os.path.join(jdir, "staged", f"d{n}.xml")).getroot() for n in nums]
+        _log(jdir, op="commit", nums=nums)
+        ids = _append(volume, divs)
+        if ids != [f"d{n}" for n in nums]:  # cannot happen while the volume's highest id was checked above
+            raise RuntimeError(f"{volume}: committed as {ids}, expected d{nums[0]}-d{nums[-1]}")
+        _log(jdir, op="done", nums=nums)
+        for n in nums:
+            _remove_staged(jdir, n)
+        _compact(jdir, volume)
+    return ids
+
+def append(volume, divs):
+    """reserve + stage + commit for a list of divs.
+
+    Returns (ids given to divs, ids committed by this call); some of the
+    former may still be staged behind another worker's reservation.
+    """
+    ids = reserve(volume, len(divs))
+    try:
+        for xml_id, div in zip(ids, divs):
+            stage(volume, xml_id, div)
+    except BaseException:
+        release(volume, ids, missing_ok=True)  # all or nothing: none of these documents goes in
+        raise
+    return ids, commit(volume)
+
+def status(volume):
+    """Outstanding reservations and staged documents, and where the volume's numbering stands.
+
+    Read-only: the journal is append-only with whole fsynced lines, so it is
+    replayed without taking the lock (a record being written is ignored).
+    """
+    st = _state(journal_dir(volume), volume, write=False)
+    return {"volume_max": st["done"],
+            "reserved": {f"d{n}": by for n, by in sorted(st["reserved"].items()) if n not in st["staged"]},
+            "staged": [f"d{n}" for n in sorted(st["staged"])], "free": [f"d{n}" for n in sorted(st["free"])]}
@@ -0,0 +1,124 @@
+"""OCR fallback for pages with no text layer, using a local Tesseract.
+
+Only pages whose extracted text is empty are rendered (pypdfium2) and passed
+to the `tesseract` executable ($SEWARD_TESSERACT, else found on PATH). Pages
+are OCR'd in parallel worker processes, and each result is cached under the
+hash of the rendered page image plus the Tesseract version and settings, so a
+re-run over the same scans only renders.
+"""
+import io, os, shutil, hashlib, subprocess, tempfile, time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, ExitStack
+from functools import lru_cache
+from . import instrument
+
+DEFAULT_LANG = "eng"
+DEFAULT_DPI = 300
+
+def tesseract_path():
+    return shutil.which(os.environ.get("SEWARD_TESSERACT") or "tesseract")
+
+def available():
+    return tesseract_path() is not None
+
+@lru_cache(maxsize=None)
+def tesseract_version(exe):
+    out = subprocess.run([exe, "--version"], capture_output=True, text=True, check=True)
+    return (out.stdout or out.stderr).splitlines()[0].strip()
+
+def render_png(pdf_path, index, dpi=DEFAULT_DPI):
+    import pypdfium2
+    pdf = pypdfium2.PdfDocument(pdf_path)
+    try:
+        page = pdf[index]
+        image = page.render(scale=dpi / 72, grayscale=True).to_pil()
+        page.close()
+    finally:
+        pdf.close()
+    buf = io.BytesIO()
+    image.save(buf, format="PNG")
+    return buf.getvalue()
+
+def run_tesseract(png, exe, lang=DEFAULT_LANG):
+    out = subprocess.run([exe, "stdin", "stdout", "-l", lang], input=png, capture_output=True, check=True)
+    return out.stdout.decode("utf-8", "replace")
+
+def ocr_page(pdf_path, index, lang=DEFAULT_LANG, dpi=DEFAULT_DPI, use_cache=True):
+    """OCR page `index` (0-based); returns (text, seconds, cached). Runs in a worker process."""
+    from . import cache
+    t0 = time.perf_counter()
+    exe = tesseract_path()
+    png = render_png(pdf_path, index, dpi)
+    h = hashlib.sha256(png)
+    h.update(f"{tesseract_version(exe)}|{lang}|{dpi}".encode())
+    key = h.hexdigest()
+    if use_cache:
+        hit = cache.get(key, kind="ocr")
+        if hit is not None:
+            return hit["text"], time.perf_counter() - t0, True
+    text = run_tesseract(png, exe, lang)
+    if use_cache:
+        cache.put(key, {"text": text}, kind="ocr")
+    return text, time.perf_counter() - t0, False
+
+def needs_ocr(rec):
+    return not rec["text"].strip()
+
+def _require_tesseract():
+    if not available():
+        raise RuntimeError("OCR requested but tesseract was not found (install it or set SEWARD_TESSERACT)")
+
+@contextmanager
+def _as_path(pdf_path):
+    # Workers open the PDF by path; an in-memory upload is spilled to a temp
+    # file once rather than pickled into every task.
+    if isinstance(pdf_path, (str, os.PathLike)):
+        yield os.fspath(pdf_path); return
+    data = pdf_path.getvalue() if hasattr(pdf_path, "getvalue") else None
+    if data is None:
+        pos = pdf_path.tell()  # don't disturb a reader that is still using the file
+        pdf_path.seek(0); data = pdf_path.read(); pdf_path.seek(pos)
+    fd, tmp = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        yield tmp
+    finally:
+        os.remove(tmp)
+
+def fill_empty_pages(pdf_path, pages, make_record, workers=None, lang=DEFAULT_LANG, dpi=DEFAULT_DPI, use_cache=True):
+    """Replace pages with no text layer by their OCR text (in place); returns pages.
+
+    make_record(n, text) builds a page record the same way extraction does.
+    """
+    todo = [i for i, rec in enumerate(pages) if needs_ocr(rec)]
+    if not todo:
+        return pages
+    _require_tesseract()
+    workers = min(workers or os.cpu_count() or 1, len(todo))
+    with instrument.stage("ocr", pages=len(todo), workers=workers) as info, _as_path(pdf_path) as src:
+        if workers == 1:
+            results = [ocr_page(src, pages[i]["n"] - 1, lang, dpi, use_cache) for i in todo]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(ocr_page, src, pages[i]["n"] - 1, lang, dpi, use_cache) for i in todo]
+                results = [f.result() for f in futures]
+        for i, (text, secs, cached) in zip(todo, results):
+            pages[i] = dict(make_record(pages[i]["n"], text), ocr=True)
+            instrument.page(pages[i]["n"], secs, ocr=True, cached=cached)
+        info["cached"] = sum(cached for _, _, cached in results)
+    return pages
+
+def fill_empty_stream(pdf_path, pages, make_record, lang=DEFAULT_LANG, dpi=DEFAULT_DPI, use_cache=True):
+    """Streaming variant of fill_empty_pages: OCRs empty pages one at a time as they pass."""
+    with ExitStack() as stack:
+        src = None
+        for rec in pages:
+            if needs_ocr(rec):
+                if src is None:
+                    _require_tesseract()
+                    src = stack.enter_context(_as_path(pdf_path))
+                text, secs, cached = ocr_page(src, rec["n"] - 1, lang, dpi, use_cache)
+                instrument.page(rec["n"], secs, ocr=True, cached=cached)
+                rec = dict(make_record(rec["n"], text), ocr=True)
+            yield rec
@@ -1,28 +1,146 @@
-import re
+import os, re, time
 from datetime import datetime
-import pdfplumber
+from concurrent.futures import ProcessPoolExecutor
 from lxml import etree
+from . import instrument
+from .ir import DocText, from_bytes as ir_from_bytes
+from .backends import TEXT_SETTINGS, get_backend, page_lines  # noqa: F401 (TEXT_SETTINGS re-exported)
 
 XMLNS = "http://www.w3.org/XML/1998/namespace"
 TEINS = "{http://www.tei-c.org/ns/1.0}"
 
 MONTHS = r"(January|February|March|April|May|June|July|August|September|October|November|December)"
 DATE_RE = re.compile(rf"{MONTHS}\s+\d{{1,2}},\s*\d{{4}}", re.IGNORECASE)
-CLASS_RE = re.compile(r"\b(SENSITIVE|SECRET|TOP SECRET|CONFIDENTIAL|UNCLASSIFIED|NOFORN|OADR|E\.O\.\s*12[0-9]{{3}}|EO\s*12[0-9]{{3}})\b", re.IGNORECASE)
+# The lookahead lets the engine reject most positions on one character before trying the alternation.
+CLASS_RE = re.compile(r"\b(?=[SCTUNOE])(SENSITIVE|SECRET|TOP SECRET|CONFIDENTIAL|UNCLASSIFIED|NOFORN|OADR|E\.O\.\s*12[0-9]{{3}}|EO\s*12[0-9]{{3}})\b", re.IGNORECASE)
 PARA_CLASS_RE = re.compile(r"^\s*\((TS|S|C|U)\)\s*")
 UPPER_HEAD_RE = re.compile(r"^[A-Z0-9 ,\-\.\'&:;\/\(\)]+$")
 LETTER_HEAD_RE = re.compile(r"^\s*([A-Z])\.\s+(.*)")
 NUMBER_POINT_RE = re.compile(r"^\s*(\d+)\.\s+(.*)")
+USSR_TITLE_RE = re.compile(r"U\.?S\.?\s+RELATIONS\s+WITH\s+THE\s+U\.?S\.?S\.?R\.?", re.IGNORECASE)
+NSDD75_TITLE_RE = re.compile(r"NATIONAL SECURITY DECISION DIRECTIVE\s+75", re.IGNORECASE)
+MEMO_FOR_RE = re.compile(r"^\s*MEMORANDUM\s+FOR", re.IGNORECASE)
+ADDRESSEE_SPLIT_RE = re.compile(r";|\s{2,}|,\s(?=[A-Z])")
+FOR_PRESIDENT_RE = re.compile(r"FOR\s+THE\s+PRESIDENT", re.IGNORECASE)
+SIGNER_RE = re.compile(r"FOR\s+THE\s+PRESIDENT[:\s\-]*([A-Z][A-Za-z\.\s\-']{2,})", re.IGNORECASE)
+MULTISPACE_RE = re.compile(r"\s{2,}")
+WS_RE = re.compile(r"\s+")
+NON_ALPHA_RE = re.compile(r"[^A-Za-z]")
 
-def extract_pages(pdf_path):
-    pages=[]
-    with pdfplumber.open(pdf_path) as pdf:
-        for i, page in enumerate(pdf.pages, start=1):
-            txt = page.extract_text() or ""
-            lines=[ln.rstrip() for ln in txt.splitlines()]
-            pages.append({"n":i,"text":txt,"lines":lines})
+def _page_record(n, txt):
+    lines=page_lines(txt)
+    return {"n":n,"text":txt,"lines":lines}
+
+def _text_record(n, txt):
+    # Enough for DocText, which derives the lines itself.
+    return {"n":n,"text":txt}
+
+def _timed_record(doc, i, make=_page_record):
+    t0 = time.perf_counter()
+    rec = make(i+1, doc.page_text(i))
+    return rec, time.perf_counter() - t0
+
+def _extract_range(pdf_path, start, stop, backend=None):
+    # Runs in a worker process: each shard opens the PDF itself. Pages go back
+    # as one DocText buffer, with their times since the parent's hooks don't
+    # exist here.
+    out=[]; times=[]
+    doc = get_backend(backend).open(pdf_path)
+    try:
+        for i in range(start, stop):
+            rec, secs = _timed_record(doc, i, _text_record)
+            out.append(rec); times.append(secs)
+    finally:
+        doc.close()
+    return DocText.from_records(out).to_bytes(), times
+
+def count_pages(pdf_path, backend=None):
+    doc = get_backend(backend).open(pdf_path)
+    try:
+        return len(doc)
+    finally:
+        doc.close()
+
+def _source_name(pdf_path):
+    return os.fspath(pdf_path) if isinstance(pdf_path, (str, os.PathLike)) else None
+
+def iter_pages(pdf_path, backend=None, ocr=False, ocr_lang=None, use_cache=True):
+    # Yields pages one at a time; backends drop their per-page objects as soon
+    # as the text is out, so memory doesn't grow with page count.
+    if ocr:
+        from . import ocr as _ocr
+        yield from _ocr.fill_empty_stream(pdf_path, iter_pages(pdf_path, backend), _page_record,
+                                          lang=ocr_lang or _ocr.DEFAULT_LANG, use_cache=use_cache)
+        return
+    yield from _iter_records(pdf_path, backend, _page_record)
+
+def _iter_records(pdf_path, backend, make):
+    src = _source_name(pdf_path)
+    doc = get_backend(backend).open(pdf_path)
+    try:
+        for i in range(len(doc)):
+            rec, secs = _timed_record(doc, i, make)
+            instrument.page(i+1, secs, pdf=src)
+            yield rec
+    finally:
+        doc.close()
+
+def page_shards(n_pages, workers, min_pages=8):
+    # A few more shards than workers so a slow shard doesn't hold up the pool.
+    n_shards = max(1, min(workers*4, n_pages // min_pages or 1))
+    size = -(-n_pages // n_shards)
+    return [(s, min(s+size, n_pages)) for s in range(0, n_pages, size)]
+
+def extract_pages(pdf_path, workers=None, use_cache=False, backend=None, ocr=False, ocr_lang=None):
+    """Every page of pdf_path as a DocText (see seward.ir): p["n"], p["text"], p["lines"] per page.
+
+    With ocr=True, pages without a text layer are OCR'd (see seward.ocr). A
+    cache hit is mapped from the cache file: close() the result, or use it in
+    a `with` block, once done with it.
+    """
+    pages = _extract_text_layer(pdf_path, workers, use_cache, backend)
+    if ocr:
+        from . import ocr as _ocr
+        if any(_ocr.needs_ocr(p) for p in pages):
+            with pages:  # the filled-in copy replaces it
+                pages = DocText.from_records(_ocr.fill_empty_pages(pdf_path, list(pages), _text_record, workers=workers,
+                                                                   use_cache=use_cache, lang=ocr_lang or _ocr.DEFAULT_LANG))
     return pages
 
+def _extract_text_layer(pdf_path, workers, use_cache, backend):
+    src = _source_name(pdf_path)
+    engine = get_backend(backend)
+    with instrument.stage("extract", pdf=src, backend=engine.name, cache="off") as info:
+        if use_cache and src is not None:
+            from . import cache
+            key = cache.cache_key(pdf_path, engine.cache_settings(), engine.version())
+            pages = cache.get(key)
+            info["cache"] = "miss" if pages is None else "hit"
+            if pages is None:
+                pages = _extract_uncached(pdf_path, workers, engine.name)
+                cache.put(key, pages)
+        else:
+            pages = _extract_uncached(pdf_path, workers, engine.name)
+        info["pages"] = len(pages)
+        return pages
+
+def _extract_uncached(pdf_path, workers, backend):
+    src = _source_name(pdf_path)
+    if workers and workers > 1 and src is not None:
+        shards = page_shards(count_pages(pdf_path, backend), workers)
+        if len(shards) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as pool:
+                futures = [pool.submit(_extract_range, pdf_path, a, b, backend) for a, b in shards]
+                parts=[]
+                for fut in futures:
+                    data, times = fut.result()
+                    part = ir_from_bytes(data)
+                    for n, secs in zip(part.page_n, times):
+                        instrument.page(n, secs, pdf=src)
+                    parts.append(part)
+                return DocText.concat(parts)
+    return DocText.from_records(_iter_records(pdf_path, backend, _text_record))
+
 def coalesce_blocks(lines):
     blocks=[]; cur=[]
     for ln in lines:
@@ -32,15 +150,18 @@ def coalesce_blocks(lines):
     if cur: blocks.append("\n".join(cur).strip())
     return blocks
 
+def _parse_date(m):
+    try:
+        return m.group(0), datetime.strptime(m.group(0), "%B %d, %Y").date().isoformat()
+    except Exception:
+        return m.group(0), None
+
 def find_date(pages):
     for idx in [0,1,-1]:
-        if abs(idx) <= len(pages):
+        if -len(pages) <= idx < len(pages):
             m = DATE_RE.search(pages[idx]["text"])
             if m:
-                try:
-                    return m.group(0), datetime.strptime(m.group(0), "%B %d, %Y").date().isoformat()
-                except Exception:
-                    return m.group(0), None
+                return _parse_date(m)
     return None, None
 
 def find_place(first_page_lines):
@@ -51,9 +172,9 @@ def find_place(first_page_lines):
 
 def find_doc_title(pages):
     for ln in pages[0]["lines"][:100]:
-        if re.search(r"U\.?S\.?\s+RELATIONS\s+WITH\s+THE\s+U\.?S\.?S\.?R\.?", ln, re.IGNORECASE):
+        if USSR_TITLE_RE.search(ln):
             return "U.S. Relations with the USSR"
-        if re.search(r"NATIONAL SECURITY DECISION DIRECTIVE\s+75", ln, re.IGNORECASE):
+        if NSDD75_TITLE_RE.search(ln):
             return "National Security Decision Directive 75: U.S. Relations with the USSR"
     for ln in pages[0]["lines"][:40]:
         s=ln.strip()
@@ -61,51 +182,107 @@ def find_doc_title(pages):
             return s.title()
     return "NSDD (auto-extracted)"
 
+def _page_classes(p, seen):
+    lines=p["lines"]
+    cand=(lines[:8]+lines[-8:]) if lines else []
+    for ln in cand:
+        for m in CLASS_RE.findall(ln or ""):
+            seen.add(WS_RE.sub(" ", m.upper().strip()))
+
 def collect_doc_classes(pages):
     seen=set()
     for p in pages:
-        cand=(p["lines"][:8]+p["lines"][-8:]) if p["lines"] else []
-        for ln in cand:
-            for m in CLASS_RE.findall(ln or ""):
-                seen.add(re.sub(r"\s+"," ", m.upper().strip()))
+        _page_classes(p, seen)
     return sorted(seen)
 
+def _page_addressees(lines):
+    for i, ln in enumerate(lines):
+        if MEMO_FOR_RE.search(ln):
+            buf=[]
+            after=ln.split(":", 1)
+            if len(after)==2 and after[1].strip(): buf.append(after[1].strip())
+            j=i+1
+            while j<len(lines) and lines[j].strip():
+                buf.append(lines[j].strip()); j+=1
+            addrs=[]
+            for it in ADDRESSEE_SPLIT_RE.split(" ".join(buf)):
+                s=it.strip(" ;,")
+                if s and len(s)>2: addrs.append(s)
+            return addrs
+    return None
+
 def extract_addressees(pages):
-    addrs=[]
     for p in pages[:2]:
-        lines=p["lines"]
-        for i, ln in enumerate(lines):
-            if re.search(r"^\s*MEMORANDUM\s+FOR", ln, re.IGNORECASE):
-                j=i; buf=[]
-                after=re.split(r":", ln, maxsplit=1)
-                if len(after)==2 and after[1].strip(): buf.append(after[1].strip())
-                j+=1
-                while j<len(lines) and lines[j].strip():
-                    buf.append(lines[j].strip()); j+=1
-                text_block=" ".join(buf)
-                items=re.split(r";|\s{2,}|,\s(?=[A-Z])", text_block)
-                for it in items:
-                    s=it.strip(" ;,")
-                    if s and len(s)>2: addrs.append(s)
-                return addrs
-    return addrs
+        addrs=_page_addressees(p["lines"])
+        if addrs is not None:
+            return addrs
+    return []
+
+def _page_signer(p):
+    # One search over the whole page rules out most pages before the per-line scan.
+    lines=p["lines"]
+    if not FOR_PRESIDENT_RE.search("\n".join(lines)):
+        return None
+    for i, ln in enumerate(lines):
+        if FOR_PRESIDENT_RE.search(ln):
+            m=SIGNER_RE.search(" ".join(lines[i:i+3]))
+            if m:
+                return MULTISPACE_RE.sub(" ", m.group(1)).strip()
+    return None
 
 def extract_signer(pages):
     for p in pages:
-        for i, ln in enumerate(p["lines"]):
-            if re.search(r"FOR\s+THE\s+PRESIDENT", ln, re.IGNORECASE):
-                nearby=" ".join(p["lines"][i:i+3])
-                m=re.search(r"FOR\s+THE\s+PRESIDENT[:\s\-]*([A-Z][A-Za-z\.\s\-']{2,})", nearby, re.IGNORECASE)
-                if m:
-                    return re.sub(r"\s{2,}"," ", m.group(1)).strip()
+        signer=_page_signer(p)
+        if signer:
+            return signer
     return None
 
+class MetadataScanner:
+    """Collects document metadata from pages fed one at a time, in a single pass.
+
+    Only the first two pages and the latest page are kept; everything else is
+    reduced to the classification set, and the signer search stops once found.
+    """
+    def __init__(self):
+        self.n=0; self.first=[]; self.last=None
+        self.place=None; self.title=None
+        self.classes=set(); self.signer=None
+
+    def feed(self, p):
+        if self.n == 0:
+            self.place = find_place(p["lines"])
+            self.title = find_doc_title([p])
+        if self.n < 2: self.first.append(p)
+        else: self.last = p
+        _page_classes(p, self.classes)
+        if self.signer is None:
+            self.signer = _page_signer(p)
+        self.n += 1
+
+    def result(self):
+        if not self.n:
+            raise ValueError("no pages to scan")
+        date_human, date_iso = find_date(self.first + ([self.last] if self.last is not None else []))
+        return {
+            "date_human": date_human, "date_iso": date_iso,
+            "place": self.place, "title": self.title,
+            "classes": sorted(self.classes),
+            "addressees": extract_addressees(self.first),
+            "signer": self.signer,
+        }
+
+def scan_metadata(pages):
+    scanner = MetadataScanner()
+    for p in pages:
+        scanner.feed(p)
+    return scanner.result()
+
 def looks_like_head(text):
     raw=" ".join([ln.strip() for ln in text.splitlines()])
     if raw.lower().startswith("memorandum for"): return False
-    if len(raw)<=110 and UPPER_HEAD_RE.match(raw) and sum(c.isupper() for c in raw) >= 0.6*len(re.sub(r"[^A-Za-z]","",raw) or "A"):
+    if len(raw)<=110 and UPPER_HEAD_RE.match(raw) and sum(c.isupper() for c in raw) >= 0.6*len(NON_ALPHA_RE.sub("",raw) or "A"):
         return True
-    if raw.endswith(":") and sum(c.isupper() for c in raw) > 0.5*len(re.sub(r"[^A-Za-z]","",raw) or "A"):
+    if raw.endswith(":") and sum(c.isupper() for c in raw) > 0.5*len(NON_ALPHA_RE.sub("",raw) or "A"):
         return True
     return False
 
@@ -117,6 +294,6 @@ def annotate_para_classification(text):
         return new_text, cls
     return text, None
 
-def build_document_div(pages, volume_id, doc_xml_id, doc_number):
+def build_document_div(pages, volume_id, doc_xml_id, doc_number, rules=None):
     from .tei import build_doc_div
-    return build_doc_div(pages, volume_id, doc_xml_id, doc_number)
+    return build_doc_div(pages, volume_id, doc_xml_id, doc_number, rules)
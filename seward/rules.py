@@ -0,0 +1,220 @@
+"""Block-classification rules: YAML rule packs compiled into one dispatcher.
+
+A rule pack (seward/rulesets/<doc type>.yaml, or any YAML file with the same
+layout; memo.yaml documents it) lists rules in priority order. Compiling a
+pack joins every rule's `match` regex into one alternation (one for blocks
+inside a section and one for blocks outside, without the in_section rules),
+so a block needs a single regex call to find the first pattern rule that can
+apply; only that rule and the non-pattern rules before it are then tested.
+Shape tests on the joined lines (headings) are skipped when a cheap check on
+the block itself already rules them out. Compiled packs are cached per file
+and modification time.
+"""
+import os, re
+from functools import lru_cache
+
+RULESET_DIR = os.path.join(os.path.dirname(__file__), "rulesets")
+DEFAULT_RULES = "memo"
+ACTIONS = ("section", "item", "head", "para")
+WS_RE = re.compile(r"\s+")
+NON_ALPHA_RE = re.compile(r"[^A-Za-z]")
+
+class _Shape:
+    # One `any` alternative: tests on the block's stripped, space-joined lines
+    # ("raw"), plus a cheap necessary condition on the block itself, so most
+    # blocks are rejected before raw is built.
+    def __init__(self, spec):
+        self.max_len = spec.get("max_len")
+        self.ends_with = spec.get("ends_with")
+        self.min_upper = spec.get("min_upper"); self.above_upper = spec.get("above_upper")
+        cs = spec.get("charset")
+        self.charset = re.compile("[%s]+" % cs) if cs else None
+        # raw keeps every non-space character of the block, and ends with the last line's text.
+        self.pre_charset = re.compile("[%s\\s]*" % cs) if cs else None
+        self.pre_end = self.ends_with if self.ends_with and self.ends_with == self.ends_with.strip() else None
+
+    def ok(self, raw, counts):
+        if self.max_len is not None and len(raw) > self.max_len: return False
+        if self.ends_with is not None and not raw.endswith(self.ends_with): return False
+        if self.charset is not None and not self.charset.fullmatch(raw): return False
+        if self.min_upper is not None or self.above_upper is not None:
+            upper, letters = counts(raw)
+            if self.min_upper is not None and not upper >= self.min_upper * letters: return False
+            if self.above_upper is not None and not upper > self.above_upper * letters: return False
+        return True
+
+def _counts(raw, _memo={}):
+    # (uppercase characters, ASCII letters or 1) of the last block asked about
+    if _memo.get("raw") is not raw:
+        _memo["raw"] = raw; _memo["v"] = (sum(map(str.isupper, raw)), len(NON_ALPHA_RE.sub("", raw)) or 1)
+    return _memo["v"]
+
+class Rule:
+    __slots__ = ("name", "action", "regex", "ngroups", "group_len", "in_section", "unless", "shapes", "n", "text", "head", "level")
+
+    def __init__(self, spec, index):
+        self.name = spec.get("name") or f"rule{index}"
+        self.action = spec.get("action")
+        if self.action not in ACTIONS:
+            raise ValueError(f"rule {self.name!r}: action must be one of {', '.join(ACTIONS)}")
+        try:
+            self.regex = re.compile(spec["match"]) if spec.get("match") else None
+            self.unless = re.compile(spec["unless"]) if spec.get("unless") else None
+            self.shapes = [_Shape(alt) for alt in spec.get("any") or []]
+        except re.error as e:
+            raise ValueError(f"rule {self.name!r}: bad regex: {e}") from None
+        if self.regex is not None and self.regex.groupindex:
+            raise ValueError(f"rule {self.name!r}: use numbered groups, not named ones")
+        self.ngroups = self.regex.groups if self.regex is not None else 0
+        self.group_len = []
+        for g, bounds in (spec.get("group_len") or {}).items():
+            if not (isinstance(bounds, (list, tuple)) and len(bounds) == 2
+                    and all(isinstance(x, int) and not isinstance(x, bool) for x in bounds)):
+                raise ValueError(f"rule {self.name!r}: group_len bounds must be [min, max] integers")
+            try:
+                self.group_len.append((int(g) - 1, bounds[0], bounds[1]))
+            except (TypeError, ValueError):
+                raise ValueError(f"rule {self.name!r}: group_len keys must be group numbers") from None
+        self.in_section = bool(spec.get("in_section"))
+        self.n, self.text, self.head = spec.get("n"), spec.get("text"), spec.get("head")
+        self.level = str(spec.get("level", 3 if self.action == "section" else 2))
+
+    def applies(self, block, in_section, groups):
+        if self.in_section and not in_section:
+            return False
+        for g, lo, hi in self.group_len:
+            if not lo <= len(groups[g] or "") <= hi:
+                return False
+        shapes = self.shapes
+        if shapes:
+            shapes = [sh for sh in shapes if (sh.pre_charset is None or sh.pre_charset.fullmatch(block))
+                      and (sh.pre_end is None or block.rstrip().endswith(sh.pre_end))]  # the cheap necessary conditions
+            if not shapes:
+                return False
+        if self.shapes or self.unless is not None:
+            raw = " ".join(map(str.strip, block.splitlines()))
+            if self.unless is not None and self.unless.match(raw):
+                return False
+            if self.shapes and not any(sh.ok(raw, _counts) for sh in shapes):
+                return False
+        return True
+
+class RuleSet:
+    """Compiled rule pack; classify(block, in_section) -> (rule, n, text, marking)."""
+    def __init__(self, spec, name):
+        self.name = spec.get("doc_type") or name
+        self.rules = [Rule(r, i) for i, r in enumerate(spec.get("rules") or [])]
+        last = self.rules[-1] if self.rules else None
+        if last is None or last.action != "para" or last.regex or last.shapes or last.unless or last.in_section:
+            self.rules.append(Rule({"name": "paragraph", "action": "para"}, len(self.rules)))
+        pc = spec.get("para_classification")
+        self.para_class = re.compile(pc) if pc else None
+        self._plans = (self._plan(False), self._plan(True))
+
+    def _plan(self, in_section):
+        # The rules that can apply in (or out of) a section. Their pattern rules
+        # become alternatives of one regex; the alternative that matched
+        # (m.lastindex) names the only pattern rule that can apply before a
+        # fall-through, since earlier alternatives failed. Returns that regex
+        # and, per alternative (0: none matched), the rules to test in order:
+        # the non-pattern rules before it, then the pattern rule itself, each
+        # as (rule, group base or 0, index, whether it has tests beyond its regex).
+        alts = []; steps = {}; pending = []; group = 1
+        for i, r in enumerate(self.rules):
+            if r.in_section and not in_section:
+                continue
+            tested = bool(r.group_len or r.shapes or r.unless)
+            if r.regex is None:
+                pending.append((r, 0, i, tested))
+            else:
+                alts.append("(%s)" % r.regex.pattern)
+                steps[group] = tuple(pending) + ((r, group, i, tested),)
+                group += 1 + r.ngroups
+        steps[0] = tuple(pending)
+        try:
+            combined = re.compile("|".join(alts)) if alts else None
+        except re.error:  # e.g. a global inline flag such as (?i), only valid at the start of a pattern
+            combined = None
+        return combined, steps
+
+    def classify(self, block, in_section):
+        combined, steps = self._plans[1 if in_section else 0]
+        if combined is None:
+            return self._scan(block, in_section, 0)
+        m = combined.match(block)
+        for rule, base, i, tested in steps[m.lastindex if m is not None else 0]:
+            groups = m.groups()[base:base + rule.ngroups] if base else ()
+            if not tested or rule.applies(block, in_section, groups):
+                return self._result(rule, block, groups)
+            if base:
+                # This rule's alternative matched but another test failed: later
+                # pattern rules have to be tried with their own regexes.
+                return self._scan(block, in_section, i + 1)
+        raise AssertionError("the trailing paragraph rule always applies")
+
+    def annotate(self, text):
+        # Strip a leading portion marking; returns (text, marking or None).
+        if self.para_class is not None:
+            m = self.para_class.match(text)
+            if m:
+                return text[m.end():].strip(), m.group(1)
+        return text, None
+
+    def _scan(self, block, in_section, start):
+        # The rules from `start` on, each with its own regex.
+        for rule in self.rules[start:]:
+            groups = ()
+            if rule.regex is not None:
+                m = rule.regex.match(block)
+                if m is None:
+                    continue
+                groups = m.groups()
+            if rule.applies(block, in_section, groups):
+                return self._result(rule, block, groups)
+        raise AssertionError("the trailing paragraph rule always applies")
+
+    def _result(self, rule, block, groups):
+        action = rule.action
+        if action == "para" and not (rule.text or rule.n):  # the common case, first
+            m = self.para_class.match(block) if self.para_class is not None else None
+            return (rule, None, block, None) if m is None else (rule, None, block[m.end():].strip(), m.group(1))
+        n = groups[rule.n - 1] if rule.n else None
+        if action == "section":
+            return rule, n, (groups[rule.head - 1] if rule.head else block).strip(), None
+        if action == "head":
+            return rule, n, WS_RE.sub(" ", block).strip().rstrip(":"), None
+        if action == "item":
+            text, mark = self.annotate((groups[rule.text - 1] if rule.text else block).strip())
+        else:
+            text, mark = self.annotate(groups[rule.text - 1] if rule.text else block)
+        return rule, n, text, mark
+
+def ruleset_path(rules=None):
+    """Path of a rule pack given by name (seward/rulesets/NAME.yaml) or file path."""
+    rules = rules or DEFAULT_RULES
+    if os.path.sep in rules or rules.endswith((".yaml", ".yml")):
+        return os.path.abspath(rules)
+    path = os.path.join(RULESET_DIR, rules + ".yaml")
+    if not os.path.exists(path):
+        raise ValueError(f"unknown rule pack {rules!r} (built in: {', '.join(available())}; or give a YAML file)")
+    return path
+
+def available():
+    return sorted(os.path.splitext(f)[0] for f in os.listdir(RULESET_DIR) if f.endswith(".yaml"))
+
+@lru_cache(maxsize=16)
+def _compile(path, mtime_ns):
+    import yaml  # only when a pack is first compiled: keeps it off CLI startup
+    with open(path, encoding="utf-8") as fh:
+        try:
+            spec = yaml.safe_load(fh) or {}
+        except yaml.YAMLError as e:
+            raise ValueError(f"{path}: {e}") from None
+    return RuleSet(spec, os.path.splitext(os.path.basename(path))[0])
+
+def get_ruleset(rules=None):
+    """Compiled rule pack (name or YAML path; default memo), reused until the file changes."""
+    if isinstance(rules, RuleSet):
+        return rules
+    path = ruleset_path(rules)
+    return _compile(path, os.stat(path).st_mtime_ns)
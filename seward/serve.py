@@ -0,0 +1,333 @@
+"""Async HTTP API over the converter, for tools that would otherwise spawn the CLI per request.
+
+    GET  /health
+    POST /convert?volume_id=&doc_id=&doc_number=&backend=&ocr=1&ocr_lang=&format=json
+         body: the PDF. Returns the TEI (or JSON with "xml" and "validation").
+    POST /append?backend=&ocr=1&ocr_lang=&fast=1
+         body: multipart/form-data with a "volume" part and one or more "pdf"
+         parts (appended in order). Returns the updated volume.
+    POST /validate
+         body: TEI XML. Returns JSON with "valid" and "validation".
+
+Request bodies are spooled to a temporary directory (written from a thread),
+and the work, multipart parsing included, runs in a process pool that is
+started and warmed at startup: PDF libraries imported and the Relax
+NG/Schematron schemas compiled once per worker. A semaphore bounds the requests being worked on at once, and when too many are already
+waiting the server answers 503. A worker that dies takes the pool down with
+it: the pool is replaced by a fresh, warmed one, and the requests that were
+on it get 503. Large results are streamed from disk in chunks.
+"""
+import asyncio, io, os, json, time, tempfile, email.parser, email.policy
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from urllib.parse import urlsplit, parse_qs
+from . import __version__
+
+DEFAULT_PORT = 8750
+CHUNK = 1 << 16
+STREAM_OVER = 1 << 20  # responses larger than this are sent chunked
+SPOOL = 1 << 20  # request bodies are written to disk in pieces of about this size
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 411: "Length Required",
+           413: "Payload Too Large", 422: "Unprocessable Entity", 431: "Request Header Fields Too Large",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+# --- worker side -------------------------------------------------------------
+
+_schemas = (None, None)  # (rng_bytes, sch_bytes), set per worker by _warm
+
+def _warm(rng_bytes, sch_bytes):
+    global _schemas
+    _schemas = (rng_bytes, sch_bytes)
+    import pdfplumber, pypdfium2  # noqa: F401  (import cost paid once, here)
+    from .validate import get_relaxng, get_schematron
+    if rng_bytes:
+        get_relaxng(rng_bytes)
+    if sch_bytes:
+        get_schematron(sch_bytes, persist=True)
+
+def _ping():
+    return os.getpid()
+
+def _validate(data):
+    from .validate import validate_with_schemas
+    return validate_with_schemas(data, *_schemas, persist=True)
+
+def _validate_file(path):
+    from .validate import validate_file
+    return validate_file(path, *_schemas, persist=True)
+
+def convert_job(pdf_path, volume_id, doc_id, doc_number, backend, ocr, ocr_lang):
+    from lxml import etree
+    from .parser import extract_pages, build_document_div
+    from .tei import wrap_as_tei
+    with extract_pages(pdf_path, workers=1, use_cache=True, backend=backend, ocr=ocr, ocr_lang=ocr_lang) as pages:
+        tei = wrap_as_tei(build_document_div(pages, volume_id, doc_id, doc_number), volume_id)
+    data = etree.tostring(tei, pretty_print=True, xml_declaration=True, encoding="utf-8")
+    return data, _validate(data)
+
+def append_job(volume_path, div_bytes, out_path, fast):
+    from lxml import etree
+    from .tei import append_many_to_file, splice_append_file
+    divs = [etree.fromstring(b) for b in div_bytes]
+    if fast:
+        ids = splice_append_file(volume_path, divs, out_path)
+    else:
+        ids = append_many_to_file(volume_path, divs, out_path)
+    return ids, _validate_file(out_path)
+
+def split_form(body_path, ctype, tmp):
+    """Write the parts of a multipart/form-data body to tmp; returns (volume path or None, pdf paths)."""
+    with open(body_path, "rb") as fh:
+        msg = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            b"Content-Type: " + ctype.encode("latin-1") + b"\r\n\r\n" + fh.read())
+    volume = None; pdfs = []
+    for i, part in enumerate(msg.iter_parts()):
+        name = part.get_param("name", header="content-disposition")
+        path = os.path.join(tmp, f"part{i}")
+        with open(path, "wb") as fh:
+            fh.write(part.get_payload(decode=True) or b"")
+        if name == "volume":
+            volume = path
+        elif name == "pdf":
+            pdfs.append(path)
+    return volume, pdfs
+
+def validate_job(xml_path):
+    return _validate_file(xml_path)
+
+def verdict(report):
+    """True/False from a validate_with_schemas report; None when every check was skipped."""
+    lines = report.splitlines()
+    if any("FAIL" in ln or "error" in ln for ln in lines):
+        return False
+    return True if any("PASS" in ln for ln in lines) else None
+
+# --- server side -------------------------------------------------------------
+
+def _flag(query, name):
+    return query.get(name, [""])[0].lower() in ("1", "true", "yes")
+
+def _backend(query):
+    from .backends import get_backend
+    try:
+        return get_backend(query.get("backend", [None])[0] or None).name
+    except ValueError as e:
+        raise HTTPError(400, str(e)) from None
+
+class Server:
+    def __init__(self, workers=None, max_concurrent=None, max_queue=64, max_body=200 << 20, rng_bytes=None, sch_bytes=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_concurrent = max_concurrent or self.workers * 2
+        self.max_queue = max_queue
+        self.max_body = max_body
+        self.schemas = (rng_bytes, sch_bytes)
+        self.pool = None
+        self.sem = None
+        self.waiting = 0; self.busy = 0
+        self.stats = {"requests": 0, "rejected": 0, "errors": 0, "restarts": 0, "started": time.time()}
+
+    async def start(self):
+        self.sem = asyncio.Semaphore(self.max_concurrent)
+        await self._new_pool()
+
+    async def _new_pool(self):
+        loop = asyncio.get_running_loop()
+        self.pool = pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm, initargs=self.schemas)
+        # One task per worker so every process exists (and has run _warm) before the first request.
+        await asyncio.gather(*[loop.run_in_executor(pool, _ping) for _ in range(self.workers)])
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn, *args):
+        pool = self.pool
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, partial(fn, *args))
+        except BrokenProcessPool:
+            # A worker died (segfault in a PDF library, OOM kill) and took the pool with it. The first
+            # request to notice starts a fresh, warmed pool; every request that was on the old one fails.
+            self.stats["errors"] += 1
+            if self.pool is pool:
+                self.stats["restarts"] += 1
+                pool.shutdown(wait=False, cancel_futures=True)
+                await self._new_pool()
+            raise HTTPError(503, "a worker process died; retry") from None
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.respond(writer, 431, {"error": "request head too large"}, keep_alive=False)
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "malformed request line"}, keep_alive=False)
+                    break
+                headers = {}
+                for ln in lines[1:]:
+                    if ":" in ln:
+                        k, v = ln.split(":", 1)
+                        headers[k.strip().lower()] = v.strip()
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                if not await self.serve_one(reader, writer, method, target, headers, keep_alive) or not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def serve_one(self, reader, writer, method, target, headers, keep_alive):
+        """Read the body, dispatch, respond. Returns False when the connection can't be reused."""
+        self.stats["requests"] += 1
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            await self.respond(writer, 411, {"error": "send a Content-Length"}, keep_alive=False)
+            return False
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            await self.respond(writer, 400, {"error": "invalid Content-Length"}, keep_alive=False)
+            return False
+        if length > self.max_body:
+            await self.respond(writer, 413, {"error": f"body over {self.max_body} bytes"}, keep_alive=False)
+            return False
+        if headers.get("expect", "").lower() == "100-continue":
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        with tempfile.TemporaryDirectory(prefix="seward-serve-") as tmp:
+            body_path = os.path.join(tmp, "body")
+            loop = asyncio.get_running_loop()
+            with open(body_path, "wb") as fh:
+                left = length; buf = bytearray()
+                while left:
+                    chunk = await reader.read(min(CHUNK, left))
+                    if not chunk:
+                        return False
+                    buf += chunk; left -= len(chunk)
+                    if len(buf) >= SPOOL or not left:
+                        # Disk writes go to a thread so a slow disk doesn't stall other connections.
+                        await loop.run_in_executor(None, fh.write, buf)
+                        buf = bytearray()
+            try:
+                status, payload, ctype = await self.dispatch(method, target, headers, body_path, tmp)
+            except HTTPError as e:
+                status, payload, ctype = e.status, {"error": str(e)}, None
+            except Exception as e:  # conversion failures: bad PDF, unparsable XML, ...
+                self.stats["errors"] += 1
+                status, payload, ctype = 422, {"error": f"{type(e).__name__}: {e}"}, None
+            await self.respond(writer, status, payload, ctype, keep_alive)
+        return True
+
+    async def dispatch(self, method, target, headers, body_path, tmp):
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        routes = {"/health": ("GET", self.health), "/convert": ("POST", self.convert),
+                  "/append": ("POST", self.append), "/validate": ("POST", self.validate)}
+        if url.path not in routes:
+            raise HTTPError(404, f"no route {url.path}")
+        want, handler = routes[url.path]
+        if method != want:
+            raise HTTPError(405, f"{url.path} takes {want}")
+        if handler == self.health:
+            return await handler()
+        if self.sem.locked() and self.waiting >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise HTTPError(503, "server busy, retry later")
+        self.waiting += 1
+        try:
+            await self.sem.acquire()
+        finally:
+            self.waiting -= 1
+        self.busy += 1
+        try:
+            return await handler(query, headers, body_path, tmp)
+        finally:
+            self.busy -= 1
+            self.sem.release()
+
+    async def health(self):
+        return 200, {"status": "ok", "version": __version__, "workers": self.workers, "busy": self.busy,
+                     "waiting": self.waiting, "max_concurrent": self.max_concurrent,
+                     "schemas": {"rng": bool(self.schemas[0]), "sch": bool(self.schemas[1])},
+                     "uptime_seconds": round(time.time() - self.stats["started"], 1),
+                     **{k: v for k, v in self.stats.items() if k != "started"}}, None
+
+    async def convert(self, query, headers, body_path, tmp):
+        q = lambda name, default: query.get(name, [default])[0]
+        backend = _backend(query)
+        data, report = await self.run(convert_job, body_path, q("volume_id", "frus1981-88v03"), q("doc_id", "dAUTO"),
+                                      q("doc_number", "AUTO"), backend, _flag(query, "ocr"), q("ocr_lang", "eng"))
+        if q("format", "xml") == "json":
+            return 200, {"xml": data.decode("utf-8"), "validation": report, "valid": verdict(report)}, None
+        return 200, data, "application/xml"
+
+    async def append(self, query, headers, body_path, tmp):
+        from .batch import pdf_to_div_bytes
+        ctype = headers.get("content-type", "")
+        if not ctype.startswith("multipart/form-data"):
+            raise HTTPError(400, "send multipart/form-data with a volume part and pdf part(s)")
+        # Parsing a body of up to max_body bytes would hold up every other connection: it runs in the pool.
+        volume, pdfs = await self.run(split_form, body_path, ctype, tmp)
+        if volume is None or not pdfs:
+            raise HTTPError(400, "need a volume part and at least one pdf part")
+        backend = _backend(query)
+        ocr, lang = _flag(query, "ocr"), query.get("ocr_lang", ["eng"])[0]
+        # PDFs convert in parallel across the pool; the append itself is one job.
+        divs = await asyncio.gather(*[self.run(pdf_to_div_bytes, p, True, backend, ocr, lang) for p in pdfs])
+        out = os.path.join(tmp, "out.xml")
+        ids, report = await self.run(append_job, volume, list(divs), out, _flag(query, "fast"))
+        return 200, ("file", out, {"X-Seward-Ids": ",".join(ids), "X-Seward-Valid": json.dumps(verdict(report))}), "application/xml"
+
+    async def validate(self, query, headers, body_path, tmp):
+        report = await self.run(validate_job, body_path)
+        return 200, {"valid": verdict(report), "validation": report}, None
+
+    async def respond(self, writer, status, payload, ctype=None, keep_alive=True):
+        extra = {}
+        if isinstance(payload, tuple) and payload[0] == "file":
+            _, path, extra = payload
+            size = os.path.getsize(path)
+        else:
+            if not isinstance(payload, bytes):
+                payload = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                ctype = "application/json"
+            path = None; size = len(payload)
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {ctype}",
+                f"Connection: {'keep-alive' if keep_alive else 'close'}", "Server: seward/" + __version__]
+        head += [f"{k}: {v}" for k, v in extra.items()]
+        if status == 503:
+            head.append("Retry-After: 1")
+        chunked = size > STREAM_OVER
+        head.append("Transfer-Encoding: chunked" if chunked else f"Content-Length: {size}")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        src = open(path, "rb") if path else io.BytesIO(payload)
+        with src:
+            for chunk in iter(lambda: src.read(CHUNK), b""):
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk) if chunked else chunk)
+                await writer.drain()  # backpressure: never buffer more than a chunk ahead of the client
+            if chunked:
+                writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+async def serve(host="127.0.0.1", port=DEFAULT_PORT, ready=None, **options):
+    server = Server(**options)
+    await server.start()
+    srv = await asyncio.start_server(server.handle, host, port, limit=1 << 16)
+    if ready:
+        ready(srv.sockets[0].getsockname(), server)
+    try:
+        async with srv:
+            await srv.serve_forever()
+    finally:
+        server.close()
@@ -0,0 +1,202 @@
+"""Sharded volumes: one file per document plus a manifest, assembled on demand.
+
+Layout of a shard directory:
+
+    manifest.json   volume id, namespace prefix, highest d###, and the
+                    documents in order (xml:id, slot, file), one per line
+    skeleton.xml    the volume with each run of document divs replaced by a
+                    <!--seward-slot N--> marker
+    docs/d123.xml   one standalone document div per file
+
+Appending writes one new shard and the manifest; editing a document touches
+only its shard. assemble() streams skeleton and shards, one document in memory
+at a time, into the full volume. Split followed by assemble reproduces the
+original bytes of a pretty-printed volume.
+"""
+import os, re, json
+from collections import Counter
+from lxml import etree
+from .parser import XMLNS, TEINS
+from .tei import compute_next_doc_id, serialize_for_splice
+from . import instrument, xmlio
+
+MANIFEST = "manifest.json"
+SKELETON = "skeleton.xml"
+FORMAT = "seward-shards/1"
+SLOT_RE = re.compile(rb"<!--seward-slot (\d+)-->")
+XML_ID = "{%s}id" % XMLNS
+DECL = b"<?xml version='1.0' encoding='UTF-8'?>\n"
+
+def is_sharded(path):
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+def _atomic_write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with xmlio.atomic_output(path) as fh:
+        fh.write(data)
+
+def load_manifest(shard_dir):
+    with open(os.path.join(shard_dir, MANIFEST), encoding="utf-8") as fh:
+        manifest = json.load(fh)
+    if manifest.get("format") != FORMAT:
+        raise ValueError(f"{shard_dir}: not a {FORMAT} shard directory")
+    return manifest
+
+def save_manifest(shard_dir, manifest):
+    # One document per line, so appends show up as one-line diffs.
+    head = {k: v for k, v in manifest.items() if k != "docs"}
+    lines = [json.dumps(head, ensure_ascii=False)[:-1] + ', "docs": [']
+    lines.append(",\n".join("  " + json.dumps(d, ensure_ascii=False) for d in manifest["docs"]))
+    lines.append("]}\n")
+    _atomic_write(os.path.join(shard_dir, MANIFEST), "\n".join(lines).encode("utf-8"))
+
+def _ns_decl(prefix):
+    uri = TEINS[1:-1].encode()
+    return b' xmlns:%s="%s"' % (prefix.encode(), uri) if prefix else b' xmlns="%s"' % uri
+
+def _is_doc_div(el):
+    return el.tag == TEINS + "div" and el.get("type") == "document"
+
+def split_volume(volume_path, shard_dir):
+    """Write volume_path out as a shard directory; returns the manifest.
+
+    Shards are named by xml:id, so ValueError (before anything is written) if
+    a document div has no xml:id or shares one with another.
+    """
+    raw = xmlio.read_bytes(volume_path)
+    tree = etree.ElementTree(etree.fromstring(raw, etree.XMLParser(huge_tree=True, collect_ids=False)))
+    root = tree.getroot()
+    body = root.find(f"{TEINS}text/{TEINS}body")
+    if body is None:
+        raise ValueError("Volume has no <text>/<body>")
+    divs = [el for el in root.iter(TEINS + "div") if _is_doc_div(el)]
+    ids = [div.get(XML_ID) for div in divs]
+    if None in ids:
+        raise ValueError(f"{volume_path}: document {ids.index(None) + 1} has no xml:id")
+    dupes = sorted(i for i, n in Counter(ids).items() if n > 1)
+    if dupes:
+        raise ValueError(f"{volume_path}: duplicate document xml:id(s) {', '.join(dupes)}")
+    docs = []; slots = 0; marker = None
+    for div, doc_id in zip(divs, ids):
+        if marker is None or div.getprevious() is not marker:
+            marker = etree.Comment("seward-slot %d" % slots); slots += 1
+            div.addprevious(marker)
+        fname = f"docs/{doc_id}.xml"
+        _atomic_write(os.path.join(shard_dir, fname), DECL + etree.tostring(div, encoding="utf-8", with_tail=False) + b"\n")
+        docs.append({"id": doc_id, "slot": slots - 1, "file": fname})
+        marker.tail = div.tail  # the marker stands in for the whole run
+        div.getparent().remove(div)
+    if marker is None or body[-1] is not marker:
+        # Appends go at the end of <body>, as with append_to_volume.
+        marker = etree.Comment("seward-slot %d" % slots); slots += 1
+        level = "  " * sum(1 for _ in body.iterancestors())
+        if len(body):
+            marker.tail = body[-1].tail
+            body[-1].tail = (body[-1].tail or "") + "  "
+        else:
+            body.text = "\n" + level + "  "; marker.tail = "\n" + level
+        body.append(marker)
+    _atomic_write(os.path.join(shard_dir, SKELETON),
+                  etree.tostring(tree, xml_declaration=True, encoding="UTF-8") + raw[len(raw.rstrip()):])
+    nums = [int(d["id"][1:]) for d in docs if re.fullmatch(r"d\d+", d["id"])]
+    manifest = {"format": FORMAT, "volume_id": root.get(XML_ID), "prefix": root.prefix or "",
+                "append_slot": slots - 1, "max_num": max(nums, default=0), "docs": docs}
+    save_manifest(shard_dir, manifest)
+    return manifest
+
+def _slot_indent(piece):
+    # Whitespace that precedes the marker on its line; stripped and re-emitted before each document.
+    nl = piece.rfind(b"\n")
+    tail = piece[nl + 1:] if nl >= 0 else b""
+    if nl < 0 or tail.strip():
+        return piece, None
+    return piece[:nl], tail
+
+def _shard_body(data, prefix):
+    """A shard's document div as it sits in the volume: no declaration, no namespace declaration."""
+    if data.startswith(b"<?xml"):
+        data = data[data.index(b"?>") + 2:]
+    data = data.strip()
+    tag = b"<" + (prefix.encode() + b":" if prefix else b"") + b"div"
+    end = data.find(b">")
+    decl = _ns_decl(prefix)
+    if data.startswith(tag) and decl in data[:end]:
+        return data.replace(decl, b"", 1)
+    # Hand-edited shard in another namespace form: reserialize it under the volume's prefix.
+    return serialize_for_splice(etree.fromstring(data), prefix, "").lstrip(b"\n")
+
+def assemble(shard_dir, out):
+    """Stream the full volume to out (a binary file), one shard in memory at a time."""
+    manifest = load_manifest(shard_dir)
+    with open(os.path.join(shard_dir, SKELETON), "rb") as fh:
+        skeleton = fh.read()
+    by_slot = {}
+    for d in manifest["docs"]:
+        by_slot.setdefault(d["slot"], []).append(d["file"])
+    with instrument.stage("assemble", docs=len(manifest["docs"])):
+        pos = 0
+        for m in SLOT_RE.finditer(skeleton):
+            piece, indent = _slot_indent(skeleton[pos:m.start()])
+            out.write(piece)
+            for fname in by_slot.get(int(m.group(1)), []):
+                with open(os.path.join(shard_dir, fname), "rb") as fh:
+                    data = _shard_body(fh.read(), manifest["prefix"])
+                if indent is not None:
+                    out.write(b"\n" + indent)
+                out.write(data)
+            pos = m.end()
+        out.write(skeleton[pos:])
+
+def assemble_bytes(shard_dir):
+    import io
+    buf = io.BytesIO()
+    assemble(shard_dir, buf)
+    return buf.getvalue()
+
+def _indent_of_slot(shard_dir, slot):
+    with open(os.path.join(shard_dir, SKELETON), "rb") as fh:
+        skeleton = fh.read()
+    m = re.search(rb"<!--seward-slot %d-->" % slot, skeleton)
+    return (_slot_indent(skeleton[:m.start()])[1] or b"").decode()
+
+def _write_shard(shard_dir, fname, div, prefix, indent):
+    body = serialize_for_splice(div, prefix, indent).lstrip(b"\n")[len(indent):]
+    tag_end = body.index(b"div") + 3
+    _atomic_write(os.path.join(shard_dir, fname), DECL + body[:tag_end] + _ns_decl(prefix) + body[tag_end:] + b"\n")
+
+def append_docs(shard_dir, new_divs):
+    """Append document divs with consecutive d### ids: one new shard each, plus the manifest. Returns the new ids."""
+    if etree.iselement(new_divs): new_divs = [new_divs]
+    manifest = load_manifest(shard_dir)
+    slot = manifest["append_slot"]
+    indent = _indent_of_slot(shard_dir, slot)
+    num = manifest["max_num"]; ids = []
+    with instrument.stage("append", docs=len(new_divs), sharded=True):
+        for div in new_divs:
+            new_id, num = compute_next_doc_id([f"d{num}"] if num else [])
+            div.set(XML_ID, new_id)
+            dn = div.find(f".//{TEINS}docNumber")
+            if dn is not None: dn.text = str(num)
+            fname = f"docs/{new_id}.xml"
+            _write_shard(shard_dir, fname, div, manifest["prefix"], indent)
+            manifest["docs"].append({"id": new_id, "slot": slot, "file": fname})
+            ids.append(new_id)
+        manifest["max_num"] = num
+        save_manifest(shard_dir, manifest)
+    return ids
+
+def write_doc(shard_dir, div):
+    """Replace the stored document with div's xml:id (an edit touches only that shard)."""
+    manifest = load_manifest(shard_dir)
+    doc_id = div.get(XML_ID)
+    entry = next((d for d in manifest["docs"] if d["id"] == doc_id), None)
+    if entry is None:
+        raise KeyError(f"{doc_id}: no such document in {shard_dir}")
+    _write_shard(shard_dir, entry["file"], div, manifest["prefix"], _indent_of_slot(shard_dir, entry["slot"]))
+
+def read_doc(shard_dir, doc_id):
+    manifest = load_manifest(shard_dir)
+    entry = next((d for d in manifest["docs"] if d["id"] == doc_id), None)
+    if entry is None:
+        raise KeyError(f"{doc_id}: no such document in {shard_dir}")
+    return etree.parse(os.path.join(shard_dir, entry["file"])).getroot()
@@ -1,19 +1,14 @@
-import re, io
+import os, re, io, json, shutil, tempfile
 from lxml import etree
-from .parser import (
-    XMLNS, TEINS,
-    coalesce_blocks, LETTER_HEAD_RE, NUMBER_POINT_RE,
-    find_date, find_place, find_doc_title, collect_doc_classes,
-    extract_addressees, extract_signer, annotate_para_classification, looks_like_head
-)
-
-def build_doc_div(pages, volume_id, doc_xml_id, doc_number):
-    date_human, date_iso = find_date(pages)
-    place = find_place(pages[0]["lines"])
-    doc_title = find_doc_title(pages)
-    classes = collect_doc_classes(pages)
-    addressees = extract_addressees(pages)
-    signer = extract_signer(pages)
+from . import instrument, xmlio
+from .parser import XMLNS, TEINS, coalesce_blocks, MetadataScanner, scan_metadata
+from .rules import get_ruleset
+from .ir import Page
+
+def build_doc_head(meta, doc_xml_id, doc_number):
+    date_human, date_iso = meta["date_human"], meta["date_iso"]
+    place, doc_title, classes = meta["place"], meta["title"], meta["classes"]
+    addressees, signer = meta["addressees"], meta["signer"]
 
     div = etree.Element(TEINS + "div", attrib={"type":"document"})
     div.set("{%s}id" % XMLNS, doc_xml_id)
@@ -47,42 +42,130 @@ def build_doc_div(pages, volume_id, doc_xml_id, doc_number):
         if etree.QName(child).localname in fixed_order: idx+=1
         else: break
     div.insert(idx, opener)
+    return div
 
+def build_doc_body(pages, add, rules=None):
+    # add(el) receives each new child of the document div, in order; section
+    # divs are handed over when opened and keep filling up afterwards.
+    # rules: rule pack name/path (default memo) deciding what each block becomes.
+    classify = get_ruleset(rules).classify
     current_section_div=None
     current_list=None
     for p in pages:
-        etree.SubElement(div, TEINS + "pb", n=str(p["n"]))
-        blocks=coalesce_blocks(p["lines"])
-        for block in blocks:
-            mL = LETTER_HEAD_RE.match(block)
-            if mL and len(mL.group(2))>0 and len(mL.group(2))<140:
-                current_section_div = etree.SubElement(div, TEINS + "div", {"type":"section", "n":mL.group(1)})
-                etree.SubElement(current_section_div, TEINS + "head", level="3").text = mL.group(2).strip()
+        add(etree.Element(TEINS + "pb", n=str(p["n"])))
+        # DocText pages keep their blocks precomputed; plain records are coalesced here.
+        for block in (p.blocks() if isinstance(p, Page) else coalesce_blocks(p["lines"])):
+            rule, n, txt, pcl = classify(block, current_section_div is not None)
+            action = rule.action
+            if action == "section":
+                current_section_div = etree.Element(TEINS + "div", {"type":"section"})
+                if n is not None: current_section_div.set("n", n)
+                add(current_section_div)
+                etree.SubElement(current_section_div, TEINS + "head", level=rule.level).text = txt
                 current_list=None
-                continue
-            mN = NUMBER_POINT_RE.match(block)
-            if mN and current_section_div is not None:
+            elif action == "item":
                 if current_list is None:
                     current_list = etree.SubElement(current_section_div, TEINS + "list", {"type":"ordered"})
-                it=etree.SubElement(current_list, TEINS + "item", n=mN.group(1))
-                txt, pcl = annotate_para_classification(mN.group(2).strip())
+                it=etree.SubElement(current_list, TEINS + "item")
+                if n is not None: it.set("n", n)
                 pel = etree.SubElement(it, TEINS + "p")
                 if pcl: pel.set("ana", f"#{pcl}")
                 pel.text = txt
-                continue
-            if looks_like_head(block):
-                etree.SubElement(div, TEINS + "head", level="2").text = re.sub(r"\s+"," ", block).strip().rstrip(":")
+            elif action == "head":
+                hel = etree.Element(TEINS + "head", level=rule.level)
+                hel.text = txt
+                add(hel)
                 current_list=None
-                continue
-            txt, pcl = annotate_para_classification(block)
-            target = current_section_div if current_section_div is not None else div
-            pel = etree.SubElement(target, TEINS + "p")
-            if pcl: pel.set("ana", f"#{pcl}")
-            pel.text = txt
-
-    etree.SubElement(div, TEINS + "note", type="source").text = "Provenance: Ronald Reagan Presidential Library (Matlock Files)."
+            else:
+                pel = etree.Element(TEINS + "p")
+                if pcl: pel.set("ana", f"#{pcl}")
+                pel.text = txt
+                if current_section_div is not None: current_section_div.append(pel)
+                else: add(pel)
+
+def source_note():
+    note = etree.Element(TEINS + "note", type="source")
+    note.text = "Provenance: Ronald Reagan Presidential Library (Matlock Files)."
+    return note
+
+def build_doc_div(pages, volume_id, doc_xml_id, doc_number, rules=None):
+    with instrument.stage("build", pages=len(pages)):
+        div = build_doc_head(scan_metadata(pages), doc_xml_id, doc_number)
+        build_doc_body(pages, div.append, rules)
+        div.append(source_note())
     return div
 
+def _spool_and_scan(pages, spool):
+    # One pass over the page stream: spool page lines to disk for the body and
+    # feed the metadata scanner, which keeps only a few pages in memory.
+    scanner = MetadataScanner()
+    for p in pages:
+        spool.write(json.dumps({"n":p["n"],"lines":p["lines"]}) + "\n")
+        scanner.feed(p)
+    return scanner.result()
+
+class _SectionBuffer:
+    # The tree builder keeps filling the open section div after later <pb>s and
+    # level-2 heads have been added to the document div, so those are held back
+    # until the section is complete. Memory is bounded by one section.
+    def __init__(self, write):
+        self.write=write; self.section=None; self.pending=[]
+
+    def add(self, el):
+        if el.tag == TEINS + "div":
+            self.flush(); self.section = el
+        elif self.section is None:
+            self.write(el)
+        else:
+            self.pending.append(el)
+
+    def flush(self):
+        if self.section is not None:
+            self.write(self.section)
+        for el in self.pending:
+            self.write(el)
+        self.section=None; self.pending=[]
+
+STREAM_MARK = "seward-stream"
+
+def write_doc_stream(pages, out, volume_id, doc_xml_id, doc_number, rules=None):
+    """Stream a standalone TEI document for an iterable of pages to out (a binary file).
+
+    Output is byte-identical to pretty-printing wrap_as_tei(build_doc_div(...)).
+    """
+    with instrument.stage("stream"), tempfile.TemporaryFile("w+", encoding="utf-8") as spool:
+        meta = _spool_and_scan(pages, spool)
+        spool.seek(0)
+        head = build_doc_head(meta, doc_xml_id, doc_number)
+        # Serialize the skeleton once and split it around a marker: everything
+        # before goes out now, each child is serialized as it is finished, and
+        # the closing tags go out at the end. (etree.xmlfile would redeclare the
+        # TEI namespace on every written subtree.)
+        div = etree.Element(head.tag, dict(head.attrib))
+        div.append(etree.Comment(STREAM_MARK))
+        skeleton = etree.tostring(wrap_as_tei(div, volume_id), pretty_print=True, xml_declaration=True, encoding="utf-8")
+        before, after = skeleton.split(b"<!--%s-->" % STREAM_MARK.encode())
+        level = before.count(b"<") - 1  # open elements around the children, minus the declaration
+        ns_decl = b' xmlns:ns0="%s"' % TEINS[1:-1].encode()
+        sep = b"\n" + b"  " * level
+        first = [True]
+
+        def write(el):
+            etree.indent(el, space="  ", level=level)
+            data = etree.tostring(el, encoding="utf-8").replace(ns_decl, b"", 1)
+            if not first[0]: out.write(sep)
+            first[0] = False
+            out.write(data)
+
+        out.write(before)
+        for child in list(head):
+            write(child)
+        buf = _SectionBuffer(write)
+        build_doc_body((json.loads(ln) for ln in spool), buf.add, rules)
+        buf.flush()
+        write(source_note())
+        out.write(after)
+
 def wrap_as_tei(div, volume_id):
     TEI = etree.Element(TEINS + "TEI")
     TEI.set("{%s}id" % XMLNS, volume_id)
@@ -102,16 +185,175 @@ def compute_next_doc_id(doc_ids):
     return f"d{next_num}", next_num
 
 def append_to_volume(existing_xml_bytes, new_div):
-    import io
+    return append_many_to_volume(existing_xml_bytes, [new_div])
+
+def append_many_to_volume(existing_xml_bytes, new_divs):
+    """Append several document divs, in order, with consecutive ids in one parse/serialize cycle."""
     parser=etree.XMLParser(remove_blank_text=False)
-    vol=etree.parse(io.BytesIO(existing_xml_bytes), parser)
+    with instrument.stage("parse", bytes=len(existing_xml_bytes)):
+        vol=etree.parse(io.BytesIO(existing_xml_bytes), parser)
+    append_divs(vol, new_divs)
+    with instrument.stage("serialize", docs=len(new_divs)):
+        return etree.tostring(vol, pretty_print=True, xml_declaration=True, encoding="utf-8")
+
+def append_many_to_file(volume_path, new_divs, out_path):
+    """append_many_to_volume from file to file: the volume is parsed from disk and streamed out.
+
+    Neither side is held as bytes; .xml.gz/.xml.zst volumes are read and
+    written transparently and out_path is replaced atomically. Returns the new ids.
+    """
+    with instrument.stage("parse", bytes=os.path.getsize(volume_path)):
+        vol = xmlio.parse(volume_path, etree.XMLParser(remove_blank_text=False))
+    ids = append_divs(vol, new_divs)
+    with instrument.stage("serialize", docs=len(new_divs)):
+        xmlio.write_tree(vol, out_path)
+    return ids
+
+def append_divs(vol, new_divs):
+    """Give new_divs the next consecutive ids and docNumbers and append them to vol's body; returns their ids."""
     ns={"tei":"http://www.tei-c.org/ns/1.0"}
     body=vol.xpath("//tei:text/tei:body", namespaces=ns)[0]
     existing_ids=[el.get("{%s}id" % XMLNS) for el in body.xpath(".//tei:div[@type='document']", namespaces=ns)]
     existing_ids=[i for i in existing_ids if i]
-    new_id, new_num = compute_next_doc_id(existing_ids)
-    new_div.set("{%s}id" % XMLNS, new_id)
-    dn = new_div.find(f".//{TEINS}docNumber")
-    if dn is not None: dn.text = str(new_num)
-    body.append(new_div)
-    return etree.tostring(vol, pretty_print=True, xml_declaration=True, encoding="utf-8")
+    _, next_num = compute_next_doc_id(existing_ids)
+    for new_num, new_div in enumerate(new_divs, start=next_num):
+        new_div.set("{%s}id" % XMLNS, f"d{new_num}")
+        dn = new_div.find(f".//{TEINS}docNumber")
+        if dn is not None: dn.text = str(new_num)
+        body.append(new_div)
+    return [f"d{n}" for n in range(next_num, next_num + len(new_divs))]
+
+ROOT_TAG_RE = re.compile(rb"<(?:([\w.-]+):)?TEI[\s>]")
+DOC_DIV_RE = re.compile(rb"<(?:[\w.-]+:)?div\b[^>]*>")
+DOC_ID_RE = re.compile(rb"""\bxml:id\s*=\s*["']d(\d+)["']""")
+DOC_TYPE_RE = re.compile(rb"""\btype\s*=\s*["']document["']""")
+
+def scan_volume_index(existing_xml_bytes):
+    """Locate the splice point and the highest d### id with one byte-level scan (no XML parse)."""
+    data = existing_xml_bytes
+    m = ROOT_TAG_RE.search(data)
+    if not m:
+        raise ValueError("Not a TEI volume: no <TEI> root element")
+    prefix = m.group(1) or b""
+    tag = prefix + b":body" if prefix else b"body"
+    close = data.rfind(b"</" + tag + b">")
+    open_m = re.search(rb"<" + re.escape(tag) + rb"[\s>/]", data)
+    if close < 0 or not open_m:
+        raise ValueError("Volume has no <text>/<body>")
+    max_num = 0; last_div = -1
+    for dm in DOC_DIV_RE.finditer(data, open_m.start(), close):
+        t = dm.group(0)
+        if DOC_TYPE_RE.search(t):
+            last_div = dm.start()
+            im = DOC_ID_RE.search(t)
+            if im: max_num = max(max_num, int(im.group(1)))
+    insert_at = close
+    while insert_at > 0 and data[insert_at-1:insert_at] in b" \t\r\n":
+        insert_at -= 1
+    if last_div >= 0:
+        line_start = data.rfind(b"\n", 0, last_div) + 1
+        indent = data[line_start:last_div]
+        if indent.strip(): indent = b""
+    else:
+        indent = data[insert_at:close].lstrip(b"\r\n") + b"  "
+    return {"prefix": prefix.decode(), "insert_at": insert_at, "indent": indent.decode(),
+            "max_num": max_num, "size": len(data)}
+
+def serialize_for_splice(new_div, prefix, indent):
+    # Serialize under the volume's own namespace prefix and indentation so the
+    # spliced bytes read exactly as if the volume had been pretty-printed.
+    host = etree.Element(TEINS + "TEI", nsmap={prefix or None: TEINS[1:-1]})
+    host.append(new_div)
+    etree.indent(new_div, space="  ", level=len(indent) // 2)
+    new_div.tail = None
+    decl = (' xmlns:%s="%s"' % (prefix, TEINS[1:-1]) if prefix else ' xmlns="%s"' % TEINS[1:-1]).encode()
+    data = etree.tostring(new_div, encoding="utf-8").replace(decl, b"", 1)
+    host.remove(new_div)
+    return (b"\n" + indent.encode() if indent else b"") + data
+
+def _prepare_splice(new_divs, index):
+    chunks=[]; num=index["max_num"]
+    for new_div in new_divs:
+        new_id, num = compute_next_doc_id([f"d{num}"] if num else [])
+        new_div.set("{%s}id" % XMLNS, new_id)
+        dn = new_div.find(f".//{TEINS}docNumber")
+        if dn is not None: dn.text = str(num)
+        chunks.append(serialize_for_splice(new_div, index["prefix"], index["indent"]))
+    chunk = b"".join(chunks)
+    updated = dict(index, max_num=num, insert_at=index["insert_at"] + len(chunk), size=index["size"] + len(chunk))
+    return chunk, updated
+
+def splice_into_volume(existing_xml_bytes, new_divs, index=None):
+    """Append one div (or a list of divs, in order) without reparsing or reserializing the volume.
+
+    Other bytes are untouched. Returns (updated_bytes, updated_index).
+    """
+    if etree.iselement(new_divs): new_divs = [new_divs]
+    index = index or scan_volume_index(existing_xml_bytes)
+    chunk, updated = _prepare_splice(new_divs, index)
+    at = index["insert_at"]
+    return existing_xml_bytes[:at] + chunk + existing_xml_bytes[at:], updated
+
+def volume_index_path(volume_path):
+    return volume_path + ".idx.json"
+
+def load_volume_index(volume_path):
+    # The sidecar is trusted only while the volume's size and mtime still match it.
+    try:
+        with open(volume_index_path(volume_path), encoding="utf-8") as fh:
+            index = json.load(fh)
+        st = os.stat(volume_path)
+    except (OSError, ValueError):
+        return None
+    if index.get("size") != st.st_size or index.get("mtime_ns") != st.st_mtime_ns:
+        return None
+    return index
+
+def save_volume_index(volume_path, index):
+    index = dict(index, mtime_ns=os.stat(volume_path).st_mtime_ns)
+    with open(volume_index_path(volume_path), "w", encoding="utf-8") as fh:
+        json.dump(index, fh)
+
+def splice_append_file(volume_path, new_divs, out_path=None):
+    """Append one div (or a list of divs) to the volume file by splicing bytes, without reparsing it.
+
+    Uses the sidecar index when fresh, otherwise one byte-level scan. The
+    volume is streamed into a temporary file with the new divs inserted at the
+    splice point, which is renamed over out_path (the volume itself when unset).
+    A .gz/.zst volume (or out_path) is decompressed, spliced in memory and
+    written back whole. Returns the new xml:id (or the list of new ids for a list of divs).
+    """
+    single = etree.iselement(new_divs)
+    if single: new_divs = [new_divs]
+    out_path = out_path or volume_path
+    with instrument.stage("splice", docs=len(new_divs)):
+        if xmlio.compression(out_path) or xmlio.compression(volume_path):
+            # Compressed bytes can't be patched in place: splice the decompressed volume and write it out whole.
+            updated, _ = splice_into_volume(xmlio.read_bytes(volume_path), new_divs)
+            with xmlio.atomic_output(out_path) as fh:
+                fh.write(updated)
+        else:
+            _splice_file(volume_path, new_divs, out_path)
+    ids = [d.get("{%s}id" % XMLNS) for d in new_divs]
+    return ids[0] if single else ids
+
+def _splice_file(volume_path, new_divs, out_path):
+    index = load_volume_index(volume_path)
+    if index is None:
+        with open(volume_path, "rb") as fh:
+            index = scan_volume_index(fh.read())
+    chunk, updated = _prepare_splice(new_divs, index)
+    # Copied through with the chunk inserted and renamed into place when complete, in place too:
+    # a crash mid-write leaves the old volume, and its sidecar, which still matches it.
+    with open(volume_path, "rb") as src, xmlio.atomic_output(out_path) as fh:
+        _copy_n(src, fh, index["insert_at"])
+        fh.write(chunk)
+        shutil.copyfileobj(src, fh)
+    save_volume_index(out_path, updated)
+
+def _copy_n(src, dst, n, bufsize=1 << 20):
+    while n > 0:
+        data = src.read(min(n, bufsize))
+        if not data:
+            break
+        dst.write(data); n -= len(data)
@@ -1,16 +1,94 @@
-from lxml import etree
+import os, json, hashlib, threading, warnings
+from collections import Counter, OrderedDict
+from lxml import etree, isoschematron
+from . import instrument, xmlio
 
-def validate_with_schemas(tei_bytes, rng_bytes=None, sch_bytes=None):
-    report=[]
+SVRL_NS = {"svrl": "http://purl.oclc.org/dsdl/svrl"}
+MAX_COMPILED = 8
+
+# Compiled validators, keyed by (kind, schema content hash); shared by every
+# validation in the process (CLI batch workers, the app, the server).
+_compiled = OrderedDict()
+_lock = threading.Lock()
+
+def _schema_key(kind, schema_bytes):
+    return kind, hashlib.sha256(schema_bytes).hexdigest()
+
+def _cached(key, build):
+    with _lock:
+        if key in _compiled:
+            _compiled.move_to_end(key)
+            return _compiled[key]
+    obj = build()
+    with _lock:
+        _compiled[key] = obj
+        while len(_compiled) > MAX_COMPILED:
+            _compiled.popitem(last=False)
+    return obj
+
+def clear_compiled():
+    with _lock:
+        _compiled.clear()
+
+def get_relaxng(rng_bytes):
+    return _cached(_schema_key("rng", rng_bytes), lambda: etree.RelaxNG(etree.fromstring(rng_bytes)))
+
+def schematron_xslt_dir():
+    from .cache import cache_root
+    return os.path.join(cache_root(), "schematron")
+
+def _compile_schematron(sch_bytes, digest, persist):
+    # ISO Schematron compiles to an XSLT validator in three XSLT passes; the
+    # result is what we keep (and optionally store, so later runs only load it).
+    # The stored skeleton output depends on the lxml/libxslt that produced it.
+    tag = "-".join(".".join(map(str, v)) for v in (etree.LXML_VERSION, etree.LIBXSLT_VERSION))
+    path = os.path.join(schematron_xslt_dir(), f"{digest}-{tag}.xsl") if persist else None
+    if path and os.path.exists(path):
+        try:
+            return etree.XSLT(etree.parse(path))
+        except (etree.XMLSyntaxError, etree.XSLTParseError):
+            pass
+    xslt_doc = isoschematron.Schematron(etree.fromstring(sch_bytes), store_xslt=True).validator_xslt
+    if path:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with xmlio.atomic_output(path) as fh:
+                fh.write(etree.tostring(xslt_doc))
+        except OSError as e:
+            warnings.warn(f"compiled Schematron not stored, continuing without it: {e}", RuntimeWarning, stacklevel=2)
+    return etree.XSLT(xslt_doc)
+
+def get_schematron(sch_bytes, persist=False):
+    key = _schema_key("sch", sch_bytes)
+    return _cached(key, lambda: _compile_schematron(sch_bytes, key[1], persist))
+
+def schematron_failures(validator, doc):
+    svrl = validator(doc)
+    return svrl.xpath("//svrl:failed-assert | //svrl:successful-report", namespaces=SVRL_NS)
+
+def validate_with_schemas(tei_bytes, rng_bytes=None, sch_bytes=None, persist=False):
+    """Relax NG/Schematron report for XML bytes."""
     try:
         doc=etree.fromstring(tei_bytes)
     except Exception as e:
         return f"XML parse error: {e}"
+    return _report(doc, rng_bytes, sch_bytes, persist)
+
+def validate_file(path, rng_bytes=None, sch_bytes=None, persist=False):
+    """validate_with_schemas for an XML file (plain, .gz or .zst), parsed from disk rather than held as bytes."""
+    try:
+        doc=xmlio.parse(path).getroot()
+    except Exception as e:
+        return f"XML parse error: {e}"
+    return _report(doc, rng_bytes, sch_bytes, persist)
 
+def _report(doc, rng_bytes, sch_bytes, persist):
+    report=[]
     if rng_bytes:
         try:
-            relaxng = etree.RelaxNG(etree.fromstring(rng_bytes))
-            ok = relaxng.validate(doc)
+            with instrument.stage("validate", schema="relaxng"):
+                relaxng = get_relaxng(rng_bytes)
+                ok = relaxng.validate(doc)
             report.append("Relax NG: PASS" if ok else f"Relax NG: FAIL — {relaxng.error_log.last_error}")
         except Exception as e:
             report.append(f"Relax NG error: {e}")
@@ -18,11 +96,157 @@ def validate_with_schemas(tei_bytes, rng_bytes=None, sch_bytes=None):
         report.append("Relax NG: skipped (no schema provided)")
     if sch_bytes:
         try:
-            schematron = etree.Schematron(etree.fromstring(sch_bytes))
-            ok = schematron.validate(doc)
+            with instrument.stage("validate", schema="schematron"):
+                ok = not schematron_failures(get_schematron(sch_bytes, persist), doc)
             report.append("Schematron: PASS" if ok else "Schematron: FAIL — see schema rules")
         except Exception as e:
             report.append(f"Schematron error: {e}")
     else:
         report.append("Schematron: skipped (no schema provided)")
     return "\n".join(report)
+
+TEI_NS = "http://www.tei-c.org/ns/1.0"
+XML_ID = "{http://www.w3.org/XML/1998/namespace}id"
+
+def _is_doc_div(el):
+    return el.tag == "{%s}div" % TEI_NS and el.get("type") == "document"
+
+def _doc_hash(div):
+    return hashlib.sha256(etree.tostring(div, method="c14n")).hexdigest()
+
+def _structure_hash(root):
+    # Everything outside the document divs: header, front/back matter,
+    # chapter divs and their heads. Changing any of it forces a full run.
+    h = hashlib.sha256()
+    walker = etree.iterwalk(root, events=("start", "end"))
+    for event, el in walker:
+        if event == "start" and _is_doc_div(el):
+            walker.skip_subtree(); continue
+        if not isinstance(el.tag, str): continue
+        if event == "start":
+            h.update(("<%s %r %r" % (el.tag, sorted(el.attrib.items()), (el.text or "").strip())).encode())
+        elif not _is_doc_div(el):
+            h.update(("</%s %r" % (el.tag, (el.tail or "").strip())).encode())
+    return h.hexdigest()
+
+def _doc_skeleton(root):
+    # A copy of the volume with its document divs taken out, plus where each
+    # one was (in document order); a div is put back alone at its place to be
+    # validated in volume context.
+    skel = etree.fromstring(etree.tostring(root))
+    slots = []
+    for orig, el in zip(root.iter(), skel.iter()):
+        if _is_doc_div(orig):
+            pos = sum(1 for sib in orig.itersiblings(preceding=True) if not _is_doc_div(sib))
+            slots.append((el.getparent(), pos))
+    for el in [e for e in skel.iter() if _is_doc_div(e)]:
+        el.getparent().remove(el)
+    return skel, slots
+
+def _check(doc, rng, sch):
+    res = {}
+    if rng is not None:
+        res["rng"] = "PASS" if rng.validate(doc) else f"FAIL — {rng.error_log.last_error}"
+    if sch is not None:
+        res["sch"] = "PASS" if not schematron_failures(sch, doc) else "FAIL — see schema rules"
+    return res
+
+def _passed(res):
+    return all(v == "PASS" for v in res.values())
+
+def _fmt(res):
+    return "; ".join(f"{'Relax NG' if k == 'rng' else 'Schematron'}: {v}" for k, v in res.items())
+
+def status_path_for(volume_path):
+    return volume_path + ".valstatus.json"
+
+def validate_volume_incremental(tei_bytes, status_path, rng_bytes=None, sch_bytes=None, persist=False):
+    """Validate only document divs that are new or changed since the last run recorded in status_path.
+
+    Falls back to a full validation when the schemas or anything outside the
+    document divs changed. Returns a report with one line per checked xml:id.
+    Results are remembered by xml:id, so a volume with duplicate or missing ids
+    is checked in full every time and nothing is recorded for it.
+    """
+    try:
+        root = etree.fromstring(tei_bytes, etree.XMLParser(collect_ids=False))  # duplicate ids are reported below
+    except Exception as e:
+        return f"XML parse error: {e}"
+    return _incremental(root, status_path, rng_bytes, sch_bytes, persist)
+
+def validate_file_incremental(path, status_path, rng_bytes=None, sch_bytes=None, persist=False):
+    """validate_volume_incremental for a volume file (plain, .gz or .zst), parsed from disk."""
+    try:
+        root = xmlio.parse(path, etree.XMLParser(collect_ids=False)).getroot()
+    except Exception as e:
+        return f"XML parse error: {e}"
+    return _incremental(root, status_path, rng_bytes, sch_bytes, persist)
+
+def _incremental(root, status_path, rng_bytes, sch_bytes, persist):
+    if not (rng_bytes or sch_bytes):
+        return "Relax NG: skipped (no schema provided)\nSchematron: skipped (no schema provided)"
+    try:
+        rng = get_relaxng(rng_bytes) if rng_bytes else None
+        sch = get_schematron(sch_bytes, persist) if sch_bytes else None
+    except Exception as e:
+        return f"Schema error: {e}"
+
+    schemas = [_schema_key("rng", rng_bytes)[1] if rng_bytes else None,
+               _schema_key("sch", sch_bytes)[1] if sch_bytes else None]
+    structure = _structure_hash(root)
+    try:
+        with open(status_path, encoding="utf-8") as fh:
+            status = json.load(fh)
+    except (OSError, ValueError):
+        status = {}
+    divs = [el for el in root.iter() if _is_doc_div(el)]
+    ids = [d.get(XML_ID) for d in divs]
+    lines = []
+    dupes = sorted(i for i, c in Counter(ids).items() if i and c > 1)
+    if dupes:
+        lines.append("Volume: FAIL — duplicate xml:id " + ", ".join(dupes))
+    if None in ids:
+        lines.append(f"Volume: FAIL — {ids.count(None)} document(s) without xml:id")
+    keyed = not dupes and None not in ids
+    ids = [doc_id or f"#{n + 1}" for n, doc_id in enumerate(ids)]  # report label for a document without an id
+
+    full = status.get("schemas") != schemas or status.get("structure") != structure or not keyed
+    known = {} if full else status.get("docs", {})
+    docs = {}; todo = []
+    for n, (div, doc_id) in enumerate(zip(divs, ids)):
+        h = _doc_hash(div)
+        prev = known.get(doc_id)
+        if prev and prev["hash"] == h:
+            docs[doc_id] = prev
+        else:
+            todo.append((n, doc_id, h))
+
+    checked = len(divs) if full else len(todo)
+    with instrument.stage("validate", schema="incremental", full=full, checked=checked):
+        if full:
+            whole = _check(root, rng, sch)
+            lines.append("Volume (full): " + _fmt(whole))
+            if _passed(whole):
+                for n, doc_id, h in todo:
+                    docs[doc_id] = {"hash": h, "result": whole}
+                    lines.append(f"{doc_id}: {_fmt(whole)}")
+                todo = []
+        if todo:
+            skel, slots = _doc_skeleton(root)
+            for n, doc_id, h in todo:
+                parent, pos = slots[n]
+                probe = etree.fromstring(etree.tostring(divs[n]))
+                parent.insert(pos, probe)
+                res = _check(skel, rng, sch)
+                parent.remove(probe)
+                docs[doc_id] = {"hash": h, "result": res}
+                lines.append(f"{doc_id}: {_fmt(res)}")
+
+    cached_fail = [i for i in ids if i in known and known[i]["hash"] == docs[i]["hash"] and not _passed(docs[i]["result"])]
+    for doc_id in cached_fail:
+        lines.append(f"{doc_id}: FAIL (unchanged since last run)")
+    mode = "full" if full else "incremental"
+    lines.insert(0, f"Validation ({mode}): {checked} of {len(divs)} document(s) checked")
+    with xmlio.atomic_output(status_path) as fh:
+        fh.write(json.dumps({"schemas": schemas, "structure": structure, "docs": docs if keyed else {}}).encode("utf-8"))
+    return "\n".join(lines)
@@ -0,0 +1,115 @@
+"""Volume inspection in constant memory: ls, get, stats and check over etree.iterparse.
+
+Each document div is handled when its end tag arrives, then cleared and
+detached along with everything before it, so only one document is in memory
+however large the volume is. `get` stops reading at the end of the requested
+document.
+"""
+import os, re
+from lxml import etree
+from .parser import XMLNS, TEINS, WS_RE
+from . import xmlio
+
+XML_ID = "{%s}id" % XMLNS
+DOC_ID_RE = re.compile(r"d(\d+)$")
+
+def iter_docs(source):
+    """Each document div of a volume (path, which may be .gz/.zst, or binary file), in order; freed once the caller moves on."""
+    if isinstance(source, (str, os.PathLike)):
+        with xmlio.open_read(source) as fh:
+            yield from iter_docs(fh)
+        return
+    for event, el in etree.iterparse(source, events=("end",), tag=TEINS + "div", huge_tree=True,
+                                      collect_ids=False):  # duplicate ids are for check() to report:
+        if el.get("type") != "document":
+            continue
+        yield el
+        el.clear(keep_tail=True)
+        while el.getprevious() is not None:
+            del el.getparent()[0]
+
+def _text(el):
+    return WS_RE.sub(" ", "".join(el.itertext())).strip() if el is not None else None
+
+def summary(div):
+    """Listing fields for one document div: ids, date, title and its page/paragraph counts."""
+    date = div.find(TEINS + "docDate")
+    title = div.find(TEINS + "head")
+    if title is None:
+        title = div.find(TEINS + "docTitle")
+    return {
+        "xml_id": div.get(XML_ID),
+        "doc_number": _text(div.find(TEINS + "docNumber")),
+        "date": date.get("when") if date is not None else None,
+        "title": _text(title),
+        "pages": sum(1 for _ in div.iter(TEINS + "pb")),
+        "paras": sum(1 for _ in div.iter(TEINS + "p")),
+    }
+
+def ls(source):
+    """summary() of every document, in volume order (a generator)."""
+    for seq, div in enumerate(iter_docs(source), start=1):
+        yield dict(summary(div), seq=seq)
+
+def get(source, xml_id):
+    """The serialized document div with this xml:id, or None; reading stops right after it."""
+    docs = iter_docs(source)
+    try:
+        for div in docs:
+            if div.get(XML_ID) == xml_id:
+                return etree.tostring(div, encoding="utf-8", with_tail=False)
+        return None
+    finally:
+        docs.close()
+
+def stats(source):
+    """Document, page, paragraph and note counts and the date range for the whole volume."""
+    out = {"docs": 0, "pages": 0, "paras": 0, "notes": 0, "dated": 0, "first_date": None, "last_date": None}
+    for div in iter_docs(source):
+        s = summary(div)
+        out["docs"] += 1; out["pages"] += s["pages"]; out["paras"] += s["paras"]
+        out["notes"] += sum(1 for _ in div.iter(TEINS + "note"))
+        if s["date"]:
+            out["dated"] += 1
+            out["first_date"] = min(out["first_date"] or s["date"], s["date"])
+            out["last_date"] = max(out["last_date"] or s["date"], s["date"])
+    if isinstance(source, (str, os.PathLike)):
+        out["bytes"] = os.path.getsize(source)
+    return out
+
+def check(source):
+    """Id and numbering problems: document ids should be consecutive (dN, dN+1, ...) with docNumber N.
+
+    Returns a list of {"seq", "xml_id", "problem"}; empty when the volume is
+    consistent. An XML error ends the check and is reported as the last problem.
+    """
+    problems = []; seen = set(); prev = None; seq = 0
+    def report(msg, xml_id=None):
+        problems.append({"seq": seq, "xml_id": xml_id, "problem": msg})
+    try:
+        for seq, div in enumerate(iter_docs(source), start=1):
+            xml_id = div.get(XML_ID)
+            m = DOC_ID_RE.match(xml_id or "")
+            if not m:
+                report("no xml:id" if not xml_id else f"xml:id {xml_id!r} is not d<number>", xml_id)
+                continue
+            num = int(m.group(1))
+            if num in seen:
+                report("duplicate xml:id", xml_id)
+                continue
+            seen.add(num)
+            if prev is not None and num != prev + 1:
+                if num <= prev:
+                    report(f"out of order after d{prev}", xml_id)
+                else:
+                    report(f"follows d{prev}: " + (f"d{prev + 1} missing" if num == prev + 2 else f"d{prev + 1}-d{num - 1} missing"), xml_id)
+            prev = max(num, prev or 0)
+            dn = _text(div.find(TEINS + "docNumber"))
+            if dn is None:
+                report("no docNumber", xml_id)
+            elif dn != str(num):
+                report(f"docNumber {dn} does not match the xml:id", xml_id)
+    except etree.XMLSyntaxError as e:
+        seq += 1
+        report(f"XML error: {e}")
+    return problems
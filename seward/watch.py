@@ -0,0 +1,201 @@
+"""Watch-folder ingestion: poll a directory, queue new PDFs on disk, convert them with a bounded pool.
+
+The queue is an SQLite file in the output directory (.seward-queue.db). Each
+PDF is one row keyed by path, with the size/mtime it was queued at and its
+state: queued, running, done or failed. A row is updated as soon as its job
+finishes, so after a crash or restart the jobs left "running" go back to the
+queue and finished files are not redone. A file that changes after it was
+converted (or after it failed) is queued again.
+"""
+import os, time, sqlite3
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from .batch import find_pdfs, output_path_for, convert_one
+
+QUEUE_DB = ".seward-queue.db"
+SETTLE_SECONDS = 5.0  # a PDF still being written by the scanner keeps changing its mtime
+RATE_WINDOW = 600
+MAX_ATTEMPTS = 3  # a PDF that keeps killing its worker process is marked failed
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, size INTEGER, mtime_ns INTEGER,
+    status TEXT NOT NULL, attempts INTEGER DEFAULT 0, queued_at REAL, started_at REAL, finished_at REAL,
+    seconds REAL, pages INTEGER, output TEXT, report TEXT, error TEXT);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, id);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+"""
+
+def queue_path(out_dir):
+    return os.path.join(out_dir, QUEUE_DB)
+
+class JobQueue:
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, isolation_level=None)  # autocommit: every update is a checkpoint
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def recover(self):
+        """Put jobs interrupted by a crash or restart back on the queue; returns how many."""
+        return self.db.execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'").rowcount
+
+    def known(self):
+        return {r["path"]: (r["size"], r["mtime_ns"]) for r in self.db.execute("SELECT path, size, mtime_ns FROM jobs")}
+
+    def enqueue(self, path, size, mtime_ns):
+        self.db.execute("INSERT INTO jobs (path, size, mtime_ns, status, queued_at) VALUES (?, ?, ?, 'queued', ?) "
+                        "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                        "status = 'queued', queued_at = excluded.queued_at, attempts = 0, error = NULL",
+                        (path, size, mtime_ns, time.time()))
+
+    def claim(self):
+        """The oldest queued job, marked running, or None."""
+        row = self.db.execute("SELECT id, path FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+        if row is None:
+            return None
+        self.db.execute("UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                        (time.time(), row["id"]))
+        return row["id"], row["path"]
+
+    def attempts(self, job):
+        return self.db.execute("SELECT attempts FROM jobs WHERE id = ?", (job,)).fetchone()[0]
+
+    def release(self, job_ids):
+        for job in job_ids:
+            self.db.execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE id = ? AND status = 'running'", (job,))
+
+    def finish(self, job, rec, report_path=None):
+        self.db.execute("UPDATE jobs SET status = ?, finished_at = ?, seconds = ?, pages = ?, output = ?, report = ?, error = ? "
+                        "WHERE id = ?", ("done" if rec["status"] == "ok" else "failed", time.time(), rec["seconds"],
+                                         rec["pages"], rec["out"], report_path, rec.get("error"), job))
+
+    def set_meta(self, **values):
+        self.db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", values.items())
+
+    def close(self):
+        self.db.close()
+
+def _scan(src, recursive, known, settle):
+    # New or changed PDFs whose mtime is at least `settle` seconds old.
+    now = time.time_ns()
+    out = []
+    for pdf in find_pdfs(src, recursive):
+        try:
+            st = os.stat(pdf)
+        except OSError:
+            continue  # removed between listing and stat
+        key = (st.st_size, st.st_mtime_ns)
+        if known.get(pdf) != key and now - st.st_mtime_ns >= settle * 1e9:
+            out.append((pdf, key))
+    return out
+
+def _write_report(rec):
+    if "validation" not in rec:
+        return None
+    path = os.path.splitext(rec["out"])[0] + ".report.txt"
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(rec["validation"] + "\n")
+    return path
+
+def watch(src, out_dir, volume_id="frus1981-88v03", workers=None, interval=2.0, settle=SETTLE_SECONDS,
+          recursive=False, rng_bytes=None, sch_bytes=None, use_cache=True, backend=None, ocr=False, ocr_lang=None,
+          rules=None, once=False, log=print):
+    """Convert PDFs appearing in src into out_dir until interrupted.
+
+    At most `workers` conversions run at once; new files are picked up every
+    `interval` seconds. With once=True, return when the queue has drained.
+    Returns counts of jobs converted and failed during this run.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    src = os.path.abspath(src)
+    workers = workers or os.cpu_count() or 1
+    queue = JobQueue(queue_path(out_dir))
+    resumed = queue.recover()
+    if resumed:
+        log(f"Resuming {resumed} interrupted job(s)")
+    queue.set_meta(pid=os.getpid(), src=src, workers=workers, started_at=time.time())
+    known = queue.known()
+    counts = {"converted": 0, "failed": 0}
+    inflight = {}
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        while True:
+            for pdf, key in _scan(src, recursive, known, settle):
+                queue.enqueue(pdf, *key); known[pdf] = key
+                log(f"Queued {pdf}")
+            queue.set_meta(last_scan=time.time())
+            while len(inflight) < workers:
+                job = queue.claim()
+                if job is None:
+                    break
+                job_id, pdf = job
+                fut = pool.submit(convert_one, pdf, output_path_for(pdf, out_dir, src), volume_id, rng_bytes, sch_bytes,
+                                  use_cache, backend, ocr, ocr_lang, rules)
+                inflight[fut] = (job_id, pdf)
+            if once and not inflight:
+                break
+            done, _ = wait(inflight, timeout=interval, return_when=FIRST_COMPLETED) if inflight else (set(), None)
+            if not inflight:
+                time.sleep(interval)
+            broken = False
+            for fut in done:
+                job_id, pdf = inflight.pop(fut)
+                try:
+                    rec = fut.result()
+                except Exception as e:
+                    if isinstance(e, BrokenProcessPool) and queue.attempts(job_id) < MAX_ATTEMPTS:
+                        # A worker died and took the pool with it; retry on a fresh pool.
+                        queue.release([job_id]); broken = True
+                        continue
+                    rec = {"pdf": pdf, "out": output_path_for(pdf, out_dir, src), "status": "error", "pages": 0,
+                           "seconds": 0.0, "error": f"{type(e).__name__}: {e}"}
+                queue.finish(job_id, rec, _write_report(rec))
+                if rec["status"] == "ok":
+                    counts["converted"] += 1
+                    log(f"Converted {pdf} -> {rec['out']} ({rec['pages']} pages, {rec['seconds']:.2f}s)")
+                else:
+                    counts["failed"] += 1
+                    log(f"FAILED {pdf}: {rec['error']}")
+            if broken:
+                queue.release(job_id for job_id, _ in inflight.values()); inflight.clear()
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = ProcessPoolExecutor(max_workers=workers)
+    finally:
+        # Interrupted: unfinished jobs go back on the queue for the next run.
+        queue.release(job_id for job_id, _ in inflight.values())
+        if inflight:
+            # Don't wait for conversions whose results would be discarded anyway.
+            for proc in list((getattr(pool, "_processes", None) or {}).values()):
+                proc.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+        queue.set_meta(pid=None)
+        queue.close()
+    return counts
+
+def status(out_dir, window=RATE_WINDOW):
+    """Queue depth by state, recent and overall throughput, and the watcher's heartbeat."""
+    path = queue_path(out_dir)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"no watch queue in {out_dir}")
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    now = time.time()
+    counts = {s: 0 for s in ("queued", "running", "done", "failed")}
+    counts.update({r[0]: r[1] for r in db.execute("SELECT status, count(*) FROM jobs GROUP BY status")})
+    meta = {r[0]: r[1] for r in db.execute("SELECT key, value FROM meta")}
+    recent = db.execute("SELECT count(*), coalesce(sum(pages), 0) FROM jobs WHERE status = 'done' AND finished_at >= ?",
+                        (now - window,)).fetchone()
+    total = db.execute("SELECT coalesce(sum(pages), 0), coalesce(sum(seconds), 0) FROM jobs WHERE status = 'done'").fetchone()
+    oldest = db.execute("SELECT min(queued_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+    failures = [dict(r) for r in db.execute("SELECT path, error FROM jobs WHERE status = 'failed' ORDER BY finished_at DESC LIMIT 10")]
+    db.close()
+    return {
+        "queue": path, "src": meta.get("src"), "pid": meta.get("pid"), "workers": meta.get("workers"),
+        "last_scan_age": now - meta["last_scan"] if meta.get("last_scan") else None,
+        "jobs": counts, "oldest_queued_age": now - oldest if oldest else None,
+        "window_seconds": window, "recent_docs": recent[0],
+        "docs_per_min": recent[0] * 60 / window, "pages_per_min": recent[1] * 60 / window,
+        "pages_per_worker_sec": total[0] / total[1] if total[1] else None,
+        "recent_failures": failures,
+    }
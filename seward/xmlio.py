@@ -0,0 +1,96 @@
+"""Reading and writing XML files: transparent .xml.gz/.xml.zst, atomic writes, streamed serialization.
+
+Compressed files are recognized by their magic bytes when read and by their
+suffix when written. zstd needs the optional zstandard package. Writes go to
+a temporary file in the destination directory that is renamed over the
+target only once complete, so a crash never leaves a truncated output.
+write_tree() serializes straight into the (possibly compressing) file, in
+lxml's output-buffer chunks, instead of building the whole document as one
+bytes object first; the bytes are the same as etree.tostring(...,
+pretty_print=True, xml_declaration=True, encoding="utf-8").
+"""
+import os, gzip, tempfile
+from contextlib import contextmanager
+from lxml import etree
+
+DECL = b"<?xml version='1.0' encoding='utf-8'?>\n"
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+GZIP_LEVEL = 3  # level 6 is ~10% smaller on volumes but 3x slower
+ZSTD_LEVEL = 3
+SUFFIXES = (".xml", ".xml.gz", ".xml.zst")
+
+def _umask():
+    mask = os.umask(0)  # the only portable way to read it is to set it
+    os.umask(mask)
+    return mask
+
+UMASK = _umask()  # read once, at import: os.umask is process-wide and not thread-safe
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("reading or writing .zst files needs the zstandard package (pip install zstandard)") from None
+    return zstandard
+
+def compression(path):
+    """"gz", "zst" or None, from the file name (how write_tree/atomic_output will write it)."""
+    name = os.fspath(path).lower()
+    return "gz" if name.endswith(".gz") else "zst" if name.endswith(".zst") else None
+
+def open_read(path):
+    """A binary file object with the decompressed contents of path (gzip, zstd or plain, by magic bytes)."""
+    with open(path, "rb") as fh:
+        magic = fh.read(4)
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.open(path, "rb")
+    if magic == ZSTD_MAGIC:
+        return _zstd().ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, "rb")
+
+def read_bytes(path):
+    """The decompressed contents of path."""
+    with open_read(path) as fh:
+        return fh.read()
+
+def parse(path, parser=None):
+    """etree.parse of a plain or compressed file, read as a stream."""
+    with open_read(path) as fh:
+        return etree.parse(fh, parser)
+
+@contextmanager
+def atomic_output(path):
+    """Binary file to write path through: compressed by suffix, renamed into place when the block succeeds."""
+    path = os.fspath(path)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".", suffix=".tmp")
+    try:
+        try:  # mkstemp creates the file 0600; keep a replaced file's mode, or give a new one what open() would
+            os.chmod(tmp, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            os.chmod(tmp, 0o666 & ~UMASK)
+        with os.fdopen(fd, "wb") as raw:
+            kind = compression(path)
+            if kind == "gz":
+                # No file name or mtime in the header: the same document always compresses to the same bytes.
+                with gzip.GzipFile(filename="", fileobj=raw, mode="wb", compresslevel=GZIP_LEVEL, mtime=0) as fh:
+                    yield fh
+            elif kind == "zst":
+                with _zstd().ZstdCompressor(level=ZSTD_LEVEL).stream_writer(raw, closefd=False) as fh:
+                    yield fh
+            else:
+                yield raw
+            raw.flush()
+            os.fsync(raw.fileno())  # on disk before the rename, or a crash can leave an empty file under the new name
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+def write_tree(tree, path):
+    """Pretty-print an element or tree to path (atomically; .gz/.zst compressed by suffix)."""
+    if etree.iselement(tree):
+        tree = etree.ElementTree(tree)
+    with atomic_output(path) as fh:
+        fh.write(DECL)
+        tree.write(fh, pretty_print=True, encoding="utf-8")
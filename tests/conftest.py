@@ -0,0 +1,33 @@
+import os, sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+import synth  # noqa: E402  (the benchmarks' PDF synthesizer, shared with the tests through the fixtures below)
+
+SAMPLE_LINES = [
+    ["SECRET", "MEMORANDUM FOR: THE SECRETARY OF STATE; THE SECRETARY OF DEFENSE", "", "January 17, 1983", "",
+     "Intro para", "", "A. First section", "", "1. (S) point one", "", "Para in A", "", "2. point two", "", "SUMMARY:"],
+    ["CONFIDENTIAL", "", "B. Second", "", "1. (C) point", "", "FOR THE PRESIDENT: William P. Clark"],
+    ["(U) final", "", "UNCLASSIFIED"],
+]
+
+@pytest.fixture
+def sample_pages():
+    return [{"n": i, "text": "\n".join(lines), "lines": list(lines)} for i, lines in enumerate(SAMPLE_LINES, start=1)]
+
+@pytest.fixture
+def memo_pdf(tmp_path):
+    """memo_pdf(n_pages, path=None): write a synthetic memo PDF (default tmp_path/memo.pdf); returns its path."""
+    def make(n_pages, path=None, seed=0):
+        return synth.make_memo_pdf(str(path or tmp_path / "memo.pdf"), n_pages, seed)
+    return make
+
+@pytest.fixture
+def write_pdf():
+    """write_pdf(path, pages): a PDF with the given lines per page (an empty page has no text layer)."""
+    return synth.write_pdf
+
+@pytest.fixture
+def memo_lines():
+    """memo_lines(n_pages, seed=0): the lines memo_pdf puts on each page."""
+    return synth.memo_lines
@@ -0,0 +1,17 @@
+import pytest
+from seward.backends import get_backend, compare_backends
+from seward.parser import extract_pages
+from seward import cache
+
+def test_pdfium_matches_pdfplumber_on_text_layer(memo_pdf):
+    pdf = memo_pdf(2)
+    assert extract_pages(pdf, backend="pdfium") == extract_pages(pdf, backend="pdfplumber")
+    plumber, pdfium = compare_backends(pdf, ["pdfplumber", "pdfium"])
+    assert pdfium["similarity"] == 1.0 and pdfium["diff"] == [] and pdfium["pages"] == 2
+
+def test_cache_key_depends_on_backend(tmp_path, memo_pdf):
+    pdf = memo_pdf(1)
+    keys = {cache.cache_key(pdf, b.cache_settings(), b.version()) for b in map(get_backend, ["pdfplumber", "pdfium"])}
+    assert len(keys) == 2
+    with pytest.raises(ValueError):
+        get_backend("tesseract")
@@ -0,0 +1,52 @@
+import json, os
+import pytest
+from seward.batch import convert_dir, read_pdf_list
+
+def test_convert_dir_isolates_failures(tmp_path):
+    src = tmp_path / "box"; src.mkdir()
+    (src / "broken.pdf").write_bytes(b"not a pdf")
+    out = tmp_path / "out"
+    manifest = convert_dir(str(src), str(out), workers=1)
+    assert manifest["failed"] == 1 and manifest["converted"] == 0
+    assert manifest["files"][0]["status"] == "error"
+    assert json.load(open(out / "manifest.json"))["total"] == 1
+
+def test_convert_dir_skips_fresh_outputs(tmp_path):
+    src = tmp_path / "box"; src.mkdir()
+    pdf = src / "memo.pdf"; pdf.write_bytes(b"not a pdf")
+    out = tmp_path / "out"; out.mkdir()
+    (out / "memo.xml").write_bytes(b"<done/>")
+    os.utime(pdf, (0, 0))
+    manifest = convert_dir(str(src), str(out), workers=1, skip_existing=True)
+    assert manifest["skipped"] == 1 and manifest["failed"] == 0
+
+def test_recursive_outputs_mirror_subdirectories(tmp_path, memo_pdf):
+    src = tmp_path / "box"
+    for sub in ("a", "b"):
+        (src / sub).mkdir(parents=True)
+        memo_pdf(1, src / sub / "memo.pdf")
+    memo_pdf(1, src / "SCAN.PDF")
+    out = tmp_path / "out"
+    manifest = convert_dir(str(src), str(out), workers=1, recursive=True, backend="pdfium")
+    assert manifest["converted"] == 3
+    assert sorted(os.path.relpath(r["out"], out) for r in manifest["files"]) == ["SCAN.xml", "a/memo.xml", "b/memo.xml"]
+    assert all(os.path.isfile(r["out"]) for r in manifest["files"])
+
+    (src / "a" / "memo.PDF").write_bytes(b"not a pdf")
+    with pytest.raises(ValueError, match="would both be written to"):
+        convert_dir(str(src), str(out), workers=1, recursive=True)
+
+def test_pdf_list_comments(tmp_path):
+    lst = tmp_path / "box.txt"
+    lst.write_text("# box 12\nbox#12/memo.pdf\n  # indented comment\n\nb.pdf  # retyped copy\n/abs/c.pdf\n")
+    assert read_pdf_list(str(lst)) == [str(tmp_path / "box#12/memo.pdf"), str(tmp_path / "b.pdf"), "/abs/c.pdf"]
+
+def test_serialize_stage_times_the_write(tmp_path, monkeypatch, memo_pdf):
+    import time
+    from seward import instrument, xmlio
+    from seward.batch import convert_one
+    real = xmlio.write_tree
+    monkeypatch.setattr(xmlio, "write_tree", lambda tree, path: time.sleep(0.05) or real(tree, path))
+    with instrument.Trace() as trace:
+        assert convert_one(memo_pdf(1), str(tmp_path / "a" / "memo.xml"), "v", backend="pdfium")["status"] == "ok"
+    assert trace.report()["stages"]["serialize"]["seconds"] >= 0.05
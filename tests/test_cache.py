@@ -0,0 +1,43 @@
+import os
+import pytest
+from seward import cache
+
+def test_cache_roundtrip_and_lru_eviction(tmp_path, monkeypatch):
+    monkeypatch.setenv("SEWARD_CACHE_DIR", str(tmp_path))
+    pages = [{"n": 1, "text": "SECRET\nTHE WHITE HOUSE", "lines": ["SECRET", "THE WHITE HOUSE"]}]
+    cache.put("aa" * 32, pages)
+    cache.put("bb" * 32, pages)
+    assert cache.get("aa" * 32) == pages
+    assert cache.get("cc" * 32) is None
+    old = os.path.join(cache.cache_dir(), "bb", "bb" * 32 + ".ir")
+    os.utime(old, (1, 1))
+    size = cache.info()["bytes"]
+    assert cache.evict(limit=size - 1) == 1
+    assert cache.get("bb" * 32) is None and cache.get("aa" * 32) == pages
+    assert cache.clear() == 1 and cache.info()["entries"] == 0
+
+def test_put_walks_the_cache_only_when_needed(tmp_path, monkeypatch):
+    monkeypatch.setenv("SEWARD_CACHE_DIR", str(tmp_path))
+    walks = []
+    real = cache._entries
+    monkeypatch.setattr(cache, "_entries", lambda: walks.append(1) or real())
+    for n in range(5):
+        cache.put("%02x" % n * 32, {"text": "x" * 100}, kind="ocr")
+    assert len(walks) == 1  # the first put in this process; the rest only add to the estimate
+    monkeypatch.setenv("SEWARD_CACHE_MAX_MB", str(cache.info()["bytes"] / 1024 / 1024))
+    walks.clear()
+    cache.put("ff" * 32, {"text": "y" * 100}, kind="ocr")  # over the limit: walk and evict the oldest
+    assert len(walks) == 1 and cache.info()["entries"] == 5
+
+    with pytest.raises(TypeError):
+        cache.put("ee" * 32, {"text": object()}, kind="ocr")
+    assert not [f for _, _, files in os.walk(tmp_path) for f in files if f.endswith(".tmp")]
+
+def test_unwritable_cache_is_a_miss(tmp_path, monkeypatch, memo_pdf):
+    from seward.parser import extract_pages
+    (tmp_path / "file").write_text("")
+    monkeypatch.setenv("SEWARD_CACHE_DIR", str(tmp_path / "file" / "cache"))  # under a file: every write fails
+    pdf = memo_pdf(2)
+    with pytest.warns(RuntimeWarning, match="cache not written"):
+        pages = extract_pages(pdf, use_cache=True, backend="pdfium")
+    assert pages == extract_pages(pdf, backend="pdfium")
@@ -0,0 +1,47 @@
+import shutil
+from lxml import etree
+from seward import dedupe, index
+
+EXAMPLE = "examples/frus1981-88v03_with_d260.xml"
+
+def d260_paras():
+    div = etree.parse(EXAMPLE).find(".//{http://www.tei-c.org/ns/1.0}div[@type='document']")
+    return index.doc_record(div)["paras"]
+
+def test_retyped_copy_is_found_through_the_index(tmp_path):
+    shutil.copy(EXAMPLE, tmp_path / "vol.xml")
+    db = index.connect(str(tmp_path / "ix.db"))
+    index.update_index(db, [str(tmp_path)])
+    paras = d260_paras()
+    # A retyped copy: paragraphs run together, case and a couple of words changed.
+    retyped = [" ".join(paras).upper().replace("SOVIET", "Soviet", 1).replace("POLICY", "POLlCY", 1)]
+    [match] = dedupe.lookup(db, dedupe.signature(retyped))
+    assert (match["xml_id"], match["volume_id"]) == ("d260", "frus1981-88v03") and match["similarity"] > 0.8
+    assert not dedupe.lookup(db, dedupe.signature(["An unrelated memorandum about grain sales to Poland in 1981."]))
+
+    found = dedupe.check_batch(db, [("a.pdf", ["Grain sales to Poland resume next week, the Secretary said today."]),
+                                    ("b.pdf", ["Grain sales to Poland resume next week, the Secretary said today."])])
+    assert found[0] == [] and [m["batch"] for m in found[1]] == ["a.pdf"]
+
+def test_removed_documents_drop_their_fingerprints(tmp_path):
+    vol = tmp_path / "vol.xml"
+    shutil.copy(EXAMPLE, vol)
+    db = index.connect(str(tmp_path / "ix.db"))
+    index.update_index(db, [str(vol)])
+    vol.unlink()
+    index.update_index(db, [str(tmp_path)])
+    assert not dedupe.lookup(db, dedupe.signature(d260_paras()))
+    assert db.execute("SELECT count(*) FROM lsh").fetchone()[0] == 0
+
+def test_shard_directories_are_indexed_as_volumes(tmp_path, sample_pages):
+    from seward import shards
+    from seward.tei import build_doc_div
+    shards.split_volume(EXAMPLE, str(tmp_path / "vol"))
+    db = index.connect(str(tmp_path / "ix.db"))
+    assert index.update_index(db, [str(tmp_path)])["indexed"] == 1  # the directory, not its skeleton or shards
+    [match] = dedupe.lookup(db, dedupe.signature(d260_paras()))
+    assert (match["xml_id"], match["volume_id"]) == ("d260", "frus1981-88v03")
+    assert index.update_index(db, [str(tmp_path / "vol")])["unchanged"] == 1
+
+    shards.append_docs(str(tmp_path / "vol"), build_doc_div(sample_pages, "v", "dAUTO", "AUTO"))
+    assert index.update_index(db, [str(tmp_path / "vol")])["added"] == 1
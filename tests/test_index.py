@@ -0,0 +1,26 @@
+import shutil
+from seward import index
+
+EXAMPLE = "examples/frus1981-88v03_with_d260.xml"
+
+def test_index_updates_incrementally_and_answers_queries(tmp_path):
+    vol = str(tmp_path / "vol.xml")
+    shutil.copy(EXAMPLE, vol)
+    db = index.connect(str(tmp_path / "ix.db"))
+    assert index.update_index(db, [str(tmp_path)])["added"] == 1
+    assert index.update_index(db, [str(tmp_path)])["unchanged"] == 1
+
+    [doc] = index.query(db, xml_id="d260")
+    assert (doc["volume_id"], doc["doc_number"], doc["date"]) == ("frus1981-88v03", "260", "1983-01-17")
+    assert index.query(db, classification="secret", date_from="1983-01-01", date_to="1983-01-31")
+    assert not index.query(db, classification="TOP SECRET")
+    assert not index.query(db, date_from="1984-01-01")
+    assert "[negotiations]" in index.query(db, text="negotiations")[0]["snippet"]
+
+    with open(vol, encoding="utf-8") as fh:
+        xml = fh.read()
+    with open(vol, "w", encoding="utf-8") as fh:
+        fh.write(xml.replace("negotiations", "parleys"))
+    stats = index.update_index(db, [vol])
+    assert (stats["indexed"], stats["changed"]) == (1, 1)
+    assert not index.query(db, text="negotiations") and index.query(db, text="parleys")
@@ -0,0 +1,27 @@
+import json
+from seward import instrument
+from seward.tei import build_doc_div, wrap_as_tei
+from seward.validate import validate_with_schemas
+from lxml import etree
+
+SCH = b"""<schema xmlns="http://purl.oclc.org/dsdl/schematron"><pattern>
+  <rule context="/"><assert test="true()">ok</assert></rule></pattern></schema>"""
+
+def test_trace_and_callback_see_each_stage(sample_pages, tmp_path):
+    seen = []
+    cb = instrument.add_listener(lambda event, data: seen.append((event, data["stage"])))
+    try:
+        with instrument.Trace() as trace:
+            div = build_doc_div(sample_pages, "v", "d1", "1")
+            validate_with_schemas(etree.tostring(wrap_as_tei(div, "v")), sch_bytes=SCH)
+    finally:
+        instrument.remove_listener(cb)
+    assert seen == [("stage", "build"), ("stage", "validate")]
+    report = trace.write(tmp_path / "profile.json", command="test")
+    assert json.loads((tmp_path / "profile.json").read_text()) == report
+    assert report["command"] == "test"
+    assert set(report["stages"]) == {"build", "validate"}
+    assert report["events"][0]["pages"] == len(sample_pages)
+    assert report["pages"]["pages_per_sec"] is None
+    build_doc_div(sample_pages, "v", "d1", "1")  # after the trace closed: not recorded
+    assert trace.report()["stages"]["build"]["calls"] == 1
@@ -0,0 +1,51 @@
+import pickle, random
+import pytest
+from seward import ir
+from seward.backends import page_lines
+from seward.parser import coalesce_blocks, extract_pages
+
+
+def records():
+    rnd = random.Random(7)
+    texts = ["SECRET\nTHE WHITE HOUSE  \n\nA. First section\n1. (S) point one\n", "", "\n\n"]
+    # Trailing blanks, \r\n, form feeds, non-breaking spaces and accents all change line or block boundaries.
+    texts += ["".join(rnd.choice("ab C\n\n \t\r\x0c é\xa0:1.") for _ in range(rnd.randint(0, 60))) for _ in range(300)]
+    return [{"n": i + 1, "text": t, "lines": page_lines(t)} for i, t in enumerate(texts)]
+
+def test_pages_read_like_records(tmp_path):
+    recs = records()
+    recs[1]["ocr"] = True
+    doc = ir.DocText.from_records(recs)
+    assert doc == recs and doc[-1]["n"] == len(recs) and doc[1]["ocr"] and "ocr" not in doc[0]
+    assert [p.blocks() for p in doc] == [coalesce_blocks(r["lines"]) for r in recs]
+
+    doc.write(str(tmp_path / "doc.ir"))
+    mapped = ir.load(str(tmp_path / "doc.ir"))
+    assert mapped == recs and ir.from_bytes(doc.to_bytes()) == recs and pickle.loads(pickle.dumps(doc)) == recs
+    assert ir.DocText.concat([ir.DocText.from_records(recs[:100]), ir.DocText.from_records(recs[100:])]) == recs
+    mapped.close()
+
+    (tmp_path / "bad.ir").write_bytes(b"SEWIR1LE" + b"\0" * 40)
+    with pytest.raises(ValueError, match="truncated"):
+        ir.load(str(tmp_path / "bad.ir"))
+
+def test_extract_pages_returns_doctext_through_cache_and_workers(tmp_path, monkeypatch, memo_pdf):
+    monkeypatch.setenv("SEWARD_CACHE_DIR", str(tmp_path / "cache"))
+    pdf = memo_pdf(20)
+    plain = extract_pages(pdf, backend="pdfium")
+    assert isinstance(plain, ir.DocText)
+    assert extract_pages(pdf, workers=2, backend="pdfium") == plain  # shards come back as buffers and are joined
+    extract_pages(pdf, use_cache=True, backend="pdfium")
+    cached = extract_pages(pdf, use_cache=True, backend="pdfium")
+    assert cached == plain and cached._mm is not None  # a hit is read from the mapped cache file
+
+def test_conversions_close_cache_hits(tmp_path, monkeypatch, memo_pdf):
+    from seward.batch import convert_one
+    monkeypatch.setenv("SEWARD_CACHE_DIR", str(tmp_path / "cache"))
+    pdf = memo_pdf(3)
+    closed = []
+    real_close = ir.DocText.close
+    monkeypatch.setattr(ir.DocText, "close", lambda self: closed.append(self._mm is not None) or real_close(self))
+    for _ in range(2):  # a miss, then a hit mapped from the cache
+        assert convert_one(pdf, str(tmp_path / "out.xml"), "v", use_cache=True, backend="pdfium")["status"] == "ok"
+    assert closed == [False, True]
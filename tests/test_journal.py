@@ -0,0 +1,104 @@
+import multiprocessing, os, shutil
+import pytest
+from seward import journal, volume
+from seward.tei import build_doc_div, splice_append_file
+
+VOLUME = "examples/frus1981-88v03_with_d260.xml"
+PAGES = [{"n": 1, "text": "A. First\n\n1. point", "lines": ["A. First", "", "1. point"]}]
+
+def div():
+    return build_doc_div(PAGES, "v", "dAUTO", "AUTO")
+
+def _worker(path):
+    for _ in range(3):
+        journal.append(path, [div()])
+
+def ids(path):
+    return [r["xml_id"] for r in volume.ls(path)]
+
+@pytest.mark.parametrize("sharded", [False, True])
+def test_concurrent_appends_lose_nothing(tmp_path, sharded):
+    path = str(tmp_path / "vol.xml")
+    shutil.copy(VOLUME, path)
+    if sharded:
+        from seward import shards
+        shards.split_volume(path, str(tmp_path / "vol"))
+        path = str(tmp_path / "vol")
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_worker, args=(path,)) for _ in range(4)]
+    for p in procs: p.start()
+    for p in procs: p.join()
+    assert all(p.exitcode == 0 for p in procs)
+    if sharded:
+        from seward import shards
+        with open(str(tmp_path / "out.xml"), "wb") as fh:
+            shards.assemble(path, fh)
+        path = str(tmp_path / "out.xml")
+    assert ids(path) == [f"d{n}" for n in range(260, 273)] and volume.check(path) == []
+
+def test_commit_waits_for_earlier_reservations(tmp_path):
+    path = str(tmp_path / "vol.xml")
+    shutil.copy(VOLUME, path)
+    [a], [b] = journal.reserve(path), journal.reserve(path)
+    assert (a, b) == ("d261", "d262")
+    journal.stage(path, b, div())
+    assert journal.commit(path) == [] and ids(path) == ["d260"]
+    assert journal.status(path)["reserved"].keys() == {"d261"}
+    journal.stage(path, a, div())
+    assert journal.commit(path) == ["d261", "d262"] and ids(path) == ["d260", "d261", "d262"]
+    assert not os.path.exists(os.path.join(journal.journal_dir(path), journal.JOURNAL))  # nothing outstanding
+
+    c, d = journal.reserve(path, 2)
+    journal.release(path, [c])  # a worker died: its id goes to the next reservation, so no gap is left
+    assert journal.reserve(path) == [c]
+    with pytest.raises(ValueError):
+        journal.release(path, ["d999"])
+
+def test_outside_appends_and_interrupted_commits(tmp_path, monkeypatch):
+    path = str(tmp_path / "vol.xml")
+    shutil.copy(VOLUME, path)
+    [a] = journal.reserve(path)
+    journal.stage(path, a, div())
+    real_append = journal._append
+
+    def crash(volume_path, divs):
+        real_append(volume_path, divs)
+        raise KeyboardInterrupt  # after the volume was written, before the journal says so
+    monkeypatch.setattr(journal, "_append", crash)
+    with pytest.raises(KeyboardInterrupt):
+        journal.commit(path)
+    monkeypatch.setattr(journal, "_append", real_append)
+    assert journal.commit(path) == [] and ids(path) == ["d260", "d261"]  # recognized as done, not appended twice
+
+    [b] = journal.reserve(path)
+    journal.stage(path, b, div())
+    splice_append_file(path, div())  # bypasses the journal and takes d262
+    with pytest.raises(RuntimeError, match="outside the journal"):
+        journal.commit(path)
+
+def test_status_only_reads(tmp_path, monkeypatch):
+    path = str(tmp_path / "vol.xml")
+    shutil.copy(VOLUME, path)
+    assert journal.status(path) == {"volume_max": 260, "reserved": {}, "staged": [], "free": []}
+    assert os.listdir(tmp_path) == ["vol.xml"]
+    [a, b] = journal.reserve(path, 2)
+    journal.stage(path, a, div())
+    with open(os.path.join(journal.journal_dir(path), journal.JOURNAL), "ab") as fh:
+        fh.write(b'{"op": "sta')  # a record still being written
+    before = {f: open(os.path.join(journal.journal_dir(path), f), "rb").read() for f in (journal.JOURNAL, "lock")}
+    assert journal.status(path)["staged"] == [a] and list(journal.status(path)["reserved"]) == [b]
+    assert {f: open(os.path.join(journal.journal_dir(path), f), "rb").read() for f in before} == before
+
+    monkeypatch.setattr(journal, "fcntl", None)  # e.g. Windows
+    with pytest.raises(RuntimeError, match="POSIX"):
+        journal.reserve(path)
+
+def test_release_moves_later_staged_documents_up(tmp_path):
+    path = str(tmp_path / "vol.xml")
+    shutil.copy(VOLUME, path)
+    a, b, c = journal.reserve(path, 3)
+    journal.stage(path, b, div()); journal.stage(path, c, div())
+    assert journal.release(path, [a]) == ["d262", "d263"]
+    assert journal.commit(path) == ["d261", "d262"] and ids(path) == ["d260", "d261", "d262"]
+    assert volume.check(path) == []  # docNumbers were rewritten with the ids
+    assert journal.status(path)["staged"] == [] and journal.reserve(path) == ["d263"]
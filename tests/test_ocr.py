@@ -0,0 +1,34 @@
+import os, sys, stat
+from seward.parser import extract_pages, iter_pages
+
+
+FAKE = """#!{python}
+import sys
+if "--version" in sys.argv:
+    print("tesseract 5.3.0"); sys.exit(0)
+sys.stdin.buffer.read()
+open({log!r}, "a").write("ocr\\n")
+print("SECRET\\nRECOVERED FROM THE SCAN")
+"""
+
+def fake_tesseract(tmp_path, monkeypatch):
+    log = tmp_path / "calls.log"
+    exe = tmp_path / "tesseract"
+    exe.write_text(FAKE.format(python=sys.executable, log=str(log)))
+    exe.chmod(exe.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("SEWARD_TESSERACT", str(exe))
+    monkeypatch.setenv("SEWARD_CACHE_DIR", str(tmp_path / "cache"))
+    return lambda: len(log.read_text().splitlines()) if log.exists() else 0
+
+def test_ocr_fills_only_empty_pages_and_caches_by_image(tmp_path, monkeypatch, write_pdf):
+    calls = fake_tesseract(tmp_path, monkeypatch)
+    pdf = str(tmp_path / "scan.pdf")
+    write_pdf(pdf, [["SECRET", "THE WHITE HOUSE"], [], []])  # pages 2-3: no text layer
+    pages = extract_pages(pdf, workers=1, use_cache=True, ocr=True)
+    assert pages[0]["lines"] == ["SECRET", "THE WHITE HOUSE"] and "ocr" not in pages[0]
+    assert pages[1]["lines"] == ["SECRET", "RECOVERED FROM THE SCAN"] and pages[1]["ocr"]
+    assert calls() == 1  # identical blank renders share one cached result
+    assert extract_pages(pdf, workers=2, use_cache=True, ocr=True) == pages
+    assert [p["lines"] for p in iter_pages(pdf, ocr=True)] == [p["lines"] for p in pages]
+    assert calls() == 1
+    assert extract_pages(pdf, use_cache=True)[1]["lines"] == []
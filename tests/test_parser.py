@@ -0,0 +1,26 @@
+from seward.parser import page_shards
+
+def test_page_shards_cover_range_in_order():
+    shards = page_shards(803, 4)
+    assert shards[0][0] == 0 and shards[-1][1] == 803
+    assert all(a[1] == b[0] for a, b in zip(shards, shards[1:]))
+    assert page_shards(5, 4) == [(0, 5)]
+
+def test_scan_metadata_matches_field_extractors(sample_pages):
+    from seward.parser import (scan_metadata, find_date, find_place, find_doc_title,
+                               collect_doc_classes, extract_addressees, extract_signer)
+    PAGES = sample_pages
+    date_human, date_iso = find_date(PAGES)
+    assert scan_metadata(PAGES) == {
+        "date_human": date_human, "date_iso": date_iso,
+        "place": find_place(PAGES[0]["lines"]), "title": find_doc_title(PAGES),
+        "classes": collect_doc_classes(PAGES), "addressees": extract_addressees(PAGES),
+        "signer": extract_signer(PAGES),
+    }
+    assert scan_metadata([{"n": 1, "text": "", "lines": []}])["date_iso"] is None
+
+def test_extract_pages_on_synthetic_pdf(memo_pdf, memo_lines):
+    from seward.parser import extract_pages
+    pages = extract_pages(memo_pdf(2))
+    expected = [[ln for ln in page if ln] for page in memo_lines(2)]
+    assert [p["lines"] for p in pages] == expected
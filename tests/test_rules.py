@@ -0,0 +1,93 @@
+import os, re, time
+import pytest
+from lxml import etree
+from seward.parser import coalesce_blocks, looks_like_head, annotate_para_classification, LETTER_HEAD_RE, NUMBER_POINT_RE
+from seward.rules import get_ruleset
+from seward.tei import build_doc_div
+
+TEI = "{http://www.tei-c.org/ns/1.0}"
+
+def chain(block, in_section):
+    # What build_doc_body did before rule packs.
+    mL = LETTER_HEAD_RE.match(block)
+    if mL and 0 < len(mL.group(2)) < 140:
+        return "section", mL.group(1), mL.group(2).strip(), None
+    mN = NUMBER_POINT_RE.match(block)
+    if mN and in_section:
+        return ("item", mN.group(1)) + annotate_para_classification(mN.group(2).strip())
+    if looks_like_head(block):
+        return "head", None, re.sub(r"\s+", " ", block).strip().rstrip(":"), None
+    return ("para", None) + annotate_para_classification(block)
+
+def test_memo_pack_matches_the_old_chain(sample_pages):
+    rs = get_ruleset()
+    blocks = [b for p in sample_pages for b in coalesce_blocks(p["lines"])]
+    blocks += ["A. " + "x" * 139, "A. " + "x" * 140, "1. outside", "MEMORANDUM FOR THE RECORD", "Summary of talks:",
+               "Talks WITH MOSCOW:", "(TS) top", "NATO\nPOLICY REVIEW", "12.\tlast point", "É. accent"]
+    for b in blocks:
+        for in_section in (False, True):
+            rule, n, txt, pcl = rs.classify(b, in_section)
+            assert (rule.action, n, txt, pcl) == chain(b, in_section), b
+
+def test_custom_pack_file(tmp_path, sample_pages):
+    pack = tmp_path / "cable.yaml"
+    pack.write_text("""
+doc_type: cable
+para_classification: '^\\s*\\((S|C|U)\\)\\s*'
+rules:
+  - {name: part, match: '^\\s*PART\\s+([IVX]+)\\W*(.*)', action: section, n: 1, head: 2}
+  - {name: point, match: '^\\s*(\\d+)\\.\\s+(.*)', in_section: true, action: item, n: 1, text: 2}
+""", encoding="utf-8")
+    lines = ["PART II: Background", "", "1. (C) first", "", "A. not a section here"]
+    pages = [{"n": 1, "text": "\n".join(lines), "lines": lines}]
+    div = build_doc_div(pages, "v", "d1", "1", rules=str(pack))
+    [sec] = div.findall(f"{TEI}div")
+    assert sec.get("n") == "II" and sec.findtext(f"{TEI}head") == "Background"
+    item = sec.find(f"{TEI}list/{TEI}item/{TEI}p")
+    assert (item.text, item.get("ana")) == ("first", "#C")
+    assert sec.findall(f"{TEI}p")[-1].text == "A. not a section here"  # the trailing paragraph rule is implied
+
+    rs = get_ruleset(str(pack))
+    assert get_ruleset(str(pack)) is rs  # compiled once...
+    pack.write_text(pack.read_text().replace("PART", "SECTION"), encoding="utf-8")
+    os.utime(pack, ns=(time.time_ns(), time.time_ns() + 10**9))
+    assert get_ruleset(str(pack)) is not rs  # ...until the file changes
+
+def test_bad_packs_are_rejected(tmp_path):
+    with pytest.raises(ValueError, match="unknown rule pack"):
+        get_ruleset("no-such-pack")
+    bad = tmp_path / "bad.yaml"
+    bad.write_text("rules:\n  - {match: '(', action: para}\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="bad regex"):
+        get_ruleset(str(bad))
+    bad.write_text("rules:\n  - {action: footnote}\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="action must be"):
+        get_ruleset(str(bad))
+
+EXPECTED = "examples/memo_rules_expected.xml"  # build_doc_div output from before rule packs existed
+
+def test_default_pack_keeps_document_output(sample_pages):
+    extra = ["A. " + "x" * 139, "A. " + "x" * 140, "1. inside A", "MEMORANDUM FOR THE RECORD", "Summary of talks:",
+             "Talks WITH MOSCOW:", "(TS) top", "NATO", "POLICY REVIEW", "12.\tlast point", "É. accent"]
+    lines = [x for b in extra for x in (b, "")]
+    pages = sample_pages + [{"n": 4, "text": "\n".join(lines), "lines": lines}]
+    expected = open(EXPECTED, "rb").read()
+    for rules in (None, "memo"):
+        assert etree.tostring(build_doc_div(pages, "v", "d1", "1", rules=rules), pretty_print=True, encoding="utf-8") == expected
+
+def test_pack_values_are_data_not_code(tmp_path):
+    pack = tmp_path / "odd.yaml"
+    pack.write_text("""
+rules:
+  - name: "x\\n    raise SystemExit('ran')"
+    match: '^(\\w+)'
+    group_len: {1: [1, 3]}
+    action: head
+""", encoding="utf-8")
+    rs = get_ruleset(str(pack))
+    assert rs.classify("abc", False)[0].name == "x\n    raise SystemExit('ran')"
+    assert rs.classify("abcd", False)[0].action == "para"
+    pack.write_text("rules:\n  - {match: '(a)', group_len: {1: [0, '9) or __import__(\"os\").abort() or (0']}, action: head}\n",
+                    encoding="utf-8")
+    with pytest.raises(ValueError, match="group_len"):
+        get_ruleset(str(pack))
@@ -0,0 +1,78 @@
+import asyncio, http.client, json, os, threading
+import pytest
+from seward import serve
+
+
+VOLUME = "examples/frus1981-88v03_with_d260.xml"
+RNG = b"""<grammar xmlns="http://relaxng.org/ns/structure/1.0"><start><element><anyName/>
+  <zeroOrMore><choice><attribute><anyName/></attribute><text/><ref name="any"/></choice></zeroOrMore></element></start>
+  <define name="any"><element><anyName/><zeroOrMore><choice><attribute><anyName/></attribute><text/><ref name="any"/></choice>
+  </zeroOrMore></element></define></grammar>"""
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(serve, "STREAM_OVER", 1024)  # exercise chunked responses with small files
+    started = threading.Event(); box = {}
+    def ready(addr, srv):
+        box["port"] = addr[1]; box["loop"] = asyncio.get_running_loop(); started.set()
+    def run():
+        try:
+            asyncio.run(serve.serve("127.0.0.1", 0, ready=ready, workers=1, rng_bytes=RNG))
+        except asyncio.CancelledError:
+            pass
+    t = threading.Thread(target=run, daemon=True); t.start()
+    assert started.wait(60)
+    yield lambda: http.client.HTTPConnection("127.0.0.1", box["port"], timeout=60)
+    box["loop"].call_soon_threadsafe(lambda: [task.cancel() for task in asyncio.all_tasks(box["loop"])])
+    t.join(10)
+
+def call(conn, method, path, body=None, headers=None):
+    conn.request(method, path, body=body, headers=headers or {})
+    resp = conn.getresponse()
+    return resp, resp.read()
+
+def test_convert_validate_append_over_one_connection(server, tmp_path, memo_pdf):
+    pdf = open(memo_pdf(2), "rb").read()
+    conn = server()
+    resp, body = call(conn, "GET", "/health")
+    assert resp.status == 200 and json.loads(body)["schemas"] == {"rng": True, "sch": False}
+
+    resp, body = call(conn, "POST", "/convert?backend=pdfium&format=json", pdf)
+    out = json.loads(body)
+    assert resp.status == 200 and out["valid"] and out["xml"].startswith("<?xml")
+
+    resp, body = call(conn, "POST", "/validate", out["xml"].encode())
+    assert json.loads(body) == {"valid": True, "validation": "Relax NG: PASS\nSchematron: skipped (no schema provided)"}
+
+    boundary = "sewardtest"
+    parts = [("volume", open(VOLUME, "rb").read()), ("pdf", pdf)]
+    form = b"".join(b'--%s\r\nContent-Disposition: form-data; name="%s"; filename="f"\r\n\r\n%s\r\n'
+                    % (boundary.encode(), name.encode(), data) for name, data in parts) + b"--%s--\r\n" % boundary.encode()
+    resp, body = call(conn, "POST", "/append?backend=pdfium&fast=1", form,
+                      {"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    assert resp.status == 200 and resp.getheader("Transfer-Encoding") == "chunked"
+    assert resp.getheader("X-Seward-Ids") == "d261" and body.count(b'type="document"') == 2
+
+    assert call(conn, "POST", "/convert?backend=nope", pdf)[0].status == 400
+    assert call(conn, "POST", "/convert", b"not a pdf")[0].status == 422
+    assert call(conn, "GET", "/convert")[0].status == 405
+    assert call(conn, "GET", "/missing")[0].status == 404
+    resp, body = call(conn, "GET", "/health")
+    assert json.loads(body)["restarts"] == 0
+
+    conn = server()
+    conn.putrequest("POST", "/validate"); conn.putheader("Content-Length", "ten"); conn.endheaders()
+    assert conn.getresponse().status == 400
+
+def test_dead_worker_gets_a_fresh_pool():
+    async def go():
+        srv = serve.Server(workers=1)
+        await srv.start()
+        try:
+            with pytest.raises(serve.HTTPError) as e:
+                await srv.run(os._exit, 1)
+            assert e.value.status == 503 and srv.stats["restarts"] == 1
+            assert await srv.run(serve._ping) != os.getpid()
+        finally:
+            srv.close()
+    asyncio.run(go())
@@ -0,0 +1,59 @@
+import os
+import pytest
+from lxml import etree
+from seward import shards
+from seward.tei import build_doc_div, splice_into_volume
+
+VOLUME = "examples/frus1981-88v03_with_d260.xml"
+NS = {"tei": "http://www.tei-c.org/ns/1.0"}
+
+def test_split_then_assemble_is_byte_identical(tmp_path):
+    manifest = shards.split_volume(VOLUME, str(tmp_path / "v"))
+    assert [d["id"] for d in manifest["docs"]] == ["d260"] and manifest["max_num"] == 260
+    assert shards.assemble_bytes(str(tmp_path / "v")) == open(VOLUME, "rb").read()
+
+def test_append_touches_one_shard_and_matches_splice(tmp_path, sample_pages):
+    d = str(tmp_path / "v")
+    shards.split_volume(VOLUME, d)
+    before = {f: os.stat(os.path.join(d, "docs", f)).st_mtime_ns for f in os.listdir(os.path.join(d, "docs"))}
+    skeleton = open(os.path.join(d, shards.SKELETON), "rb").read()
+    assert shards.append_docs(d, build_doc_div(sample_pages, "v", "dAUTO", "AUTO")) == ["d261"]
+    assert shards.append_docs(d, [build_doc_div(sample_pages, "v", "dAUTO", "AUTO")]) == ["d262"]
+    assert sorted(os.listdir(os.path.join(d, "docs"))) == ["d260.xml", "d261.xml", "d262.xml"]
+    assert os.stat(os.path.join(d, "docs", "d260.xml")).st_mtime_ns == before["d260.xml"]
+    assert open(os.path.join(d, shards.SKELETON), "rb").read() == skeleton
+
+    expected, _ = splice_into_volume(open(VOLUME, "rb").read(),
+                                     [build_doc_div(sample_pages, "v", "dAUTO", "AUTO") for _ in range(2)])
+    assert shards.assemble_bytes(d) == expected
+
+def test_edit_rewrites_only_that_document(tmp_path):
+    d = str(tmp_path / "v")
+    shards.split_volume(VOLUME, d)
+    div = shards.read_doc(d, "d260")
+    div.find("{http://www.tei-c.org/ns/1.0}head").text = "Edited head"
+    shards.write_doc(d, div)
+    out = shards.assemble_bytes(d)
+    assert b"Edited head" in out
+    assert out.startswith(open(os.path.join(d, shards.SKELETON), "rb").read().split(b"<!--seward-slot")[0].rstrip(b" "))
+    assert etree.fromstring(out).xpath("//tei:div[@type='document']/tei:head/text()", namespaces=NS) == ["Edited head"]
+
+def test_split_refuses_duplicate_and_missing_ids(tmp_path, sample_pages):
+    vol, _ = splice_into_volume(open(VOLUME, "rb").read(), build_doc_div(sample_pages, "v", "dAUTO", "AUTO"))
+    path = tmp_path / "vol.xml"
+    path.write_bytes(vol.replace(b'xml:id="d261"', b'xml:id="d260"'))
+    with pytest.raises(ValueError, match="duplicate document xml:id.* d260"):
+        shards.split_volume(str(path), str(tmp_path / "v"))
+    path.write_bytes(vol.replace(b' xml:id="d261"', b""))
+    with pytest.raises(ValueError, match="document 2 has no xml:id"):
+        shards.split_volume(str(path), str(tmp_path / "v"))
+    assert not (tmp_path / "v").exists()
+
+def test_shard_files_follow_the_umask(tmp_path, monkeypatch):
+    from seward import xmlio
+    monkeypatch.setattr(xmlio, "UMASK", 0o022)
+    d = tmp_path / "v"
+    shards.split_volume(VOLUME, str(d))
+    for f in (shards.MANIFEST, shards.SKELETON, "docs/d260.xml"):
+        assert os.stat(d / f).st_mode & 0o777 == 0o644
+    assert not [f for _, _, files in os.walk(d) for f in files if f.endswith(".tmp")]
@@ -0,0 +1,11 @@
+import io
+from lxml import etree
+from seward.tei import build_doc_div, wrap_as_tei, write_doc_stream
+
+def test_stream_matches_tree_output(sample_pages):
+    for pages in (sample_pages[:2], sample_pages):
+        tree = etree.tostring(wrap_as_tei(build_doc_div(pages, "v", "d1", "1"), "v"),
+                              pretty_print=True, xml_declaration=True, encoding="utf-8")
+        buf = io.BytesIO()
+        write_doc_stream(iter(pages), buf, "v", "d1", "1")
+        assert buf.getvalue() == tree
@@ -0,0 +1,39 @@
+from lxml import etree
+from seward.tei import (build_doc_div, scan_volume_index, splice_into_volume,
+                        splice_append_file, load_volume_index)
+
+VOLUME = "examples/frus1981-88v03_with_d260.xml"
+NS = {"tei": "http://www.tei-c.org/ns/1.0"}
+
+def doc_ids(data):
+    return etree.fromstring(data).xpath("//tei:div[@type='document']/@xml:id", namespaces=NS)
+
+def test_splice_keeps_other_bytes(sample_pages):
+    vol = open(VOLUME, "rb").read()
+    index = scan_volume_index(vol)
+    updated, new_index = splice_into_volume(vol, build_doc_div(sample_pages, "v", "dAUTO", "AUTO"), index)
+    at, added = index["insert_at"], len(updated) - len(vol)
+    assert updated[:at] == vol[:at] and updated[at + added:] == vol[at:]
+    assert doc_ids(updated) == ["d260", "d261"]
+    assert new_index == scan_volume_index(updated)
+
+def test_splice_append_file_uses_sidecar(tmp_path, sample_pages):
+    vol = tmp_path / "vol.xml"
+    vol.write_bytes(open(VOLUME, "rb").read())
+    assert splice_append_file(str(vol), build_doc_div(sample_pages, "v", "dAUTO", "AUTO")) == "d261"
+    assert load_volume_index(str(vol))["max_num"] == 261
+    assert splice_append_file(str(vol), build_doc_div(sample_pages, "v", "dAUTO", "AUTO")) == "d262"
+    assert doc_ids(vol.read_bytes()) == ["d260", "d261", "d262"]
+    vol.write_bytes(vol.read_bytes() + b"\n")
+    assert load_volume_index(str(vol)) is None
+
+def test_append_many_assigns_consecutive_ids(sample_pages):
+    from seward.tei import append_many_to_volume
+    vol = open(VOLUME, "rb").read()
+    divs = [build_doc_div(sample_pages[:n], "v", "dAUTO", "AUTO") for n in (1, 2, 3)]
+    updated = append_many_to_volume(vol, divs)
+    assert doc_ids(updated) == ["d260", "d261", "d262", "d263"]
+    numbers = etree.fromstring(updated).xpath("//tei:div[@type='document']/tei:docNumber/text()", namespaces=NS)
+    assert numbers == ["260", "261", "262", "263"]
+    spliced, _ = splice_into_volume(vol, [build_doc_div(sample_pages[:n], "v", "dAUTO", "AUTO") for n in (1, 2, 3)])
+    assert doc_ids(spliced) == doc_ids(updated)
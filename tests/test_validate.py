@@ -0,0 +1,51 @@
+import json, os
+import pytest
+from seward import validate
+
+SCH = b"""<schema xmlns="http://purl.oclc.org/dsdl/schematron">
+  <ns prefix="tei" uri="http://www.tei-c.org/ns/1.0"/>
+  <pattern><rule context="tei:div[@type='document']">
+    <assert test="tei:docNumber">A document needs a docNumber.</assert>
+  </rule></pattern>
+</schema>"""
+GOOD = b'<TEI xmlns="http://www.tei-c.org/ns/1.0"><text><body><div type="document"><docNumber>1</docNumber></div></body></text></TEI>'
+BAD = GOOD.replace(b"<docNumber>1</docNumber>", b"")
+
+def test_schematron_compiled_once_and_persisted(tmp_path, monkeypatch):
+    monkeypatch.setenv("SEWARD_CACHE_DIR", str(tmp_path))
+    validate.clear_compiled()
+    assert validate.get_schematron(SCH, persist=True) is validate.get_schematron(SCH)
+    assert len(os.listdir(validate.schematron_xslt_dir())) == 1
+    assert validate.validate_with_schemas(GOOD, sch_bytes=SCH).endswith("Schematron: PASS")
+    validate.clear_compiled()
+    assert validate.validate_with_schemas(BAD, sch_bytes=SCH, persist=True).endswith("Schematron: FAIL — see schema rules")
+
+def test_unwritable_schematron_store_still_validates(tmp_path, monkeypatch):
+    (tmp_path / "file").write_text("")
+    monkeypatch.setenv("SEWARD_CACHE_DIR", str(tmp_path / "file" / "cache"))  # under a file: every write fails
+    validate.clear_compiled()
+    with pytest.warns(RuntimeWarning, match="Schematron not stored"):
+        assert validate.validate_with_schemas(BAD, sch_bytes=SCH, persist=True).endswith("Schematron: FAIL — see schema rules")
+    assert os.listdir(tmp_path) == ["file"]
+
+def test_incremental_validation_checks_only_changed_docs(tmp_path):
+    status = str(tmp_path / "vol.valstatus.json")
+    doc = lambda n, body: b'<div type="document" xml:id="d%d">%s</div>' % (n, body)
+    vol = lambda *docs: b'<TEI xmlns="http://www.tei-c.org/ns/1.0"><teiHeader/><text><body>' + b"".join(docs) + b"</body></text></TEI>"
+    ok = lambda n: doc(n, b"<docNumber>%d</docNumber>" % n)
+    first = validate.validate_volume_incremental(vol(ok(1), ok(2)), status, sch_bytes=SCH)
+    assert first.splitlines() == ["Validation (full): 2 of 2 document(s) checked", "Volume (full): Schematron: PASS",
+                                  "d1: Schematron: PASS", "d2: Schematron: PASS"]
+    second = validate.validate_volume_incremental(vol(ok(1), ok(2), doc(3, b"")), status, sch_bytes=SCH)
+    assert second.splitlines() == ["Validation (incremental): 1 of 3 document(s) checked",
+                                   "d3: Schematron: FAIL — see schema rules"]
+    third = validate.validate_volume_incremental(vol(ok(1), ok(2), doc(3, b"")), status, sch_bytes=SCH)
+    assert third.splitlines()[1:] == ["d3: FAIL (unchanged since last run)"]
+
+    # Results are keyed by xml:id: with duplicate or missing ids every document is checked and nothing is kept.
+    for body, problem in [(vol(ok(1), ok(1)), "duplicate xml:id d1"), (vol(ok(1), b'<div type="document"/>'), "1 document(s) without xml:id")]:
+        for _ in range(2):
+            report = validate.validate_volume_incremental(body, status, sch_bytes=SCH).splitlines()
+            assert report[0] == "Validation (full): 2 of 2 document(s) checked" and report[1] == "Volume: FAIL — " + problem
+    assert "#2: Schematron: FAIL — see schema rules" in report
+    assert json.load(open(status))["docs"] == {} and os.listdir(tmp_path) == ["vol.valstatus.json"]
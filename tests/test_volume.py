@@ -0,0 +1,43 @@
+import io
+import pytest
+from lxml import etree
+from seward import volume
+
+EXAMPLE = "examples/frus1981-88v03_with_d260.xml"
+
+def make_volume(ids_and_numbers, tail=""):
+    src = open(EXAMPLE, encoding="utf-8").read()
+    a = src.index('      <ns0:div xml:id="d260"'); b = src.index("</ns0:div>", a) + len("</ns0:div>\n")
+    doc = src[a:b]
+    body = "".join(doc.replace('xml:id="d260"', f'xml:id="{i}"').replace("<ns0:docNumber>260<", f"<ns0:docNumber>{n}<")
+                   for i, n in ids_and_numbers)
+    return (src[:a] + body + tail + src[b:]).encode("utf-8")
+
+def test_ls_stats_and_get():
+    data = make_volume([("d1", 1), ("d2", 2), ("d3", 3)])
+    rows = list(volume.ls(io.BytesIO(data)))
+    assert [(r["seq"], r["xml_id"], r["doc_number"], r["date"]) for r in rows] == \
+        [(1, "d1", "1", "1983-01-17"), (2, "d2", "2", "1983-01-17"), (3, "d3", "3", "1983-01-17")]
+    assert rows[0]["title"] == "National Security Decision Directive 75" and rows[0]["pages"] == 12
+
+    st = volume.stats(EXAMPLE)
+    assert (st["docs"], st["pages"], st["paras"], st["first_date"]) == (1, 12, 22, "1983-01-17")
+
+    div = etree.fromstring(volume.get(io.BytesIO(data), "d2"))
+    assert div.get("{http://www.w3.org/XML/1998/namespace}id") == "d2"
+    assert volume.get(io.BytesIO(data), "d9") is None
+
+def test_get_stops_reading_after_the_document():
+    data = make_volume([("d1", 1), ("d2", 2)], tail="<ns0:p>unclosed")  # broken XML after d2
+    assert volume.get(io.BytesIO(data), "d1") is not None
+    with pytest.raises(etree.XMLSyntaxError):
+        list(volume.ls(io.BytesIO(data)))
+
+def test_check_reports_gaps_duplicates_and_numbers():
+    assert volume.check(io.BytesIO(make_volume([("d259", 259), ("d260", 260)]))) == []
+    data = make_volume([("d1", 1), ("d4", 4), ("d5", 7), ("x", 6), ("d7", 7), ("d4", 4)], tail="<ns0:p>unclosed")
+    problems = volume.check(io.BytesIO(data))
+    assert [(p["seq"], p["problem"]) for p in problems[:-1]] == [
+        (2, "follows d1: d2-d3 missing"), (3, "docNumber 7 does not match the xml:id"),
+        (4, "xml:id 'x' is not d<number>"), (5, "follows d5: d6 missing"), (6, "duplicate xml:id")]
+    assert problems[-1]["seq"] == 7 and problems[-1]["problem"].startswith("XML error")
@@ -0,0 +1,29 @@
+import os
+from seward import watch
+
+
+def test_watch_resumes_without_redoing_finished_files(tmp_path, memo_pdf):
+    src = tmp_path / "drop"; src.mkdir()
+    out = tmp_path / "out"
+    memo_pdf(1, src / "a.pdf")
+    memo_pdf(2, src / "b.pdf")
+    (src / "broken.pdf").write_bytes(b"not a pdf")
+    run = dict(workers=1, settle=0, interval=0.01, once=True, backend="pdfium", use_cache=False, log=lambda msg: None)
+    assert watch.watch(str(src), str(out), **run) == {"converted": 2, "failed": 1}
+    assert (out / "a.xml").exists() and (out / "b.xml").exists()
+
+    # A crash while c.pdf was running: it is picked up again, finished files are left alone.
+    memo_pdf(1, src / "c.pdf")
+    queue = watch.JobQueue(watch.queue_path(str(out)))
+    st = os.stat(src / "c.pdf")
+    queue.enqueue(str(src / "c.pdf"), st.st_size, st.st_mtime_ns)
+    assert queue.claim()[1] == str(src / "c.pdf")
+    queue.close()
+    before = os.stat(out / "a.xml").st_mtime_ns
+    assert watch.watch(str(src), str(out), **run) == {"converted": 1, "failed": 0}
+    assert os.stat(out / "a.xml").st_mtime_ns == before and (out / "c.xml").exists()
+
+    st = watch.status(str(out))
+    assert st["jobs"] == {"queued": 0, "running": 0, "done": 3, "failed": 1}
+    assert st["recent_docs"] == 3 and st["pid"] is None
+    assert st["recent_failures"][0]["path"].endswith("broken.pdf")
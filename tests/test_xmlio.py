@@ -0,0 +1,66 @@
+import gzip, os
+import pytest
+from lxml import etree
+from seward import xmlio, volume, validate
+from seward.tei import build_doc_div, append_many_to_volume, append_many_to_file, splice_append_file
+
+VOLUME = "examples/frus1981-88v03_with_d260.xml"
+
+def test_write_tree_matches_tostring_and_is_atomic(tmp_path):
+    tree = etree.parse(VOLUME)
+    out = tmp_path / "vol.xml"
+    xmlio.write_tree(tree, out)
+    assert out.read_bytes() == etree.tostring(tree, pretty_print=True, xml_declaration=True, encoding="utf-8")
+
+    class Boom(Exception):
+        pass
+    with pytest.raises(Boom):
+        with xmlio.atomic_output(out) as fh:
+            fh.write(b"<half")
+            raise Boom()
+    assert xmlio.read_bytes(out) == etree.tostring(tree, pretty_print=True, xml_declaration=True, encoding="utf-8")
+    assert os.listdir(tmp_path) == ["vol.xml"]  # the old file is untouched and no temp file is left
+
+def test_gzip_volumes_append_and_inspect(tmp_path, sample_pages):
+    divs = lambda: [build_doc_div(sample_pages, "v", "dAUTO", "AUTO") for _ in range(2)]
+    expected = append_many_to_volume(open(VOLUME, "rb").read(), divs())
+    gz = tmp_path / "vol.xml.gz"
+    assert append_many_to_file(VOLUME, divs(), gz) == ["d261", "d262"]
+    assert gzip.decompress(gz.read_bytes()) == expected
+    assert [r["xml_id"] for r in volume.ls(str(gz))] == ["d260", "d261", "d262"]
+
+    plain = tmp_path / "vol.xml"
+    assert splice_append_file(str(gz), divs(), str(plain)) == ["d263", "d264"]  # gzip in, plain out
+    assert splice_append_file(str(plain), divs(), str(tmp_path / "out.xml.gz")) == ["d265", "d266"]
+    assert [r["xml_id"] for r in volume.ls(str(tmp_path / "out.xml.gz"))] == [f"d{n}" for n in range(260, 267)]
+
+def test_zstd_round_trip(tmp_path):
+    pytest.importorskip("zstandard")
+    tree = etree.parse(VOLUME)
+    xmlio.write_tree(tree, tmp_path / "vol.xml.zst")
+    assert xmlio.read_bytes(tmp_path / "vol.xml.zst") == etree.tostring(tree, pretty_print=True, xml_declaration=True, encoding="utf-8")
+    assert volume.get(str(tmp_path / "vol.xml.zst"), "d260") is not None
+
+def test_in_place_splice_is_atomic(tmp_path, sample_pages, monkeypatch):
+    path = tmp_path / "vol.xml"
+    path.write_bytes(open(VOLUME, "rb").read())
+    splice_append_file(str(path), build_doc_div(sample_pages, "v", "dAUTO", "AUTO"))  # leaves a sidecar
+    before, sidecar = path.read_bytes(), (tmp_path / "vol.xml.idx.json").read_bytes()
+
+    def boom(src, dst):
+        dst.write(src.read(100))
+        raise OSError("disk full")
+    monkeypatch.setattr("seward.tei.shutil.copyfileobj", boom)
+    with pytest.raises(OSError):
+        splice_append_file(str(path), build_doc_div(sample_pages, "v", "dAUTO", "AUTO"))
+    assert path.read_bytes() == before and (tmp_path / "vol.xml.idx.json").read_bytes() == sidecar
+    monkeypatch.undo()
+    assert splice_append_file(str(path), build_doc_div(sample_pages, "v", "dAUTO", "AUTO")) == "d262"
+    assert sorted(os.listdir(tmp_path)) == ["vol.xml", "vol.xml.idx.json"]
+
+def test_new_files_follow_the_umask_and_validation_takes_paths_explicitly(tmp_path, monkeypatch):
+    monkeypatch.setattr(xmlio, "UMASK", 0o027)
+    xmlio.write_tree(etree.parse(VOLUME), tmp_path / "vol.xml.gz")
+    assert os.stat(tmp_path / "vol.xml.gz").st_mode & 0o777 == 0o640
+    assert validate.validate_file(str(tmp_path / "vol.xml.gz")).startswith("Relax NG: skipped")
+    assert validate.validate_with_schemas(str(tmp_path / "vol.xml.gz")).startswith("XML parse error")  # a str is not a path